@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import numpy as np
+
+class SampleRing:
+    """Fixed-size ring of audio frames for exactly one writer thread and one reader thread.
+
+    Made for audio callbacks: write() only copies into preallocated memory and never blocks or
+    allocates. The writer alone advances `written` and the reader alone advances `read`, so no
+    lock is needed; each publishes its counter only after its copy is done. A block that doesn't
+    fit is dropped whole and counted, the reader's data is never overwritten under it."""
+
+    def __init__(self, frames, channels=1, dtype=np.int16):
+        self.capacity = frames
+        self.channels = channels
+        self._data = np.zeros((frames, channels), dtype=dtype)
+        self.written = 0  # Frames ever written (monotonic, writer only)
+        self.read = 0  # Frames ever read (monotonic, reader only)
+        self.overflows = 0  # Blocks dropped because the ring was full
+        self.dropped_frames = 0
+
+    def available(self):
+        return self.written - self.read
+
+    def write(self, block):
+        """Copy a (frames, channels) block in; returns False if it was dropped for lack of space"""
+        frames = len(block)
+        if frames > self.capacity - (self.written - self.read):
+            self.overflows += 1
+            self.dropped_frames += frames
+            return False
+        start = self.written % self.capacity
+        first = min(frames, self.capacity - start)
+        self._data[start:start + first] = block[:first]
+        self._data[:frames - first] = block[first:]
+        self.written += frames
+        return True
+
+    def read_into(self, out):
+        """Move up to len(out) frames into the preallocated array out; returns how many"""
+        frames = min(len(out), self.written - self.read)
+        start = self.read % self.capacity
+        first = min(frames, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:frames] = self._data[:frames - first]
+        self.read += frames
+        return frames
+
+class JitterBuffer:
+    """Playout buffer between a network thread (push) and an audio callback (fill), float32 frames.
+
+    Playback starts, and restarts after an underrun, once `target_ms` of audio is queued, which
+    absorbs the jitter of the arrivals. An underrun plays what is left and fades the last frame out
+    instead of clicking to silence; while nothing plays, comfort noise at the level the sender last
+    reported fills in (see set_comfort_noise). Clock drift between the sender and our sound card is corrected
+    by playing one frame more or less per callback while the average fill level is off target, and
+    if the level runs far above target the backlog is skipped at once.
+
+    Like SampleRing it is lock-free for one pushing and one filling thread, and fill() allocates no
+    arrays, so it is safe to call from a real-time audio callback."""
+
+    def __init__(self, rate, channels=1, target_ms=120, max_ms=1000, max_block=8192):
+        self.rate = rate
+        self.channels = channels
+        self.capacity = rate * max_ms // 1000
+        self.target = rate * target_ms // 1000
+        self.tolerance = max(self.target // 4, 1)
+        self._data = np.zeros((self.capacity, channels), dtype=np.float32)
+        self._ramp = np.arange(1, max_block + 1, dtype=np.float32)[:, None]  # 1, 2, 3... to build fades in place
+        self._last = np.zeros((1, channels), dtype=np.float32)  # Last frame played, faded out on underrun
+        self._noise = np.random.default_rng().uniform(-1.0, 1.0, (max_block, channels)).astype(np.float32)
+        self._noise_offset = 0
+        self.comfort_level = 0.0  # Peak amplitude of the comfort noise, 0 for plain silence
+        self.written = 0  # Frames ever pushed (pushing thread only)
+        self.read = 0  # Frames ever played or skipped (filling thread only)
+        self.buffering = True
+        self.level = 0.0  # Smoothed fill level in frames
+
+        self.underruns = 0
+        self.overflows = 0  # Pushed blocks dropped because the buffer was full
+        self.skipped_frames = 0  # Dropped to catch up (drift and backlog)
+        self.stretched_frames = 0  # Repeated to slow down (drift)
+
+    def available(self):
+        return self.written - self.read
+
+    def push(self, block):
+        """Queue a (frames, channels) float32 block; returns False if it was dropped for lack of space"""
+        frames = len(block)
+        if frames > self.capacity - (self.written - self.read):
+            self.overflows += 1
+            return False
+        start = self.written % self.capacity
+        first = min(frames, self.capacity - start)
+        self._data[start:start + first] = block[:first]
+        self._data[:frames - first] = block[first:]
+        self.written += frames
+        return True
+
+    def set_comfort_noise(self, level_db):
+        """Background noise level (dBFS) the sender reported when it went silent"""
+        # A uniform noise of peak A has an RMS of A / sqrt(3)
+        self.comfort_level = float(min(10 ** (level_db / 20) * np.sqrt(3), 0.05))
+
+    def _fill_silence(self, out):
+        if not self.comfort_level:
+            out.fill(0)
+            return
+        # Walk through the precomputed noise so consecutive callbacks don't repeat the same block
+        frames = min(len(out), len(self._noise))
+        start = self._noise_offset if self._noise_offset + frames <= len(self._noise) else 0
+        np.multiply(self._noise[start:start + frames], self.comfort_level, out=out[:frames])
+        out[frames:] = 0
+        self._noise_offset = start + frames
+
+    def _copy_out(self, out, frames):
+        start = self.read % self.capacity
+        first = min(frames, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:frames] = self._data[:frames - first]
+
+    def fill(self, out):
+        """Fill the callback's output array with exactly len(out) frames"""
+        frames = len(out)
+        available = self.written - self.read
+        self.level += (available - self.level) * 0.05
+
+        if self.buffering:
+            if available < self.target:
+                self._fill_silence(out)
+                return
+            self.buffering = False
+            self.level = available
+
+        if available > self.target * 3 + frames:
+            # Far behind (a burst after a stall): jump to the newest target's worth of audio
+            skip = available - self.target
+            self.read += skip
+            self.skipped_frames += skip
+            available = self.target
+            self.level = available
+
+        if available < frames:
+            # Underrun: play what is left, then fade the last frame out and wait for the target again
+            self._copy_out(out, available)
+            if available:
+                self._last[0] = out[available - 1]
+            faded = min(frames - available, len(self._ramp))
+            fade = out[available:available + faded]
+            # A ramp over exactly the frames left, from just below 1 down to 0, built in the output
+            # so nothing is allocated on the audio thread
+            fade[:] = self._ramp[:faded]
+            fade *= -1.0 / faded
+            fade += 1.0
+            fade *= self._last
+            out[available + faded:] = 0
+            self._last.fill(0)
+            self.read += available
+            self.underruns += 1
+            self.buffering = True
+            return
+
+        self._copy_out(out, frames)
+        self._last[0] = out[frames - 1]
+        advance = frames
+        if self.level > self.target + self.tolerance and available > frames:
+            advance += 1  # Drop a frame: play slightly faster
+            self.skipped_frames += 1
+        elif self.level < self.target - self.tolerance:
+            advance -= 1  # Replay the last frame next time: play slightly slower
+            self.stretched_frames += 1
+        self.read += advance
+
+    def stats(self):
+        return {
+            "buffered_ms": round(self.available() * 1000 / self.rate),
+            "target_ms": round(self.target * 1000 / self.rate),
+            "underruns": self.underruns,
+            "overflows": self.overflows,
+            "skipped_frames": self.skipped_frames,
+            "stretched_frames": self.stretched_frames,
+        }
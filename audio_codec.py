@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import struct
+import warnings
+
+import numpy as np
+
+try:
+    import opuslib
+    OPUS_AVAILABLE = True
+except Exception:  # ImportError, or the binding can't find libopus
+    print("Warning: Opus audio codec not available. Install required packages with: pip install opuslib")
+    OPUS_AVAILABLE = False
+
+try:
+    # C implementation of IMA ADPCM, still shipped with Python up to 3.12
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop
+except ImportError:
+    audioop = None
+
+# Codecs from the most to the least compressed; the viewer picks the first one it can decode.
+# All of them carry 16-bit samples, interleaved when there is more than one channel.
+#   opus   Opus in 20 ms frames, each prefixed with its 2-byte length (about 24 kbit/s for voice)
+#   adpcm  IMA ADPCM, 4 bits per sample (4x smaller than pcm)
+#   mulaw  G.711 mu-law, 8 bits per sample (2x smaller than pcm)
+#   pcm    raw little-endian int16
+CODECS = ["opus", "adpcm", "mulaw", "pcm"]
+
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+def available_codecs(rate=48000):
+    """Codecs this side can encode at a sample rate, best first"""
+    return [codec for codec in CODECS if codec != "opus" or (OPUS_AVAILABLE and rate in OPUS_RATES)]
+
+# --- mu-law (G.711) -------------------------------------------------------------------------------
+
+MULAW_BIAS = 0x84
+MULAW_CLIP = 32636
+
+def _build_mulaw_tables():
+    """Lookup tables for every int16 value and every mu-law byte, so coding is one fancy-index per chunk"""
+    # Sun's g711.c: quantise on 14 bits, as audioop and most decoders do
+    samples = np.arange(-32768, 32768, dtype=np.int32) >> 2
+    mask = np.where(samples < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(samples), MULAW_CLIP >> 2) + (MULAW_BIAS >> 2)
+    segment = np.maximum(np.floor(np.log2(magnitude)).astype(np.int32) - 5, 0)
+    code = np.where(segment > 7, 0x7F, (np.minimum(segment, 7) << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    encode = (code ^ mask).astype(np.uint8)
+
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    magnitude = (((codes & 0x0F) << 3) + MULAW_BIAS) << ((codes >> 4) & 0x07)
+    decode = np.where(codes & 0x80, MULAW_BIAS - magnitude, magnitude - MULAW_BIAS).astype(np.int16)
+    return encode, decode
+
+MULAW_ENCODE, MULAW_DECODE = _build_mulaw_tables()
+
+# --- IMA ADPCM ------------------------------------------------------------------------------------
+
+ADPCM_INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8]
+ADPCM_STEP_TABLE = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+    337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066,
+    2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899,
+    15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767,
+]
+
+def _adpcm_encode(samples, state):
+    """Encode int16 samples (a list) from state (predictor, index). The first sample goes in the high nibble."""
+    predictor, index = state
+    out = bytearray((len(samples) + 1) // 2)
+    for position, sample in enumerate(samples):
+        step = ADPCM_STEP_TABLE[index]
+        diff = sample - predictor
+        code = 8 if diff < 0 else 0
+        diff = abs(diff)
+        delta = step >> 3
+        if diff >= step:
+            code |= 4
+            diff -= step
+            delta += step
+        step >>= 1
+        if diff >= step:
+            code |= 2
+            diff -= step
+            delta += step
+        step >>= 1
+        if diff >= step:
+            code |= 1
+            delta += step
+        # Track the value the decoder will reconstruct, not the real sample
+        predictor = max(-32768, min(32767, predictor - delta if code & 8 else predictor + delta))
+        index = max(0, min(88, index + ADPCM_INDEX_TABLE[code]))
+        if position & 1:
+            out[position >> 1] |= code
+        else:
+            out[position >> 1] = code << 4
+    return bytes(out), (predictor, index)
+
+def _adpcm_decode(data, count, state):
+    """Decode `count` samples of IMA ADPCM starting from state (predictor, index)"""
+    predictor, index = state
+    out = np.empty(count, dtype=np.int16)
+    for position in range(count):
+        byte = data[position >> 1]
+        code = byte & 0x0F if position & 1 else byte >> 4
+        step = ADPCM_STEP_TABLE[index]
+        delta = step >> 3
+        if code & 4:
+            delta += step
+        if code & 2:
+            delta += step >> 1
+        if code & 1:
+            delta += step >> 2
+        predictor = max(-32768, min(32767, predictor - delta if code & 8 else predictor + delta))
+        index = max(0, min(88, index + ADPCM_INDEX_TABLE[code]))
+        out[position] = predictor
+    return out
+
+# --- Encoder / decoder ----------------------------------------------------------------------------
+
+OPUS_FRAME_MS = 20
+
+class AudioEncoder:
+    """Encode chunks of int16 samples (interleaved, numpy) with one of the CODECS.
+    Each encoded chunk decodes on its own; ADPCM carries its starting state in a small header."""
+
+    def __init__(self, codec, rate, channels):
+        if codec not in available_codecs(rate):
+            raise ValueError(f"Unsupported audio codec: {codec}")
+        self.codec = codec
+        self.rate = rate
+        self.channels = channels
+        self._adpcm_state = [(0, 0)] * channels
+        if codec == "opus":
+            self._opus = opuslib.Encoder(rate, channels, opuslib.APPLICATION_VOIP)
+            self._frame = rate * OPUS_FRAME_MS // 1000
+            self._pending = np.zeros(0, dtype=np.int16)  # Samples left over from the last chunk (< one frame)
+
+    def encode(self, samples):
+        samples = np.asarray(samples, dtype=np.int16)
+        if self.codec == "pcm":
+            return samples.astype('<i2', copy=False).tobytes()
+        if self.codec == "mulaw":
+            return MULAW_ENCODE[samples.astype(np.int32) + 32768].tobytes()
+        if self.codec == "adpcm":
+            return self._encode_adpcm(samples)
+        return self._encode_opus(samples)
+
+    def _encode_adpcm(self, samples):
+        # Header: sample count per channel, then per channel its starting state and its nibbles
+        frames = samples.reshape(-1, self.channels)
+        parts = [struct.pack("<I", len(frames))]
+        for channel in range(self.channels):
+            state = self._adpcm_state[channel]
+            parts.append(struct.pack("<hBx", *state))
+            channel_samples = np.ascontiguousarray(frames[:, channel])
+            if audioop is not None and len(channel_samples) % 2 == 0:
+                # Same codes and nibble order as ours, but in C (odd lengths would lose audioop's last nibble)
+                data, state = audioop.lin2adpcm(channel_samples.astype('<i2').tobytes(), 2, state)
+            else:
+                data, state = _adpcm_encode(channel_samples.tolist(), state)
+            parts.append(data)
+            self._adpcm_state[channel] = state
+        return b"".join(parts)
+
+    def _encode_opus(self, samples):
+        samples = np.concatenate((self._pending, samples))
+        frame = self._frame * self.channels
+        usable = len(samples) // frame * frame
+        self._pending = samples[usable:]
+        packets = []
+        for start in range(0, usable, frame):
+            packet = self._opus.encode(samples[start:start + frame].astype('<i2').tobytes(), self._frame)
+            packets.append(struct.pack("<H", len(packet)) + packet)
+        return b"".join(packets)
+
+class AudioDecoder:
+    """Decode chunks made by AudioEncoder back to int16 samples (interleaved, numpy)"""
+
+    def __init__(self, codec, rate, channels):
+        self.codec = codec
+        self.rate = rate
+        self.channels = channels
+        if codec == "opus":
+            if not OPUS_AVAILABLE:
+                raise ValueError("Opus audio codec not available")
+            self._opus = opuslib.Decoder(rate, channels)
+            self._frame = rate * OPUS_FRAME_MS // 1000
+
+    def decode(self, data):
+        if self.codec == "pcm":
+            return np.frombuffer(data, dtype='<i2').astype(np.int16)
+        if self.codec == "mulaw":
+            return MULAW_DECODE[np.frombuffer(data, dtype=np.uint8)]
+        if self.codec == "adpcm":
+            return self._decode_adpcm(data)
+        if self.codec == "opus":
+            return self._decode_opus(data)
+        raise ValueError(f"Unsupported audio codec: {self.codec}")
+
+    def _decode_adpcm(self, data):
+        count = struct.unpack_from("<I", data)[0]
+        offset = 4
+        channels = []
+        for _ in range(self.channels):
+            predictor, index = struct.unpack_from("<hBx", data, offset)
+            offset += 4
+            size = (count + 1) // 2
+            state = (predictor, min(index, 88))
+            if audioop is not None:
+                # Always decodes two samples per byte, the extra one of an odd count is dropped
+                decoded = audioop.adpcm2lin(data[offset:offset + size], 2, state)[0]
+                channels.append(np.frombuffer(decoded, dtype='<i2')[:count].astype(np.int16))
+            else:
+                channels.append(_adpcm_decode(data[offset:offset + size], count, state))
+            offset += size
+        return np.stack(channels, axis=1).reshape(-1) if self.channels > 1 else channels[0]
+
+    def _decode_opus(self, data):
+        decoded = []
+        offset = 0
+        while offset + 2 <= len(data):
+            length = struct.unpack_from("<H", data, offset)[0]
+            packet = data[offset + 2:offset + 2 + length]
+            offset += 2 + length
+            decoded.append(np.frombuffer(self._opus.decode(packet, self._frame), dtype='<i2'))
+        return np.concatenate(decoded).astype(np.int16) if decoded else np.zeros(0, dtype=np.int16)
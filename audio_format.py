@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import numpy as np
+
+# Sample formats of decoded audio, by their name on the wire
+SAMPLE_FORMATS = {"s16": np.int16, "f32": np.float32}
+
+class AudioFormat:
+    """Description of an audio stream, sent along with every chunk:
+    codec (see audio_codec.py), sample format of the decoded samples, rate and channel count"""
+
+    def __init__(self, codec="pcm", rate=16000, channels=1, sample_format="s16"):
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unsupported sample format: {sample_format}")
+        self.codec = codec
+        self.rate = rate
+        self.channels = channels
+        self.sample_format = sample_format
+
+    def with_codec(self, codec):
+        return AudioFormat(codec, self.rate, self.channels, self.sample_format)
+
+    def to_fields(self):
+        """The fields of an audio chunk that describe it ("format" is the codec, as it always was)"""
+        return {
+            "format": self.codec,
+            "sample_format": self.sample_format,
+            "rate": self.rate,
+            "channels": self.channels,
+        }
+
+    @classmethod
+    def from_fields(cls, fields):
+        return cls(
+            fields.get("format", "pcm"),
+            fields.get("rate", VOICE_FORMAT.rate),
+            fields.get("channels", VOICE_FORMAT.channels),
+            fields.get("sample_format", "s16"),
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, AudioFormat) and self.to_fields() == other.to_fields()
+
+    def __repr__(self):
+        return f"AudioFormat({self.codec}, {self.rate} Hz, {self.channels} ch, {self.sample_format})"
+
+# What microphones stream: plenty for speech and a third of the bytes of 48 kHz
+VOICE_FORMAT = AudioFormat("pcm", 16000, 1, "s16")
+
+def to_float32(samples):
+    """int16 or float32 samples as float32 in [-1, 1)"""
+    if samples.dtype == np.float32:
+        return samples
+    return samples.astype(np.float32) * (1.0 / 32768)
+
+def to_int16(samples):
+    """float32 or int16 samples as int16, clipping what is out of range"""
+    if samples.dtype == np.int16:
+        return samples
+    return (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+
+def remix(samples, channels):
+    """(frames, n) samples to (frames, channels): mono is the average, mono to more is copied"""
+    if samples.shape[1] == channels:
+        return samples
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True, dtype=np.float32).astype(samples.dtype)
+    if samples.shape[1] == 1:
+        return np.repeat(samples, channels, axis=1)
+    return samples[:, :channels]
+
+def _lowpass_taps(cutoff, taps=31):
+    """Windowed-sinc FIR low-pass, cutoff as a fraction of the input rate"""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = np.sinc(2 * cutoff * n) * np.blackman(taps)
+    return (h / h.sum()).astype(np.float32)
+
+class Resampler:
+    """Streaming sample rate converter for (frames, channels) float32 chunks.
+
+    Linear interpolation between input frames, after a FIR low-pass when the rate goes down so
+    what the lower rate can't carry doesn't alias back as noise. The filter history and the
+    fractional read position carry over between chunks, so chunk boundaries don't click."""
+
+    def __init__(self, from_rate, to_rate, channels=1):
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        self.channels = channels
+        self.step = from_rate / to_rate  # Input frames per output frame
+        self.taps = _lowpass_taps(0.45 / self.step) if to_rate < from_rate else None
+        self._history = np.zeros((len(self.taps) - 1 if self.taps is not None else 0, channels), dtype=np.float32)
+        self._previous = np.zeros((1, channels), dtype=np.float32)  # Last input frame of the previous chunk
+        self._position = 1.0  # Where the next output frame falls, counting the previous frame as 0
+
+    def process(self, samples):
+        samples = to_float32(samples).reshape(-1, self.channels)
+        if self.from_rate == self.to_rate or not len(samples):
+            return samples
+
+        if self.taps is not None:
+            padded = np.concatenate((self._history, samples))
+            self._history = padded[len(padded) - len(self._history):]
+            samples = np.stack(
+                [np.convolve(padded[:, channel], self.taps, mode='valid') for channel in range(self.channels)],
+                axis=1
+            ).astype(np.float32)
+
+        frames = np.concatenate((self._previous, samples))
+        count = int(np.ceil((len(frames) - 1 - self._position) / self.step))
+        count = max(count, 0)
+        positions = self._position + np.arange(count) * self.step
+        index = positions.astype(np.int64)
+        fraction = (positions - index)[:, None].astype(np.float32)
+        output = frames[index] * (1 - fraction) + frames[index + 1] * fraction
+
+        self._position += count * self.step - (len(frames) - 1)
+        self._previous = frames[-1:]
+        return output
+
+class FormatConverter:
+    """Turn captured chunks (any rate, channel count, int16 or float32) into a target stream format"""
+
+    def __init__(self, from_rate, from_channels, target=VOICE_FORMAT):
+        self.target = target
+        self.from_channels = from_channels
+        self.resampler = Resampler(from_rate, target.rate, target.channels) if from_rate != target.rate else None
+
+    def convert(self, samples):
+        """(frames, channels) or interleaved samples in, (frames, target channels) samples in the target format out"""
+        samples = remix(samples.reshape(-1, self.from_channels), self.target.channels)
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        return to_int16(samples) if self.target.sample_format == "s16" else to_float32(samples)
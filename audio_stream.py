@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import json
+import threading
+
+import requests
+
+class AudioStreamListener:
+    """Receive a device's audio chunks from /api/audio/stream as they are uploaded.
+
+    One long-lived connection carries server-sent events, one per chunk. If it drops, the listener
+    reconnects passing the seq of the last chunk it got, so nothing still buffered on the server
+    is missed or played twice."""
+
+    def __init__(self, server_url, device_id, channel=None, keepalive_timeout=30):
+        self.url = f"{server_url}/api/audio/stream/{device_id}"
+        self.channel = channel  # None for the device's microphone, 'talk' for what the viewer says
+        self.keepalive_timeout = keepalive_timeout  # The server sends a keepalive every 15 s
+        self.session = requests.Session()
+        self.after = None  # seq of the last chunk received
+        self._response = None
+        self._closed = threading.Event()
+
+    def chunks(self):
+        """Yield chunk dicts until close() is called"""
+        while not self._closed.is_set():
+            try:
+                params = {"after": self.after} if self.after is not None else {}
+                if self.channel:
+                    params["channel"] = self.channel
+                self._response = self.session.get(self.url, params=params, stream=True, timeout=(5, self.keepalive_timeout))
+                data = []
+                for line in self._response.iter_lines(decode_unicode=True):
+                    if self._closed.is_set():
+                        return
+                    if line:
+                        if line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        continue  # ids repeat the seq in the data, comments are keepalives
+                    # A blank line ends an event
+                    if data:
+                        chunk = json.loads("\n".join(data))
+                        data = []
+                        self.after = chunk.get("seq", self.after)
+                        yield chunk
+            except Exception as e:
+                if self._closed.is_set():
+                    return
+                print(f"Audio stream interrupted: {str(e)}")
+            # Reconnect, after a pause so a server that is down isn't hammered
+            self._closed.wait(1)
+
+    def close(self):
+        """Stop listening, interrupting a connection that is waiting for data"""
+        self._closed.set()
+        response = self._response
+        if response is not None:
+            response.close()
@@ -6,69 +6,86 @@ import pyaudio
 import threading
 import time
 import numpy as np
-import base64
 import wave
 import io
 import socket
-import requests
 import json
 import struct
 
+from audio_format import VOICE_FORMAT, FormatConverter
+from audio_upload import AudioUploadBatcher
+from voice_activity import VoiceActivityDetector
+
 class AudioStreamer:
-    def __init__(self, server_url, device_id, chunk=4096, channels=1, rate=48000, p=None):
+    def __init__(self, server_url, device_id, chunk=4096, channels=1, rate=48000, p=None, frame_ms=200, stream_format=VOICE_FORMAT, vad=True):
         self.server_url = server_url
         self.device_id = device_id
         self.chunk = chunk
         self.channels = channels
         self.rate = rate
         self.format = pyaudio.paInt16
+        self.frame_ms = frame_ms  # Length of the audio frames uploaded in one request
+        self.stream_format = stream_format  # What is uploaded; rate and channels above are the capture's
+        self.vad = vad  # Skip uploading silence
+        self.uploader = None
         
-        # Initialize PyAudio
-        self.p = p if p else pyaudio.PyAudio()
+        # PyAudio is initialized when a stream is first opened or the devices are first listed:
+        # initializing PortAudio scans every device, which takes seconds on some machines
+        self.p = p
+        self.devices = None  # Cached {"input": [...], "output": [...]}, see get_audio_devices
         
         # Audio streaming state
         self.mic_stream = None
-        self.speaker_stream = None
         self.mic_active = False
-        self.speaker_active = False
         self.stop_event = threading.Event()
         self.mic_thread = None
-        self.speaker_thread = None
-        
-        # Get audio device information
-        self.input_devices = self._get_input_devices()
-        self.output_devices = self._get_output_devices()
         
         print(f"Audio Streamer initialized for device: {device_id}")
-        print(f"Available input devices: {len(self.input_devices)}")
-        print(f"Available output devices: {len(self.output_devices)}")
-        
-    def _get_input_devices(self):
-        """Get available input (microphone) devices"""
-        devices = []
-        for i in range(self.p.get_device_count()):
-            device_info = self.p.get_device_info_by_index(i)
-            if device_info['maxInputChannels'] > 0:
-                devices.append({
-                    'index': i,
-                    'name': device_info['name'],
-                    'channels': device_info['maxInputChannels']
-                })
-        return devices
     
-    def _get_output_devices(self):
-        """Get available output (speaker) devices"""
-        devices = []
-        for i in range(self.p.get_device_count()):
-            device_info = self.p.get_device_info_by_index(i)
-            if device_info['maxOutputChannels'] > 0:
-                devices.append({
-                    'index': i,
-                    'name': device_info['name'],
-                    'channels': device_info['maxOutputChannels']
-                })
+    def _pyaudio(self):
+        if self.p is None:
+            self.p = pyaudio.PyAudio()
+        return self.p
+    
+    def _enumerate_devices(self):
+        """Walk the devices once, sorting them into inputs (microphones) and outputs (speakers)"""
+        devices = {"input": [], "output": []}
+        p = self._pyaudio()
+        for i in range(p.get_device_count()):
+            device_info = p.get_device_info_by_index(i)
+            for kind, channels in (("input", device_info['maxInputChannels']), ("output", device_info['maxOutputChannels'])):
+                if channels > 0:
+                    devices[kind].append({
+                        'index': i,
+                        'name': device_info['name'],
+                        'channels': channels
+                    })
         return devices
     
+    def refresh_devices(self):
+        """Re-initialize PortAudio and list the devices again. PortAudio only sees devices plugged in
+        or removed since it was initialized after a restart, which would cut off open streams."""
+        if self.mic_stream:
+            print("The microphone stream is open, keeping the current device list")
+            return False
+        if self.p is not None:
+            self.p.terminate()
+            self.p = None
+        self.devices = self._enumerate_devices()
+        print(f"Audio devices: {len(self.devices['input'])} input, {len(self.devices['output'])} output")
+        return True
+    
+    def _open_stream(self, **kwargs):
+        """Open a PyAudio stream. If that fails, a device may have been plugged in or removed:
+        refresh the devices and try once more."""
+        try:
+            return self._pyaudio().open(**kwargs)
+        except OSError as e:
+            print(f"Error opening audio stream ({str(e)}), refreshing audio devices")
+            if not self.refresh_devices():
+                raise
+            return self._pyaudio().open(**kwargs)
+    
     def start_microphone_streaming(self, device_index=None):
         """Start streaming microphone audio to the server"""
         if self.mic_active:
@@ -78,11 +95,15 @@ class AudioStreamer:
         # Reset stop event
         self.stop_event.clear()
         self.mic_active = True
+        self.converter = FormatConverter(self.rate, self.channels, self.stream_format)
+        detector = VoiceActivityDetector(self.stream_format.rate, self.stream_format.channels) if self.vad else None
+        self.uploader = AudioUploadBatcher(self.server_url, self.device_id, self.stream_format, self.frame_ms, vad=detector)
+        self.uploader.start()
         
         # Start microphone streaming in a new thread
         self.mic_thread = threading.Thread(
             target=self._microphone_streaming_loop,
-            args=(device_index,)
+            args=(self.converter, self.uploader, device_index)
         )
         self.mic_thread.daemon = True
         self.mic_thread.start()
@@ -107,65 +128,21 @@ class AudioStreamer:
             except Exception as e:
                 print(f"Error stopping microphone stream: {str(e)}")
         
-        # Wait for thread to finish
+        # Wait for thread to finish, it sends the last partial frame and stops the uploader
         if self.mic_thread and self.mic_thread.is_alive():
             self.mic_thread.join(timeout=5)
+            if self.mic_thread.is_alive():
+                print("Microphone thread is still finishing, its last audio is sent when it ends")
         
         self.mic_active = False
         print("Microphone streaming stopped")
         return True
     
-    def start_speaker_streaming(self, device_index=None):
-        """Start streaming audio from the server to speakers"""
-        if self.speaker_active:
-            print("Speaker streaming is already active")
-            return False
-        
-        # Reset stop event
-        self.stop_event.clear()
-        self.speaker_active = True
-        
-        # Start speaker streaming in a new thread
-        self.speaker_thread = threading.Thread(
-            target=self._speaker_streaming_loop,
-            args=(device_index,)
-        )
-        self.speaker_thread.daemon = True
-        self.speaker_thread.start()
-        
-        print("Speaker streaming started")
-        return True
-    
-    def stop_speaker_streaming(self):
-        """Stop speaker streaming"""
-        if not self.speaker_active:
-            print("Speaker streaming is not active")
-            return False
-        
-        # Signal the thread to stop
-        self.stop_event.set()
-        
-        # Stop and close the stream
-        if self.speaker_stream:
-            try:
-                self.speaker_stream.stop_stream()
-                self.speaker_stream.close()
-            except Exception as e:
-                print(f"Error stopping speaker stream: {str(e)}")
-        
-        # Wait for thread to finish
-        if self.speaker_thread and self.speaker_thread.is_alive():
-            self.speaker_thread.join(timeout=5)
-        
-        self.speaker_active = False
-        print("Speaker streaming stopped")
-        return True
-    
-    def _microphone_streaming_loop(self, device_index=None):
+    def _microphone_streaming_loop(self, converter, uploader, device_index=None):
         """Main loop for capturing and uploading microphone audio"""
         try:
             # Open microphone stream
-            self.mic_stream = self.p.open(
+            self.mic_stream = self._open_stream(
                 format=self.format,
                 channels=self.channels,
                 rate=self.rate,
@@ -182,29 +159,8 @@ class AudioStreamer:
                     # Record audio chunk
                     audio_data = self.mic_stream.read(self.chunk, exception_on_overflow=False)
                     
-                    # Encode audio data to base64
-                    audio_b64 = base64.b64encode(audio_data).decode()
-                    
-                    # Send to server
-                    try:
-                        response = requests.post(
-                            f"{self.server_url}/api/audio/upload/{self.device_id}",
-                            json={
-                                "audio_data": audio_b64,
-                                "format": "pcm",
-                                "channels": self.channels,
-                                "rate": self.rate,
-                                "timestamp": time.time()
-                            },
-                            timeout=1
-                        )
-                        
-                        if response.status_code != 200:
-                            print(f"Error uploading audio: {response.status_code}")
-                    except Exception as e:
-                        print(f"Error sending audio data: {str(e)}")
-                        # Short delay to prevent flooding logs with errors
-                        time.sleep(0.5)
+                    # Converted to the stream format, then batched, compressed and uploaded by the uploader's own thread
+                    uploader.add(converter.convert(np.frombuffer(audio_data, dtype=np.int16)))
                         
                 except Exception as e:
                     print(f"Error recording audio: {str(e)}")
@@ -220,72 +176,29 @@ class AudioStreamer:
                     self.mic_stream.close()
                 except:
                     pass
+                self.mic_stream = None
+            # Only this thread adds to the uploader, so it also sends the last partial frame
+            uploader.flush()
+            uploader.stop()
     
-    def _speaker_streaming_loop(self, device_index=None):
-        """Main loop for receiving and playing audio"""
-        try:
-            # Open speaker stream
-            self.speaker_stream = self.p.open(
-                format=self.format,
-                channels=self.channels,
-                rate=self.rate,
-                output=True,
-                frames_per_buffer=self.chunk,
-                output_device_index=device_index
-            )
-            
-            print(f"Speaker stream opened with device index: {device_index}")
-            
-            # Playback loop
-            while not self.stop_event.is_set():
-                try:
-                    # Get audio data from server
-                    response = requests.get(
-                        f"{self.server_url}/api/audio/download/{self.device_id}",
-                        timeout=1
-                    )
-                    
-                    if response.status_code == 200:
-                        audio_data = response.json()
-                        
-                        if audio_data and "audio_data" in audio_data:
-                            # Decode audio from base64
-                            audio_bytes = base64.b64decode(audio_data["audio_data"])
-                            
-                            # Only play audio locally if configured to do so
-                            # Comment out or remove the next line to prevent local playback
-                            # self.speaker_stream.write(audio_bytes)
-                            # Just keep receiving audio data for the web interface to use
-                    
-                    # Add a small delay to prevent flooding the server with requests
-                    time.sleep(0.05)
-                    
-                except Exception as e:
-                    print(f"Error downloading or playing audio: {str(e)}")
-                    time.sleep(0.5)
-        
-        except Exception as e:
-            print(f"Error in speaker streaming: {str(e)}")
-        finally:
-            # Ensure we clean up if there's an error
-            if self.speaker_stream:
-                try:
-                    self.speaker_stream.stop_stream()
-                    self.speaker_stream.close()
-                except:
-                    pass
+    def upload_stats(self):
+        """Microphone upload counters (frames sent, dropped and suppressed as silence, bytes, errors)"""
+        return self.uploader.stats() if self.uploader else None
     
-    def get_audio_devices(self):
-        """Return the available audio devices"""
+    def get_audio_devices(self, refresh=False):
+        """Return the available audio devices, listed on first use and cached until refreshed"""
+        if refresh:
+            self.refresh_devices()
+        if self.devices is None:
+            self.devices = self._enumerate_devices()
         return {
-            "input": self.input_devices,
-            "output": self.output_devices
+            "input": self.devices["input"],
+            "output": self.devices["output"]
         }
     
     def close(self):
         """Clean up resources"""
         self.stop_microphone_streaming()
-        self.stop_speaker_streaming()
         
         if self.p:
             self.p.terminate()
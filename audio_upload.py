@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import base64
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
+
+from audio_codec import AudioEncoder, available_codecs
+from audio_format import VOICE_FORMAT
+from media_clock import SampleClock
+
+class AudioUploadBatcher:
+    """Collect captured audio into fixed-length frames and upload them from a background thread.
+
+    Samples are copied into a preallocated buffer; every full frame is encoded with the codec the
+    server negotiated and queued. The sender thread posts the queue on one keep-alive connection.
+    When the link stalls the queue fills up and the oldest frames are dropped, so the viewer hears
+    a gap and then current audio rather than an ever-growing delay.
+
+    With a voice activity detector, silent frames aren't sent: entering silence (and every
+    `comfort_interval` seconds of it) sends a small marker with the noise level instead, which the
+    listener plays as comfort noise."""
+
+    def __init__(self, server_url, device_id, stream_format=VOICE_FORMAT, frame_ms=200, max_pending=10, timeout=2,
+                 vad=None, comfort_interval=5):
+        self.url = f"{server_url}/api/audio/upload/{device_id}"
+        self.stream_format = stream_format  # Rate and channels of the samples added (int16); the codec is negotiated
+        self.rate = stream_format.rate
+        self.channels = stream_format.channels
+        self.frame_ms = frame_ms
+        self.max_pending = max_pending  # frames queued before the oldest is dropped (2 s at 200 ms)
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        self.codecs = available_codecs(self.rate)
+        self.encoder = AudioEncoder("pcm", self.rate, self.channels)  # pcm until the server answers with the codec to use
+        self._next_codec = None
+
+        self._buffer = np.empty(self.rate * frame_ms // 1000 * self.channels, dtype=np.int16)
+        self._filled = 0
+        self._frame_time = None  # When the first sample of the frame being filled was captured
+        self.clock = SampleClock(self.rate)
+        self._frame_capture = None  # Same on the media clock, which the viewer syncs audio and video with
+
+        self.vad = vad
+        self.comfort_interval = comfort_interval
+        self._silent_since = None  # When the last comfort noise marker was queued, None while speaking
+
+        self._pending = deque()  # (payload, format, timestamp, capture time, duration, comfort noise level or None)
+        self._condition = threading.Condition()
+        self._running = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.send_errors = 0
+        self.frames_suppressed = 0
+        self.markers_sent = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._send_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def flush(self):
+        """Queue the last, partial frame. Call from the capture thread, after its last add()."""
+        self._emit()
+
+    def stop(self):
+        """Send what is queued (if the link allows) and stop the sender thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._stopped.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.timeout + 1)
+        self._thread = None
+
+    def add(self, samples):
+        """Add interleaved int16 samples (a numpy array) from the capture thread"""
+        samples = samples.reshape(-1)
+        block_capture = self.clock.advance(len(samples) // self.channels)
+        position = 0
+        while position < len(samples):
+            if self._filled == 0:
+                # Back-date by what this call already consumed, so the timestamp is the frame's first sample
+                self._frame_time = time.time() - (len(samples) - position) / (self.rate * self.channels)
+                self._frame_capture = block_capture + position / (self.rate * self.channels)
+            count = min(len(self._buffer) - self._filled, len(samples) - position)
+            self._buffer[self._filled:self._filled + count] = samples[position:position + count]
+            self._filled += count
+            position += count
+            if self._filled == len(self._buffer):
+                self._emit()
+
+    def _emit(self):
+        """Encode the frame in the buffer and queue it, dropping the oldest frame if the queue is full"""
+        if not self._filled:
+            return
+        duration = self._filled / (self.rate * self.channels)
+        if self.vad is not None and not self.vad.is_speech(self._buffer[:self._filled]):
+            self._filled = 0
+            self.frames_suppressed += 1
+            if self._silent_since is None or self._frame_time - self._silent_since >= self.comfort_interval:
+                self._silent_since = self._frame_time
+                self._queue(("", self.encoder.codec, self._frame_time, self._frame_capture, duration, self.vad.noise_level()))
+            return
+        self._silent_since = None
+
+        codec = self._next_codec
+        if codec and codec != self.encoder.codec:
+            self.encoder = AudioEncoder(codec, self.rate, self.channels)
+            print(f"Microphone audio codec: {codec}")
+        payload = self.encoder.encode(self._buffer[:self._filled])
+        self._filled = 0
+        if not payload:
+            return  # Opus holds back less than one of its frames until the next call
+        self._queue((base64.b64encode(payload).decode(), self.encoder.codec, self._frame_time, self._frame_capture, duration, None))
+
+    def _queue(self, item):
+        with self._condition:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.frames_dropped += 1
+            self._pending.append(item)
+            self._condition.notify()
+
+    def _send_loop(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                audio_b64, codec, timestamp, capture_time, duration, comfort_noise = self._pending.popleft()
+
+            try:
+                chunk = {
+                    "audio_data": audio_b64,
+                    "capabilities": self.codecs,
+                    "timestamp": timestamp,
+                    "capture_time": capture_time,
+                    "duration": duration
+                }
+                chunk.update(self.stream_format.with_codec(codec).to_fields())
+                if comfort_noise is not None:
+                    chunk["comfort_noise"] = comfort_noise  # Silence: no audio, just the noise level in dBFS
+                response = self.session.post(self.url, json=chunk, timeout=self.timeout)
+                if response.status_code == 200:
+                    if comfort_noise is None:
+                        self.frames_sent += 1
+                    else:
+                        self.markers_sent += 1
+                    self.bytes_sent += len(audio_b64)
+                    # Picked up by the capture thread at its next frame
+                    codec = response.json().get("format", "pcm")
+                    if codec in self.codecs:
+                        self._next_codec = codec
+                    continue
+                print(f"Error uploading audio: {response.status_code}")
+            except Exception as e:
+                print(f"Error sending audio data: {str(e)}")
+
+            # The frame is lost; wait a little so a dead link doesn't spin, new frames keep queueing meanwhile
+            self.send_errors += 1
+            if self._stopped.wait(0.5):
+                return
+
+    def stats(self):
+        captured = self.frames_sent + self.frames_dropped + self.frames_suppressed + len(self._pending)
+        return {
+            "codec": self.encoder.codec,
+            "frame_ms": self.frame_ms,
+            "pending": len(self._pending),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "bytes_sent": self.bytes_sent,
+            "send_errors": self.send_errors,
+            "frames_suppressed": self.frames_suppressed,
+            "comfort_noise_markers": self.markers_sent,
+            # Share of the captured frames not sent because they were silence
+            "suppression_ratio": round(self.frames_suppressed / captured, 3) if captured else 0.0,
+        }
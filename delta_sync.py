@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("Warning: numpy not available, delta sync will scan changed files slowly. Install required packages with: pip install numpy")
+    NUMPY_AVAILABLE = False
+
+# rsync-style delta transfer: the side that has the old copy sends a signature (a weak rolling checksum and a
+# strong hash per block), the side with the new file sends back which blocks to copy and the bytes in between.
+#
+# Signature: "SSIG" version block_size file_size count, then per block: adler32 (4 bytes) + blake2b-128 (16 bytes)
+# Delta:     "SDLT" version block_size target_size blake2b-128 of the whole target, then operations:
+#            "C" first_block count   copy a run of blocks from the old file
+#            "L" length data         literal bytes
+#            "E"                     end
+
+SIGNATURE_MAGIC = b"SSIG"
+DELTA_MAGIC = b"SDLT"
+VERSION = 1
+MOD_ADLER = 65521
+STRONG_SIZE = 16
+MAX_LITERAL = 1024 * 1024  # Literal runs are split so the patcher never holds more than this
+WINDOW = 1024 * 1024  # Bytes of the new file whose weak checksums numpy computes at once
+
+def _strong(data):
+    return hashlib.blake2b(data, digest_size=STRONG_SIZE).digest()
+
+def block_size_for(size):
+    """Block size for a file: about the square root of its size (as rsync does), between 2 KB and 128 KB"""
+    block = int(math.sqrt(size)) if size else 0
+    block = (block + 1023) // 1024 * 1024
+    return min(max(block, 2048), 128 * 1024)
+
+def signature(path, block_size):
+    """Signature of the existing copy of a file (an empty one if it doesn't exist)"""
+    blocks = []
+    size = 0
+    if os.path.isfile(path):
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                blocks.append(struct.pack(">I", zlib.adler32(block)) + _strong(block))
+    header = SIGNATURE_MAGIC + struct.pack(">BIQI", VERSION, block_size, size, len(blocks))
+    return header + b"".join(blocks)
+
+def parse_signature(data):
+    """Return (block size, file size, [(weak, strong)]) from a signature"""
+    if data[:4] != SIGNATURE_MAGIC:
+        raise ValueError("Not a signature")
+    version, block_size, size, count = struct.unpack_from(">BIQI", data, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported signature version {version}")
+    offset = 4 + struct.calcsize(">BIQI")
+    entry = 4 + STRONG_SIZE
+    blocks = []
+    for index in range(count):
+        start = offset + index * entry
+        blocks.append((struct.unpack_from(">I", data, start)[0], data[start + 4:start + entry]))
+    return block_size, size, blocks
+
+def _weak_windows(data, length):
+    """Adler-32 of every `length`-byte window of a uint8 array, all at once with prefix sums"""
+    x = data.astype(np.int64)
+    n = len(x)
+    sums = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(x, out=sums[1:])
+    weighted = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(x * np.arange(n, dtype=np.int64), out=weighted[1:])
+
+    starts = np.arange(n - length + 1, dtype=np.int64)
+    window_sum = sums[length:] - sums[:-length]
+    # Adler-32 over a window starting at k: A = 1 + sum(x), B = length + sum((length - i) * x[k + i])
+    a = (1 + window_sum) % MOD_ADLER
+    b = (length + (length + starts) * window_sum - (weighted[length:] - weighted[:-length])) % MOD_ADLER
+    return (b << 16) | a
+
+class _DeltaWriter:
+    """Write delta operations, merging consecutive block copies into runs"""
+
+    def __init__(self, out, source):
+        self.out = out
+        self.source = source
+        self.run = None  # [first block, count]
+        self.literal_bytes = 0
+        self.copied_blocks = 0
+
+    def literal(self, start, end):
+        if start >= end:
+            return
+        self._flush_run()
+        self.literal_bytes += end - start
+        for chunk_start in range(start, end, MAX_LITERAL):
+            chunk = self.source[chunk_start:min(end, chunk_start + MAX_LITERAL)]
+            self.out.write(b"L" + struct.pack(">I", len(chunk)))
+            self.out.write(chunk)
+
+    def copy(self, block):
+        self.copied_blocks += 1
+        if self.run and self.run[0] + self.run[1] == block:
+            self.run[1] += 1
+            return
+        self._flush_run()
+        self.run = [block, 1]
+
+    def _flush_run(self):
+        if self.run:
+            self.out.write(b"C" + struct.pack(">II", *self.run))
+            self.run = None
+
+    def close(self):
+        self._flush_run()
+        self.out.write(b"E")
+
+def make_delta(path, signature_data, out):
+    """Write to `out` the delta that turns the signed file into the file at `path`.
+    Returns {"literal_bytes", "copied_bytes", "size"}"""
+    block_size, old_size, blocks = parse_signature(signature_data)
+    size = os.path.getsize(path)
+
+    # Full-size blocks are found with the rolling checksum, a shorter last block only at the very end
+    index = {}
+    for number, (weak, strong) in enumerate(blocks):
+        if (number + 1) * block_size <= old_size:
+            index.setdefault(weak, []).append((strong, number))
+    tail_length = old_size - (len(blocks) - 1) * block_size if blocks else 0
+    tail_block = (len(blocks) - 1, blocks[-1]) if blocks and tail_length < block_size else None
+
+    with open(path, 'rb') as f:
+        source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            digest = hashlib.blake2b(source, digest_size=STRONG_SIZE).digest()
+            out.write(DELTA_MAGIC + struct.pack(">BIQ", VERSION, block_size, size) + digest)
+            writer = _DeltaWriter(out, source)
+
+            def match(position, weak):
+                """Block number the window at position matches, preferring the one after the previous copy"""
+                candidates = index.get(weak)
+                if not candidates:
+                    return None
+                strong = _strong(source[position:position + block_size])
+                found = [number for candidate, number in candidates if candidate == strong]
+                if not found:
+                    return None
+                expected = writer.run[0] + writer.run[1] if writer.run else None
+                return expected if expected in found else found[0]
+
+            if NUMPY_AVAILABLE:
+                position = _scan_numpy(source, size, block_size, index, match, writer)
+            else:
+                position = _scan_rolling(source, size, block_size, index, match, writer)
+
+            # Whatever is left is literal, except a final stretch equal to the old file's short last block
+            end = size
+            if tail_block and size - position >= tail_length:
+                number, (weak, strong) = tail_block
+                tail = source[size - tail_length:size]
+                if zlib.adler32(tail) == weak and _strong(tail) == strong:
+                    end = size - tail_length
+            writer.literal(position, end)
+            if end < size:
+                writer.copy(tail_block[0])
+            writer.close()
+        finally:
+            if size:
+                source.close()
+
+    return {
+        "literal_bytes": writer.literal_bytes,
+        "copied_bytes": size - writer.literal_bytes,
+        "size": size,
+    }
+
+def _scan_numpy(source, size, block_size, index, match, writer):
+    """Find block matches using numpy for the checksums of every window, returning where literals resume"""
+    if size < block_size or not index:
+        return 0
+    data = np.frombuffer(source, dtype=np.uint8)
+    known = np.fromiter(index.keys(), dtype=np.int64, count=len(index))
+    position = 0  # start of the bytes not yet covered by a copy
+    window_start = 0
+    while window_start <= size - block_size:
+        window_end = min(size, window_start + WINDOW + block_size - 1)
+        weak = _weak_windows(data[window_start:window_end], block_size)
+        # Only offsets whose weak checksum is known get a strong hash, the rest is skipped wholesale
+        for offset in np.nonzero(np.isin(weak, known))[0]:
+            start = window_start + int(offset)
+            if start < position:
+                continue
+            number = match(start, int(weak[offset]))
+            if number is not None:
+                writer.literal(position, start)
+                writer.copy(number)
+                position = start + block_size
+        window_start = max(window_start + WINDOW, position)
+    return position
+
+def _scan_rolling(source, size, block_size, index, match, writer):
+    """Find block matches rolling the checksum one byte at a time (slow, only where the file changed)"""
+    if size < block_size or not index:
+        return 0
+    position = 0
+    start = 0
+    value = zlib.adler32(source[0:block_size])
+    a, b = value & 0xffff, value >> 16
+    while start <= size - block_size:
+        number = match(start, (b << 16) | a)
+        if number is not None:
+            writer.literal(position, start)
+            writer.copy(number)
+            start = position = start + block_size
+            if start <= size - block_size:
+                value = zlib.adler32(source[start:start + block_size])
+                a, b = value & 0xffff, value >> 16
+            continue
+        if start + block_size < size:
+            removed, added = source[start], source[start + block_size]
+            a = (a - removed + added) % MOD_ADLER
+            b = (b - block_size * removed + a - 1) % MOD_ADLER
+        start += 1
+    return position
+
+def apply_delta(basis_path, delta, target_path):
+    """Rebuild a file from its old copy and a delta read from the file object `delta`.
+    The result is checked against the hash in the delta before it replaces target_path.
+    Returns {"size", "copied_bytes", "literal_bytes"}"""
+    header = delta.read(4 + struct.calcsize(">BIQ") + STRONG_SIZE)
+    if header[:4] != DELTA_MAGIC:
+        raise ValueError("Not a delta")
+    version, block_size, size = struct.unpack_from(">BIQ", header, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported delta version {version}")
+    digest = header[-STRONG_SIZE:]
+
+    directory = os.path.dirname(os.path.abspath(target_path))
+    basis = open(basis_path, 'rb') if os.path.isfile(basis_path) else None
+    # Built next to the target so the final rename is atomic
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".delta-")
+    hasher = hashlib.blake2b(digest_size=STRONG_SIZE)
+    copied = literal = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                op = delta.read(1)
+                if op == b"E":
+                    break
+                if op == b"C":
+                    first, count = struct.unpack(">II", delta.read(8))
+                    if basis is None:
+                        raise ValueError("Delta copies blocks but there is no old file")
+                    basis.seek(first * block_size)
+                    remaining = count * block_size
+                    while remaining:
+                        chunk = basis.read(min(remaining, MAX_LITERAL))
+                        if not chunk:
+                            break  # The short last block
+                        out.write(chunk)
+                        hasher.update(chunk)
+                        copied += len(chunk)
+                        remaining -= len(chunk)
+                elif op == b"L":
+                    length = struct.unpack(">I", delta.read(4))[0]
+                    chunk = delta.read(length)
+                    if len(chunk) != length:
+                        raise ValueError("Delta is truncated")
+                    out.write(chunk)
+                    hasher.update(chunk)
+                    literal += length
+                else:
+                    raise ValueError("Delta is truncated or corrupt")
+
+        if copied + literal != size or hasher.digest() != digest:
+            raise ValueError("Rebuilt file doesn't match, the old copy changed since its signature was taken")
+        if basis is not None:
+            os.chmod(temp_path, os.stat(basis_path).st_mode & 0o777)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    finally:
+        if basis is not None:
+            basis.close()
+
+    os.replace(temp_path, target_path)
+    return {"size": size, "copied_bytes": copied, "literal_bytes": literal}
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import platform
+import threading
+import time
+from collections import deque
+
+import pyautogui
+
+try:
+    import pyperclip
+    PASTE_AVAILABLE = True
+except ImportError:
+    print("Warning: Clipboard paste not available. Install required packages with: pip install pyperclip")
+    PASTE_AVAILABLE = False
+
+class InputBackend:
+    """Inject mouse and keyboard events with pyautogui, without its per-call pauses"""
+
+    def __init__(self, paste_threshold=32, window=200):
+        # pyautogui sleeps PAUSE (0.1 s) after every call, we pass _pause=False everywhere
+        # and also zero the global so nothing else in the process pays for it
+        pyautogui.PAUSE = 0
+        self.paste_threshold = paste_threshold  # texts at least this long are pasted instead of typed
+        self.paste_key = 'command' if platform.system() == "Darwin" else 'ctrl'
+        self._buttons_down = set()
+        self._latencies = {"mouse": deque(maxlen=window), "keyboard": deque(maxlen=window), "paste": deque(maxlen=window)}
+        self.events = 0
+        self.coalesced = 0
+        # One pending clipboard restore for back-to-back pastes, holding the user's own clipboard
+        self._clipboard_lock = threading.Lock()
+        self._restore_timer = None
+        self._saved_clipboard = None
+
+    def execute_batch(self, events, offsets=None):
+        """Execute a batch of viewer events in order and return one result per event.
+        offsets maps a monitor index to its (left, top) on the virtual desktop"""
+        results = []
+        for index, event in enumerate(events):
+            if event.get("kind") == "mouse":
+                following = events[index + 1] if index + 1 < len(events) else None
+                # Only the last of consecutive moves matters, unless a button is held for a drag
+                if (event.get("action") == "move" and not self._buttons_down and following
+                        and following.get("kind") == "mouse" and following.get("action") == "move"):
+                    self.coalesced += 1
+                    results.append({"status": "success", "action": "move", "coalesced": True})
+                    continue
+
+                offset = (offsets or {}).get(event.get("monitor"), (0, 0))
+                results.append(self.mouse(event["action"], event.get("x"), event.get("y"), event.get("button"), offset))
+            else:
+                results.append(self.keyboard(event["type"], event["input"]))
+        return results
+
+    def mouse(self, action, x=None, y=None, button=None, offset=(0, 0)):
+        """Execute one mouse action, x/y being relative to the monitor at offset"""
+        start = time.perf_counter()
+        try:
+            if action == "move":
+                if x is None or y is None:
+                    return {"status": "error", "message": "Invalid mouse action"}
+                pyautogui.moveTo(x + offset[0], y + offset[1], _pause=False)
+                result = {"status": "success", "action": "move"}
+
+            elif action == "click":
+                if button == "left":
+                    pyautogui.click(_pause=False)
+                elif button == "right":
+                    pyautogui.rightClick(_pause=False)
+                elif button == "double":
+                    pyautogui.doubleClick(_pause=False)
+                result = {"status": "success", "action": "click", "button": button}
+
+            elif action == "scroll":
+                amount = y if y is not None else 0  # y positive = scroll down, negative = scroll up
+                pyautogui.scroll(amount, _pause=False)
+                result = {"status": "success", "action": "scroll", "amount": amount}
+
+            elif action in ("down", "up"):
+                # Mouse button down/up for drag operations
+                if button in ("left", "right"):
+                    if action == "down":
+                        pyautogui.mouseDown(button=button, _pause=False)
+                        self._buttons_down.add(button)
+                    else:
+                        pyautogui.mouseUp(button=button, _pause=False)
+                        self._buttons_down.discard(button)
+                result = {"status": "success", "action": action, "button": button}
+
+            else:
+                return {"status": "error", "message": "Invalid mouse action"}
+
+            return self._measured(result, "mouse", start)
+        except Exception as e:
+            print(f"Error controlling mouse: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    def keyboard(self, input_type, input_value):
+        """Type text or press a shortcut such as 'ctrl+c'"""
+        start = time.perf_counter()
+        try:
+            if input_type == "text":
+                if PASTE_AVAILABLE and len(input_value) >= self.paste_threshold:
+                    self._paste(input_value)
+                    return self._measured({"status": "success", "type": "text", "method": "paste"}, "paste", start)
+
+                # interval=0 and no pause: one key press per character, back to back
+                pyautogui.write(input_value, interval=0, _pause=False)
+                return self._measured({"status": "success", "type": "text", "method": "type"}, "keyboard", start)
+
+            elif input_type == "shortcut":
+                keys = input_value.split('+')
+                if len(keys) == 1:
+                    pyautogui.press(keys[0], _pause=False)
+                else:
+                    pyautogui.hotkey(*keys, _pause=False)
+                return self._measured({"status": "success", "type": "shortcut", "shortcut": input_value}, "keyboard", start)
+
+            return {"status": "error", "message": "Invalid keyboard input type"}
+        except Exception as e:
+            print(f"Error handling keyboard input: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    def _paste(self, text):
+        """Put text on the clipboard and paste it in one keystroke, restoring the clipboard afterwards"""
+        with self._clipboard_lock:
+            if self._restore_timer is not None:
+                # An earlier paste hasn't restored yet: the clipboard holds its text, not the user's
+                self._restore_timer.cancel()
+            else:
+                try:
+                    self._saved_clipboard = pyperclip.paste()
+                except Exception:
+                    self._saved_clipboard = None
+
+            pyperclip.copy(text)
+            pyautogui.hotkey(self.paste_key, 'v', _pause=False)
+
+            # The target application reads the clipboard asynchronously, give it a moment first;
+            # another paste meanwhile re-arms the timer instead of restoring in between
+            self._restore_timer = threading.Timer(0.5, self._restore_clipboard)
+            self._restore_timer.daemon = True
+            self._restore_timer.start()
+
+    def _restore_clipboard(self):
+        with self._clipboard_lock:
+            if self._restore_timer is None or threading.current_thread() is not self._restore_timer:
+                return  # Re-armed by a later paste after this timer had already fired
+            self._restore_timer = None
+            previous, self._saved_clipboard = self._saved_clipboard, None
+            if previous is not None:
+                try:
+                    pyperclip.copy(previous)
+                except Exception as e:
+                    print(f"Error restoring the clipboard: {str(e)}")
+
+    def _measured(self, result, kind, start):
+        """Record how long an injection took and attach it to the result"""
+        latency = time.perf_counter() - start
+        self._latencies[kind].append(latency)
+        self.events += 1
+        result["latency_ms"] = round(latency * 1000, 2)
+        return result
+
+    def stats(self):
+        """Return (count, average, 95th percentile, maximum) injection latency in seconds per event kind"""
+        stats = {}
+        for kind, samples in self._latencies.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            stats[kind] = (len(ordered), sum(ordered) / len(ordered), p95, ordered[-1])
+        return stats
+
+    def status(self):
+        """Describe the injection latency for `!input status`"""
+        lines = [f"Input events: {self.events} injected, {self.coalesced} moves coalesced"]
+        lines.append(f"Clipboard paste: {'on' if PASTE_AVAILABLE else 'unavailable'} (texts of {self.paste_threshold}+ characters)")
+        for kind, (count, average, p95, maximum) in self.stats().items():
+            lines.append(
+                f"{kind.capitalize()}: {count} recent, avg {average * 1000:.1f} ms / "
+                f"p95 {p95 * 1000:.1f} ms / max {maximum * 1000:.1f} ms"
+            )
+        return "\n".join(lines)
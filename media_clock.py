@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import time
+
+def media_time():
+    """Now on the receiver's media clock, in seconds. Screen frames and audio chunks are both stamped
+    with it (as capture_time) so the viewer can line them up; unlike time.time() it never jumps."""
+    return time.monotonic()
+
+class SampleClock:
+    """Media clock time of captured audio, counted in samples.
+
+    Blocks reach the code some time after they were captured, and that delay jitters with thread
+    scheduling. Counting samples from an anchor gives evenly spaced times instead; the anchor
+    slowly follows the media clock (the sound card's clock drifts against it) and jumps to it
+    after a gap, when samples were lost or the capture stalled."""
+
+    def __init__(self, rate, tolerance=0.25):
+        self.rate = rate
+        self.tolerance = tolerance  # Seconds off the media clock before re-anchoring
+        self._anchor = None  # Media time of the first sample counted
+        self._frames = 0
+
+    def advance(self, frames):
+        """Count `frames` frames that were just captured and return the media time of the first one"""
+        now = media_time()
+        if self._anchor is None:
+            self._anchor = now - frames / self.rate
+        error = now - (self._anchor + (self._frames + frames) / self.rate)
+        if abs(error) > self.tolerance:
+            self._anchor += error
+        else:
+            self._anchor += error * 0.01
+        start = self._anchor + self._frames / self.rate
+        self._frames += frames
+        return start
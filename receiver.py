@@ -14,6 +14,9 @@ import platform
 import tempfile
 import io
 import uuid
+import zlib
+import shlex
+import importlib.util
 import pyautogui  # For mouse and keyboard control
 from PIL import ImageGrab, Image
 from pathlib import Path
@@ -27,6 +30,46 @@ except ImportError:
     print("Warning: Audio streaming not available. Install required packages with: pip install pyaudio sounddevice numpy")
     AUDIO_AVAILABLE = False
 
+# sounddevice capture and playback, used when PyAudio isn't installed
+try:
+    import numpy as np
+    from audio_buffer import JitterBuffer, SampleRing
+    from audio_codec import AudioDecoder
+    from audio_format import VOICE_FORMAT, AudioFormat, FormatConverter, to_float32
+    from audio_stream import AudioStreamListener
+    from audio_upload import AudioUploadBatcher
+    from voice_activity import VoiceActivityDetector
+    SOUNDDEVICE_AVAILABLE = importlib.util.find_spec("sounddevice") is not None
+except ImportError:
+    SOUNDDEVICE_AVAILABLE = False
+sd = None  # sounddevice, imported by load_sounddevice() when audio first starts
+
+def load_sounddevice():
+    """Import sounddevice. Done on first use, not at startup: the import initializes PortAudio,
+    which scans every device (raises OSError when the PortAudio library isn't installed)"""
+    global sd
+    if sd is None:
+        import sounddevice
+        sd = sounddevice
+    return sd
+
+# Import video encoding functionality (optional H.264 screen transport)
+try:
+    from video_encoder import VideoEncoder
+    VIDEO_AVAILABLE = True
+except ImportError:
+    print("Warning: Video streaming not available. Install required packages with: pip install av")
+    VIDEO_AVAILABLE = False
+
+from input_backend import InputBackend
+from shell_session import ShellPool
+from system_info import SystemMonitor
+from remote_fs import RemoteFS
+from tar_stream import extract_stream, stream_directory
+import delta_sync
+from media_clock import media_time
+from screen_pipeline import AdaptiveQualityController, FramePacer, ScreenCapture, bgra_to_image, cursor_shape, fit_size
+
 # Set your server URL here
 SERVER_URL = "https://render-remote.onrender.com"
 
@@ -40,23 +83,77 @@ class Receiver:
         self.screen_sharing_active = False
         self.screen_quality = 85  # JPEG quality (0-100) - increased for better quality
         self.screen_interval = 0.033  # ~30 FPS (1/30 second between captures)
+        self.screen_scale = 1.0  # Extra downscale factor chosen by the adaptive controller
+        self.quality_controller = AdaptiveQualityController()
+        self.viewer_count = None  # Viewers reported by the server (None = unknown, capture at full rate)
+        self.idle_heartbeat = 5.0  # seconds between frames while nobody is watching
+        self.last_screen_upload = 0
+        self.last_viewer_check = 0
+        self.screen_pacer = FramePacer(self.screen_interval)
         self.screen_thread = None
+        self.cursor_thread = None
+        self.cursor_interval = 1 / 60  # seconds between cursor checks, only changes are sent
         self.stop_event = threading.Event()
-        self.last_screen_hash = None  # Store hash of last screen to reduce redundant updates
+        self.last_screen_hashes = {}  # Hash of the last frame of each monitor to reduce redundant updates
+        self.screen_capture = ScreenCapture()
+        self.screen_monitors = [1]  # mss monitor indices being streamed, each one is its own channel
+        self.monitor_layout = {}  # mss index -> position and size on the virtual desktop
+        self.screen_seq = {}  # Frame sequence number of each monitor channel
+        self.screen_roi = None  # Region of interest requested by a viewer (monitor and rectangle in its pixels)
+        self.roi_quality = 90  # JPEG quality of the native resolution region of interest
+        self.screen_mode = "jpeg"  # Transport requested by the viewer: 'jpeg' or 'h264'
+        self.video_encoders = {}  # One H.264 encoder per monitor
         
-        # Audio streaming
+        # Audio streaming, set up by the first !audio_start (see get_audio_streamer)
         self.audio_streamer = None
-        if AUDIO_AVAILABLE:
-            try:
-                self.audio_streamer = AudioStreamer(server_url, self.device_id)
-                print("Audio streaming support initialized")
-            except Exception as e:
-                print(f"Error initializing audio: {str(e)}")
+        
+        # sounddevice microphone (without PyAudio): callback -> ring -> sender thread -> upload batcher
+        self.mic_stream = None
+        self.mic_ring = None
+        self.mic_uploader = None
+        self.mic_thread = None
+        self.mic_running = False
+        self.mic_rate = 44100  # Capture rate, converted to VOICE_FORMAT (16 kHz mono int16) before upload
+        self.mic_channels = 1
+        self.mic_blocksize = 1024
+        self.mic_ring_seconds = 2  # Capture the sender thread can fall behind by before blocks are dropped
+        self.mic_input_overflows = 0
+        self.mic_vad = True  # Skip uploading silence
+        
+        # sounddevice speakers, playing what the viewer says (the 'talk' audio channel):
+        # audio stream listener thread -> decoder -> jitter buffer -> callback
+        self.speaker_stream = None
+        self.speaker_listener = None
+        self.speaker_thread = None
+        self.speaker_running = False
+        self.jitter_buffer = None
+        self.speaker_blocksize = 1024
+        self.speaker_target_ms = 300  # Above the 200 ms upload frames, so one late frame doesn't underrun
+        
+        # Mouse and keyboard input, handled by its own thread whether or not the screen is shared
+        self.input_active = False
+        self.input_thread = None
+        self.input_stop_event = threading.Event()
+        self.input_idle = threading.Event()  # Cleared while a batch of input is being executed
+        self.input_idle.set()
+        self.input_priority_wait = 0.05  # seconds a frame upload may wait for input to finish
+        self.input_poll_timeout = 20  # seconds the server may hold an input long poll
+        self.input_backend = InputBackend()
+        
+        # Persistent shells for sender sessions, a couple of them started ahead of time
+        self.shell_pool = ShellPool()
+        
+        # Structured host/process info for !sysinfo and !ps, instead of running systeminfo/tasklist
+        self.system_monitor = SystemMonitor()
+        
+        # Cached, paginated directory listings for !ls, !stat and !find
+        self.remote_fs = RemoteFS()
+        self.command_poll_timeout = 20  # seconds the server holds a command poll open when there is nothing to run
         
         # Terminal command handling
         self.terminal_active = False
         self.terminal_thread = None
-        self.terminal_poll_interval = 1.0  # seconds between terminal command polls
+        self.terminal_poll_interval = 1.0  # seconds to wait after a failed terminal command poll
         
         print(f"\n{'=' * 50}")
         print(f"   SirAbody Remote Command Receiver")
@@ -79,43 +176,11 @@ class Receiver:
             # Fallback to random UUID if system info fails
             return str(uuid.uuid4())[:12]
     
-    def execute_command(self, command):
-        """Execute a command on the system and return the output"""
+    def execute_command(self, command, session_id=None):
+        """Execute a command in the sender session's persistent shell and return the output"""
         try:
-            # Create an appropriate shell based on the system
-            if self.system == "Windows":
-                process = subprocess.Popen(
-                    command,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    shell=True,
-                    universal_newlines=True,
-                    encoding='utf-8',
-                    errors='replace'
-                )
-            else:  # Linux or macOS
-                process = subprocess.Popen(
-                    command,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    shell=True,
-                    executable='/bin/bash',
-                    universal_newlines=True,
-                    encoding='utf-8',
-                    errors='replace'
-                )
-            
-            stdout, stderr = process.communicate()
-            return_code = process.returncode
-            
-            result = {
-                "stdout": stdout,
-                "stderr": stderr,
-                "return_code": return_code
-            }
-            
-            return result
-        
+            # The shell outlives the command, so cd and environment changes carry over
+            return self.shell_pool.execute(session_id or "default", command)
         except Exception as e:
             return {
                 "stdout": "",
@@ -124,17 +189,115 @@ class Receiver:
             }
     
     def poll_commands(self):
-        """Poll the server for new commands"""
+        """Long-poll the server for new commands, returns None if the server couldn't be reached"""
         try:
-            response = requests.get(f"{self.server_url}/api/get-commands")
+            response = requests.get(
+                f"{self.server_url}/api/get-commands",
+                params={"timeout": self.command_poll_timeout},
+                timeout=self.command_poll_timeout + 10
+            )
             if response.status_code == 200:
                 return response.json()
             else:
                 print(f"Error polling commands: {response.status_code} - {response.text}")
-                return {}
+                return None
         except Exception as e:
             print(f"Error connecting to server: {str(e)}")
-            return {}
+            return None
+    
+    def _session_cwd(self, session_id):
+        """Current directory of the session's shell, so relative paths follow the sender's cd"""
+        try:
+            result = self.shell_pool.execute(session_id or "default", "cd" if self.system == 'Windows' else "pwd")
+            cwd = result["stdout"].strip()
+            if result["return_code"] == 0 and os.path.isdir(cwd):
+                return cwd
+        except Exception:
+            pass
+        return os.getcwd()
+    
+    def _split_args(self, text):
+        """Split command arguments into positional values and key=value options"""
+        # posix=False keeps Windows backslashes, quotes are stripped by hand
+        values, options = [], {}
+        for part in shlex.split(text, posix=False):
+            part = part.strip('"\'')
+            key, sep, value = part.partition("=")
+            if sep and key in ("offset", "limit", "depth", "block"):
+                options[key] = value
+            else:
+                values.append(part)
+        return values, options
+    
+    def handle_delta_command(self, cmd, session_id=None):
+        """!signature <path> block=N: upload the block signature of our copy of a file
+        !patch <delta_file_id> <path>: rebuild the file from our copy and an uploaded delta"""
+        name, _, rest = cmd.partition(" ")
+        try:
+            values, options = self._split_args(rest)
+            cwd = self._session_cwd(session_id)
+            
+            if name == "!signature":
+                if not values:
+                    return {"stdout": "", "stderr": "Usage: !signature <path> [block=N]", "return_code": 1}
+                path = os.path.join(cwd, values[0])
+                block_size = int(options.get("block", 0)) or delta_sync.block_size_for(os.path.getsize(path) if os.path.isfile(path) else 0)
+                signature = delta_sync.signature(path, block_size)
+                # Transient: downloadable by the sender but not listed with the user's files
+                response = requests.post(
+                    f"{self.server_url}/api/upload-file",
+                    params={"transient": 1},
+                    files={'file': ("signature.bin", signature)}
+                )
+                response.raise_for_status()
+                result = {
+                    "file_id": response.json()["file_id"],
+                    "path": path,
+                    "exists": os.path.isfile(path),
+                    "block_size": block_size,
+                    "signature_size": len(signature)
+                }
+            else:
+                if len(values) < 2:
+                    return {"stdout": "", "stderr": "Usage: !patch <delta_file_id> <path>", "return_code": 1}
+                path = os.path.join(cwd, values[1])
+                response = requests.get(f"{self.server_url}/api/download-file/{values[0]}", stream=True)
+                response.raise_for_status()
+                response.raw.decode_content = True
+                # The delta is read as it downloads and the file is only replaced once it checks out
+                result = delta_sync.apply_delta(path, response.raw, path)
+                result["path"] = path
+            
+            return {"stdout": json.dumps(result), "stderr": "", "return_code": 0}
+        except (OSError, ValueError, requests.RequestException) as e:
+            return {"stdout": "", "stderr": str(e), "return_code": 1}
+    
+    def handle_fs_command(self, cmd, session_id=None):
+        """!ls [path] [offset=N] [limit=N], !stat <path>, !find <root> <pattern> [offset=N] [limit=N] [depth=N]
+        Results are JSON, with paths relative to the session's current directory"""
+        name, _, rest = cmd.partition(" ")
+        try:
+            values, options = self._split_args(rest)
+            offset = max(0, int(options.get("offset", 0)))
+            limit = min(max(1, int(options.get("limit", 200))), 5000)
+            cwd = self._session_cwd(session_id)
+            
+            if name == "!ls":
+                result = self.remote_fs.list_dir(os.path.join(cwd, values[0]) if values else cwd, offset, limit)
+            elif name == "!stat":
+                if not values:
+                    return {"stdout": "", "stderr": "Usage: !stat <path>", "return_code": 1}
+                result = self.remote_fs.stat(os.path.join(cwd, values[0]))
+            else:
+                if not values:
+                    return {"stdout": "", "stderr": "Usage: !find [root] <pattern> [offset=N] [limit=N] [depth=N]", "return_code": 1}
+                root, pattern = (values[0], values[1]) if len(values) > 1 else (".", values[0])
+                depth = int(options["depth"]) if "depth" in options else None
+                result = self.remote_fs.find(os.path.join(cwd, root), pattern, offset, limit, depth)
+            
+            return {"stdout": json.dumps(result), "stderr": "", "return_code": 0}
+        except (OSError, ValueError) as e:
+            return {"stdout": "", "stderr": str(e), "return_code": 1}
     
     def send_command_output(self, command_id, output):
         """Send command output back to the server"""
@@ -165,6 +328,16 @@ class Receiver:
             )
             
             if response.status_code == 200:
+                archive = response.headers.get('X-Archive')
+                if archive:
+                    # A directory sent as one tar stream: unpack it while it downloads
+                    response.raw.decode_content = True
+                    files, size, skipped = extract_stream(response.raw, destination, compressed=(archive == 'tar.gz'))
+                    print(f"Extracted {files} files ({size} bytes) to {destination}")
+                    if skipped:
+                        print(f"Skipped {len(skipped)} links or unsafe paths: {', '.join(skipped[:10])}")
+                    return destination
+                
                 # Check if there's a filename in the Content-Disposition header
                 filename = None
                 content_disposition = response.headers.get('Content-Disposition')
@@ -203,6 +376,24 @@ class Receiver:
                 print(f"File not found: {file_path}")
                 return None
             
+            if os.path.isdir(file_path):
+                # Directories go up as a single tar.gz stream
+                chunks = stream_directory(file_path)
+                try:
+                    response = requests.post(
+                        f"{self.server_url}/api/upload-stream",
+                        params={"filename": f"{os.path.basename(os.path.normpath(file_path))}.tar.gz", "archive": "tar.gz"},
+                        data=chunks,
+                        headers={"Content-Type": "application/octet-stream"}
+                    )
+                finally:
+                    # Stops the packer if the upload failed halfway
+                    chunks.close()
+                if response.status_code == 200:
+                    return response.json()
+                print(f"Error uploading directory: {response.status_code} - {response.text}")
+                return None
+            
             with open(file_path, 'rb') as f:
                 files = {'file': (os.path.basename(file_path), f)}
                 response = requests.post(
@@ -233,70 +424,290 @@ class Receiver:
             return {}
     
     # Screen sharing functionality
-    def capture_screen(self):
-        """Capture the current screen and return it as a compressed JPEG image"""
+    def _grab_screen(self, monitor=1):
+        """Grab a monitor, returning (image, screen_width, screen_height) or None if unchanged"""
+        # Capture the monitor using faster method if available
         try:
-            # Capture the entire screen using faster method if available
-            import mss  # If available, mss is much faster than PIL.ImageGrab
-            import hashlib
-            import numpy as np
-            
-            # Use mss for faster screen capture if available
-            try:
-                with mss.mss() as sct:
-                    monitor = sct.monitors[1]  # Primary monitor
-                    sct_img = sct.grab(monitor)
-                    img_array = np.array(sct_img)
-                    img = Image.fromarray(img_array)
-            except Exception:
-                # Fallback to ImageGrab if mss not available
-                img = ImageGrab.grab()
-            
-            # Get the screen dimensions for mouse control
-            screen_width, screen_height = img.size
-            
-            # Resize image to reduce bandwidth if it's large
-            if screen_width > 1920 or screen_height > 1080:
-                img = img.resize((min(screen_width, 1920), min(screen_height, 1080)), resample=1)
-            
-            # Generate a hash of the image to check for changes
-            # This prevents sending identical frames
-            img_hash = hashlib.md5(np.array(img).tobytes()).hexdigest()
-            
-            # If the image hasn't changed, return None to skip this update
-            if img_hash == self.last_screen_hash:
+            shot = self.screen_capture.grab(monitor)
+            screen_width, screen_height = shot.size
+            raw = shot.raw
+            self.monitor_layout[monitor] = {"index": monitor, "left": shot.left, "top": shot.top, "width": screen_width, "height": screen_height}
+        except Exception:
+            # Fallback to ImageGrab if mss not available (primary screen only)
+            if monitor != 1:
                 return None
-            
-            # Store the new hash
-            self.last_screen_hash = img_hash
-                
-            # Convert to RGB mode if it's RGBA (to avoid JPEG error with alpha channel)
-            if img.mode == 'RGBA':
+            shot = None
+            img = ImageGrab.grab()
+            if img.mode != 'RGB':
                 img = img.convert('RGB')
+            screen_width, screen_height = img.size
+            raw = img.tobytes()
+        
+        # Resize image to reduce bandwidth if it's large (keeping the aspect ratio), then apply the adaptive downscale
+        target_size = fit_size(screen_width, screen_height, scale=self.screen_scale)
+        
+        # Hash the raw capture buffer before any conversion, so unchanged frames cost nothing more.
+        # The target size is part of the key so a scale change still sends a frame
+        img_hash = (zlib.crc32(raw), target_size)
+        
+        # If the image hasn't changed, return None to skip this update
+        if img_hash == self.last_screen_hashes.get(monitor):
+            return None
+        
+        # Store the new hash
+        self.last_screen_hashes[monitor] = img_hash
+        
+        # Wrap the BGRA buffer directly as RGB (no alpha channel, so it's ready for JPEG and H.264)
+        if shot is not None:
+            img = bgra_to_image(raw, shot.size)
+        if target_size != img.size:
+            img = img.resize(target_size, resample=Image.BILINEAR)
+        
+        return img, screen_width, screen_height
+    
+    def _next_screen_seq(self, monitor):
+        """Return the next frame sequence number of a monitor channel"""
+        seq = self.screen_seq.get(monitor, 0) + 1
+        self.screen_seq[monitor] = seq
+        return seq
+    
+    def capture_screen(self, monitor=1):
+        """Capture a monitor and return it as a compressed JPEG image"""
+        try:
+            capture_time = media_time()
+            grabbed = self._grab_screen(monitor)
+            if grabbed is None:
+                return None
+            img, screen_width, screen_height = grabbed
                 
             # Compress to JPEG
             buffer = io.BytesIO()
             img.save(buffer, format="JPEG", quality=self.screen_quality)
             
-            # Get current mouse position
-            mouse_x, mouse_y = pyautogui.position()
-            
             # Convert to base64 for transmission
-            img_base64 = base64.b64encode(buffer.getvalue()).decode()
+            img_base64 = base64.b64encode(buffer.getbuffer()).decode()
             return {
                 "image": img_base64,
                 "width": img.width,
                 "height": img.height,
                 "screen_width": screen_width,
                 "screen_height": screen_height,
-                "mouse_x": mouse_x,
-                "mouse_y": mouse_y,
-                "timestamp": time.time()
+                "monitor": monitor,
+                "seq": self._next_screen_seq(monitor),
+                "timestamp": time.time(),
+                "capture_time": capture_time  # Media clock, shared with the audio chunks
             }
         except Exception as e:
             print(f"Error capturing screen: {str(e)}")
             return None
     
+    def capture_roi(self):
+        """Capture the region of interest at native resolution and return it as a compressed JPEG image"""
+        try:
+            roi = self.screen_roi
+            layout = self.monitor_layout.get(roi["monitor"])
+            if not layout:
+                return None
+            
+            # Clamp the rectangle to its monitor
+            x = max(0, min(int(roi["x"]), layout["width"] - 1))
+            y = max(0, min(int(roi["y"]), layout["height"] - 1))
+            width = max(1, min(int(roi["width"]), layout["width"] - x))
+            height = max(1, min(int(roi["height"]), layout["height"] - y))
+            left = layout["left"] + x
+            top = layout["top"] + y
+            
+            capture_time = media_time()
+            try:
+                shot = self.screen_capture.grab_region(left, top, width, height)
+                raw = shot.raw
+            except Exception:
+                # Fallback to ImageGrab if mss not available
+                shot = None
+                img = ImageGrab.grab(bbox=(left, top, left + width, top + height))
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
+                raw = img.tobytes()
+            
+            # Skip unchanged regions, like full frames
+            img_hash = (zlib.crc32(raw), x, y, width, height)
+            if img_hash == self.last_screen_hashes.get("roi"):
+                return None
+            self.last_screen_hashes["roi"] = img_hash
+            
+            if shot is not None:
+                img = bgra_to_image(raw, shot.size)
+            
+            # Native resolution, unless the region is larger than a full HD frame
+            target_size = fit_size(width, height)
+            if target_size != img.size:
+                img = img.resize(target_size, resample=Image.BILINEAR)
+            
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=self.roi_quality)
+            
+            return {
+                "image": base64.b64encode(buffer.getbuffer()).decode(),
+                "width": img.width,
+                "height": img.height,
+                "monitor": roi["monitor"],
+                "roi": {"x": x, "y": y, "width": width, "height": height},
+                "seq": self._next_screen_seq("roi"),
+                "timestamp": time.time(),
+                "capture_time": capture_time
+            }
+        except Exception as e:
+            print(f"Error capturing region of interest: {str(e)}")
+            return None
+    
+    def capture_video_segments(self, monitor=1):
+        """Capture a monitor and encode it into H.264 fragmented MP4 segments"""
+        try:
+            capture_time = media_time()
+            grabbed = self._grab_screen(monitor)
+            if grabbed is None:
+                return None
+            img, screen_width, screen_height = grabbed
+            
+            # Recreate the encoder if the frame size changed (new stream for the viewer)
+            encoder = self.video_encoders.get(monitor)
+            if encoder is None or encoder.width != img.width - (img.width % 2) or encoder.height != img.height - (img.height % 2):
+                self._close_video_encoders([monitor])
+                encoder = VideoEncoder(img.width, img.height, fps=max(1, int(round(1 / self.screen_interval))))
+                self.video_encoders[monitor] = encoder
+            
+            timestamp = time.time()
+            segments = encoder.encode(img, timestamp, capture_time)
+            if not segments:
+                return None
+            
+            return {
+                "stream_id": encoder.stream_id,
+                "init": base64.b64encode(encoder.init_segment).decode(),
+                "mime": encoder.mime,
+                "segments": [{
+                    "seq": segment["seq"],
+                    "data": base64.b64encode(segment["data"]).decode(),
+                    "keyframe": segment["keyframe"],
+                    "capture_time": segment["capture_time"]
+                } for segment in segments],
+                "width": encoder.width,
+                "height": encoder.height,
+                "screen_width": screen_width,
+                "screen_height": screen_height,
+                "monitor": monitor,
+                "timestamp": timestamp,
+                "capture_time": capture_time
+            }
+        except Exception as e:
+            print(f"Error encoding video: {str(e)}")
+            self._close_video_encoders([monitor])
+            return None
+    
+    def _close_video_encoders(self, monitors=None):
+        """Close the video encoders of the given monitors (all of them by default)"""
+        for monitor in list(self.video_encoders.keys()) if monitors is None else monitors:
+            encoder = self.video_encoders.pop(monitor, None)
+            if encoder is not None:
+                encoder.close()
+    
+    def _list_monitors(self):
+        """Refresh the monitor layout, returning the list of monitors"""
+        try:
+            self.monitor_layout = {monitor["index"]: monitor for monitor in self.screen_capture.monitors()}
+        except Exception:
+            # Without mss only the primary screen can be captured
+            width, height = pyautogui.size()
+            self.monitor_layout = {1: {"index": 1, "left": 0, "top": 0, "width": width, "height": height}}
+        return list(self.monitor_layout.values())
+    
+    def _apply_monitor_selection(self, monitors):
+        """Stream the given monitors, returning False if none of them exist"""
+        if not self.monitor_layout:
+            self._list_monitors()
+        selected = sorted(set(int(monitor) for monitor in monitors if int(monitor) in self.monitor_layout))
+        if not selected:
+            return False
+        if selected == self.screen_monitors:
+            return True
+        
+        print(f"\nStreaming monitor(s): {', '.join(str(monitor) for monitor in selected)}")
+        self._close_video_encoders([monitor for monitor in self.screen_monitors if monitor not in selected])
+        self.screen_monitors = selected
+        # Force a full frame on every newly selected channel
+        self.last_screen_hashes.clear()
+        return True
+    
+    def _wait_for_viewer(self, timeout):
+        """Long-poll the server until a viewer is watching or the timeout expires"""
+        try:
+            response = requests.get(
+                f"{self.server_url}/api/wait-viewer/{self.device_id}",
+                params={"timeout": timeout},
+                timeout=timeout + 5
+            )
+            
+            if response.status_code == 200:
+                self._set_viewer_count(response.json().get("viewers", 0))
+            elif response.status_code == 404:
+                # Server without viewer tracking, capture at full rate
+                self._set_viewer_count(None)
+            else:
+                time.sleep(timeout)
+        except Exception as e:
+            print(f"Error checking for viewers: {str(e)}")
+            time.sleep(timeout)
+    
+    def _set_viewer_count(self, count):
+        """Update the number of viewers and report throttling changes"""
+        if count == 0 and self.viewer_count != 0:
+            print("\nNo viewers, screen capture dropped to heartbeat mode")
+        elif count and not self.viewer_count:
+            print("\nViewer connected, screen capture at full rate")
+        
+        self.viewer_count = count
+        self.last_viewer_check = time.time()
+    
+    def _apply_operating_point(self):
+        """Copy the adaptive controller's operating point into the capture settings"""
+        controller = self.quality_controller
+        if not controller.enabled:
+            return
+        
+        if controller.scale != self.screen_scale:
+            # Different frame size, make sure the next frame is sent
+            self.last_screen_hashes.clear()
+        self.screen_quality = controller.quality
+        self.screen_interval = controller.interval
+        self.screen_scale = controller.scale
+    
+    def _screen_capabilities(self):
+        """List the screen transports this receiver can produce"""
+        return ["jpeg", "h264"] if VIDEO_AVAILABLE else ["jpeg"]
+    
+    def _apply_screen_mode(self, mode):
+        """Switch screen transport when the viewer negotiated a different one"""
+        if mode not in self._screen_capabilities() or mode == self.screen_mode:
+            return
+        
+        print(f"\nScreen transport switched to {mode}")
+        self.screen_mode = mode
+        self._close_video_encoders()
+        # Force a full frame on the new transport
+        self.last_screen_hashes.clear()
+    
+    def _apply_roi(self, roi):
+        """Start, move or stop the region of interest stream"""
+        if roi == self.screen_roi:
+            return
+        
+        if roi:
+            print(f"\nZoom region on monitor {roi['monitor']}: {roi['width']}x{roi['height']} at ({roi['x']}, {roi['y']})")
+        else:
+            print("\nZoom region stopped")
+        self.screen_roi = roi
+        self.last_screen_hashes.pop("roi", None)
+    
     def start_screen_sharing(self):
         """Start the screen sharing thread"""
         if self.screen_sharing_active:
@@ -311,6 +722,11 @@ class Receiver:
         self.screen_thread.daemon = True
         self.screen_thread.start()
         
+        # The cursor goes on its own channel so it moves smoothly at any frame rate
+        self.cursor_thread = threading.Thread(target=self._cursor_loop)
+        self.cursor_thread.daemon = True
+        self.cursor_thread.start()
+        
         print(f"Screen sharing started with Device ID: {self.device_id}")
         print(f"To view, go to {self.server_url} and enter this Device ID")
         return "Screen sharing started"
@@ -323,95 +739,30 @@ class Receiver:
         # Signal the thread to stop
         self.stop_event.set()
         
-        # Wait for the thread to finish
+        # Wait for the threads to finish
         if self.screen_thread and self.screen_thread.is_alive():
             self.screen_thread.join(timeout=5)
+        if self.cursor_thread and self.cursor_thread.is_alive():
+            self.cursor_thread.join(timeout=5)
             
         self.screen_sharing_active = False
+        self._close_video_encoders()
         print("Screen sharing stopped")
         return "Screen sharing stopped"
     
-    def control_mouse(self, action, x=None, y=None, button=None):
+    def _monitor_offsets(self):
+        """Map each monitor index to its (left, top) on the virtual desktop"""
+        return {index: (layout["left"], layout["top"]) for index, layout in self.monitor_layout.items()}
+    
+    def control_mouse(self, action, x=None, y=None, button=None, monitor=None):
         """Control the mouse based on action received from server"""
-        try:
-            if action == "move":
-                if x is not None and y is not None:
-                    # Move mouse to the specified position
-                    pyautogui.moveTo(x, y)
-                    return {"status": "success", "action": "move"}
-            
-            elif action == "click":
-                # Perform mouse click
-                if button == "left":
-                    pyautogui.click()
-                elif button == "right":
-                    pyautogui.rightClick()
-                elif button == "double":
-                    pyautogui.doubleClick()
-                return {"status": "success", "action": "click", "button": button}
-            
-            elif action == "scroll":
-                # Scroll up or down
-                amount = y if y is not None else 0  # y positive = scroll down, negative = scroll up
-                pyautogui.scroll(amount)
-                return {"status": "success", "action": "scroll", "amount": amount}
-            
-            elif action == "down":
-                # Mouse button down for drag operations
-                if button == "left":
-                    pyautogui.mouseDown()
-                elif button == "right":
-                    pyautogui.mouseDown(button='right')
-                return {"status": "success", "action": "down", "button": button}
-            
-            elif action == "up":
-                # Mouse button up for drag operations
-                if button == "left":
-                    pyautogui.mouseUp()
-                elif button == "right":
-                    pyautogui.mouseUp(button='right')
-                return {"status": "success", "action": "up", "button": button}
-            
-            return {"status": "error", "message": "Invalid mouse action"}
-        except Exception as e:
-            print(f"Error controlling mouse: {str(e)}")
-            return {"status": "error", "message": str(e)}
+        # Coordinates are relative to the monitor the viewer is looking at
+        offset = self._monitor_offsets().get(monitor, (0, 0))
+        return self.input_backend.mouse(action, x, y, button, offset)
     
     def handle_keyboard_input(self, input_type, input_value):
         """Handle keyboard input received from server"""
-        try:
-            if input_type == "text":
-                # Type text character by character
-                pyautogui.write(input_value)
-                return {"status": "success", "type": "text"}
-            
-            elif input_type == "shortcut":
-                # Handle keyboard shortcuts
-                if input_value == "ctrl+c":
-                    pyautogui.hotkey('ctrl', 'c')
-                elif input_value == "ctrl+v":
-                    pyautogui.hotkey('ctrl', 'v')
-                elif input_value == "alt+tab":
-                    pyautogui.hotkey('alt', 'tab')
-                elif input_value == "ctrl+alt+del":
-                    pyautogui.hotkey('ctrl', 'alt', 'del')
-                elif input_value == "win":
-                    pyautogui.press('win')
-                elif input_value == "escape":
-                    pyautogui.press('escape')
-                elif input_value == "enter":
-                    pyautogui.press('enter')
-                else:
-                    # Handle any other shortcuts or individual keys
-                    keys = input_value.split('+')
-                    pyautogui.hotkey(*keys)
-                
-                return {"status": "success", "type": "shortcut", "shortcut": input_value}
-            
-            return {"status": "error", "message": "Invalid keyboard input type"}
-        except Exception as e:
-            print(f"Error handling keyboard input: {str(e)}")
-            return {"status": "error", "message": str(e)}
+        return self.input_backend.keyboard(input_type, input_value)
     
     def execute_terminal_command(self, command):
         """Execute a terminal/cmd command and return the output"""
@@ -451,220 +802,6 @@ class Receiver:
                 "message": str(e)
             }
     
-    def start_audio_streaming(self, audio_type='microphone'):
-        """Start audio streaming (microphone or speaker)"""
-        try:
-            if not AUDIO_AVAILABLE:
-                return "Audio streaming not available (missing dependencies)"
-            
-            if audio_type == 'microphone':
-                return self.start_microphone()
-            elif audio_type == 'speaker':
-                return self.start_speakers()
-            else:
-                return f"Unknown audio type: {audio_type}"
-        except Exception as e:
-            return f"Error starting audio streaming: {str(e)}"
-    
-    def stop_audio_streaming(self, audio_type='microphone'):
-        """Stop audio streaming (microphone or speaker)"""
-        try:
-            if not AUDIO_AVAILABLE:
-                return "Audio streaming not available (missing dependencies)"
-            
-            if audio_type == 'microphone':
-                return self.stop_microphone()
-            elif audio_type == 'speaker':
-                return self.stop_speakers()
-            else:
-                return f"Unknown audio type: {audio_type}"
-        except Exception as e:
-            return f"Error stopping audio streaming: {str(e)}"
-                
-    def start_microphone(self):
-        """Start audio streaming from the microphone"""
-        try:
-            # Check if already running
-            if hasattr(self, 'mic_stream') and self.mic_stream is not None:
-                return "Microphone streaming already active"
-            
-            # Define callback function
-            def mic_callback(indata, frames, time, status):
-                if status:
-                    print(f"Microphone status: {status}")
-                
-                # Convert audio data to bytes and send it
-                try:
-                    audio_data = indata.tobytes()
-                    # Compress and encode audio data
-                    encoded_audio = base64.b64encode(audio_data).decode('utf-8')
-                    
-                    # Send to server
-                    self.upload_audio(encoded_audio, 'microphone')
-                except Exception as e:
-                    print(f"Error in microphone callback: {e}")
-            
-            # Start the audio stream
-            self.mic_stream = sd.InputStream(
-                callback=mic_callback,
-                channels=1,
-                samplerate=44100,
-                blocksize=1024
-            )
-            self.mic_stream.start()
-            
-            return "Microphone streaming started"
-        except Exception as e:
-            return f"Error starting microphone: {str(e)}"
-    
-    def stop_microphone(self):
-        """Stop audio streaming from the microphone"""
-        try:
-            if hasattr(self, 'mic_stream') and self.mic_stream is not None:
-                self.mic_stream.stop()
-                self.mic_stream.close()
-                self.mic_stream = None
-                return "Microphone streaming stopped"
-            else:
-                return "No active microphone stream to stop"
-        except Exception as e:
-            return f"Error stopping microphone: {str(e)}"
-    
-    def start_speakers(self):
-        """Start audio streaming to the speakers"""
-        try:
-            # Check if already running
-            if hasattr(self, 'speaker_stream') and self.speaker_stream is not None:
-                return "Speaker streaming already active"
-            
-            # Start thread to poll for audio data
-            self.speaker_running = True
-            self.speaker_thread = threading.Thread(target=self.speaker_polling_thread)
-            self.speaker_thread.daemon = True
-            self.speaker_thread.start()
-            
-            return "Speaker streaming started"
-        except Exception as e:
-            return f"Error starting speakers: {str(e)}"
-    
-    def stop_speakers(self):
-        """Stop audio streaming to the speakers"""
-        try:
-            if hasattr(self, 'speaker_stream') and self.speaker_stream is not None:
-                self.speaker_stream.stop()
-                self.speaker_stream.close()
-                self.speaker_stream = None
-            
-            if hasattr(self, 'speaker_running'):
-                self.speaker_running = False
-            
-            if hasattr(self, 'speaker_thread') and self.speaker_thread is not None:
-                self.speaker_thread.join(timeout=1.0)
-                self.speaker_thread = None
-                
-            return "Speaker streaming stopped"
-        except Exception as e:
-            return f"Error stopping speakers: {str(e)}"
-    
-    def speaker_polling_thread(self):
-        """Thread function to poll for audio data and play it"""
-        try:
-            # Define callback function for output stream
-            def speaker_callback(outdata, frames, time, status):
-                if status:
-                    print(f"Speaker status: {status}")
-                
-                # Check if we have audio data in our buffer
-                if len(self.audio_buffer) > 0:
-                    # Get the oldest audio data from the buffer
-                    audio_data = self.audio_buffer.pop(0)
-                    
-                    # Convert to numpy array for sounddevice
-                    try:
-                        audio_array = np.frombuffer(audio_data, dtype=np.float32)
-                        if len(audio_array) >= frames * 1:  # 1 channel
-                            # Reshape to match expected dimensions
-                            audio_array = audio_array[:frames * 1].reshape(frames, 1)
-                            outdata[:] = audio_array
-                        else:
-                            # Not enough data, fill with zeros
-                            outdata[:] = np.zeros((frames, 1), dtype=np.float32)
-                    except Exception as e:
-                        print(f"Error processing audio data: {e}")
-                        outdata[:] = np.zeros((frames, 1), dtype=np.float32)
-                else:
-                    # No data available, fill with zeros
-                    outdata[:] = np.zeros((frames, 1), dtype=np.float32)
-            
-            # Initialize audio buffer if not exists
-            if not hasattr(self, 'audio_buffer'):
-                self.audio_buffer = []
-            
-            # Start output stream
-            self.speaker_stream = sd.OutputStream(
-                callback=speaker_callback,
-                channels=1,
-                samplerate=44100,
-                blocksize=1024
-            )
-            self.speaker_stream.start()
-            
-            # Poll for audio data from server
-            while self.speaker_running:
-                try:
-                    # Download audio data from server
-                    audio_data = self.download_audio()
-                    if audio_data:
-                        # Decode audio data and add to buffer
-                        decoded_audio = base64.b64decode(audio_data)
-                        self.audio_buffer.append(decoded_audio)
-                        
-                        # Limit buffer size to prevent memory issues
-                        while len(self.audio_buffer) > 10:  # Limit to 10 chunks
-                            self.audio_buffer.pop(0)
-                except Exception as e:
-                    print(f"Error in speaker polling thread: {e}")
-                
-                # Sleep to avoid excessive polling
-                time.sleep(0.05)  # 50ms interval
-        except Exception as e:
-            print(f"Error in speaker polling thread: {e}")
-            
-    def upload_audio(self, audio_data, audio_type='microphone'):
-        """Upload audio data to the server"""
-        try:
-            response = requests.post(
-                f"{self.server_url}/api/audio/upload/{self.device_id}",
-                json={
-                    "audio_data": audio_data,
-                    "audio_type": audio_type
-                }
-            )
-            return response.json()
-        except Exception as e:
-            print(f"Error uploading audio: {e}")
-            return None
-            
-    def download_audio(self, audio_type='speaker'):
-        """Download audio data from the server"""
-        try:
-            response = requests.get(
-                f"{self.server_url}/api/audio/download/{self.device_id}",
-                params={
-                    "audio_type": audio_type
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'audio_data' in data:
-                    return data['audio_data']
-            
-            return None
-        except Exception as e:
-            print(f"Error downloading audio: {e}")
-            return None
-    
     def start_terminal_polling(self):
         """Start polling for terminal commands"""
         if self.terminal_active:
@@ -706,8 +843,8 @@ class Receiver:
                 # Poll for terminal commands
                 response = requests.get(
                     f"{self.server_url}/api/get-commands",
-                    params={"device_id": self.device_id, "command_type": "terminal"},
-                    timeout=2
+                    params={"device_id": self.device_id, "command_type": "terminal", "timeout": self.command_poll_timeout},
+                    timeout=self.command_poll_timeout + 10
                 )
                 
                 if response.status_code == 200:
@@ -726,180 +863,369 @@ class Receiver:
                             self.send_command_output(command_id, result)
             except Exception as e:
                 print(f"Error in terminal polling: {str(e)}")
+                # Only wait after errors, the long poll itself paces the loop
+                time.sleep(self.terminal_poll_interval)
+    
+    def start_input_handling(self):
+        """Start the mouse and keyboard input thread"""
+        if self.input_active:
+            return "Input handling is already active"
+        
+        self.input_stop_event.clear()
+        self.input_active = True
+        
+        self.input_thread = threading.Thread(target=self._input_loop)
+        self.input_thread.daemon = True
+        self.input_thread.start()
+        
+        print("Input handling started")
+        return "Input handling started"
+    
+    def stop_input_handling(self):
+        """Stop the mouse and keyboard input thread"""
+        if not self.input_active:
+            return "Input handling is not active"
+        
+        self.input_stop_event.set()
+        if self.input_thread and self.input_thread.is_alive():
+            # The thread may be in the middle of a long poll
+            self.input_thread.join(timeout=self.input_poll_timeout + 5)
+        
+        self.input_active = False
+        print("Input handling stopped")
+        return "Input handling stopped"
+    
+    def _input_loop(self):
+        """Long-poll the server for mouse and keyboard events and execute them as they arrive"""
+        print("Starting input loop...")
+        # A connection of its own, so input never queues behind frame uploads
+        session = requests.Session()
+        while not self.input_stop_event.is_set():
+            try:
+                response = session.get(
+                    f"{self.server_url}/api/get-input/{self.device_id}",
+                    params={"timeout": self.input_poll_timeout},
+                    timeout=self.input_poll_timeout + 5
+                )
+                
+                if response.status_code != 200:
+                    print(f"Error polling input: {response.status_code}")
+                    self.input_stop_event.wait(1)
+                    continue
+                
+                events = response.json().get("events", [])
+                if not events:
+                    continue
                 
-            # Wait before next poll
-            time.sleep(self.terminal_poll_interval)
+                # Execute the whole batch, then send all results back at once
+                self.input_idle.clear()
+                try:
+                    outcomes = self.input_backend.execute_batch(events, self._monitor_offsets())
+                finally:
+                    self.input_idle.set()
+                
+                results = [{
+                    "kind": event.get("kind"),
+                    "command_id": event.get("command_id"),
+                    "result": outcome
+                } for event, outcome in zip(events, outcomes)]
+                
+                session.post(
+                    f"{self.server_url}/api/input-results/{self.device_id}",
+                    json={"results": results},
+                    timeout=2
+                )
+            except Exception as e:
+                print(f"Error in input loop: {str(e)}")
+                self.input_stop_event.wait(1)
+    
+    def _upload_screen(self, endpoint, body):
+        """Send one captured frame and follow what the server asks for, returning True on success"""
+        try:
+            response = requests.post(
+                f"{self.server_url}/api/{endpoint}",
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=5  # Timeout after 5 seconds
+            )
+            
+            if response.status_code != 200:
+                print(f"Error sending screen data: {response.status_code}")
+                return False
+            
+            print("Screen update sent successfully", end="\r")
+            self.last_screen_upload = time.time()
+            
+            # Follow the transport the viewer negotiated (if any)
+            response_data = response.json()
+            requested_mode = response_data.get("mode")
+            if requested_mode:
+                self._apply_screen_mode(requested_mode)
+            
+            # Stream the monitors the viewers picked (if any)
+            requested_monitors = response_data.get("monitors")
+            if requested_monitors:
+                self._apply_monitor_selection(requested_monitors)
+            
+            # Zoom region requested by a viewer (None stops it)
+            if "roi" in response_data:
+                self._apply_roi(response_data["roi"])
+            
+            # Throttle down or ramp up depending on who is watching
+            if response_data.get("viewers") is not None:
+                self._set_viewer_count(response_data["viewers"])
+            return True
+        except Exception as e:
+            print(f"Error sending screen data: {str(e)}")
+            return False
     
     def _screen_sharing_loop(self):
         """Main loop for screen capture and upload"""
         print("Starting screen capture loop...")
+        self.screen_pacer.reset()
+        self._list_monitors()
         while not self.stop_event.is_set():
+            # Wait for the next frame deadline (the interval may have been changed by the adaptive controller)
+            self.screen_pacer.interval = self.screen_interval
+            if not self.screen_pacer.wait(self.stop_event):
+                break
+            
             try:
-                # Capture screen
-                screen_data = self.capture_screen()
-                if screen_data:
+                # Nobody is watching: only send a heartbeat frame every few seconds
+                # and otherwise wait for a viewer to show up
+                if self.viewer_count == 0:
+                    idle_time = time.time() - self.last_screen_upload
+                    if idle_time < self.idle_heartbeat:
+                        self._wait_for_viewer(self.idle_heartbeat - idle_time)
+                        # Restart the schedule so the idle time isn't counted as skipped frames
+                        self.screen_pacer.reset()
+                        continue
+                    # Heartbeat frames are sent even if nothing changed
+                    self.last_screen_hashes.clear()
+                elif self.viewer_count and time.time() - self.last_viewer_check > self.idle_heartbeat:
+                    # A static screen uploads nothing, so check separately that the viewers are still there
+                    self._wait_for_viewer(0)
+                
+                # Capture every selected monitor using the negotiated transport
+                captures = []
+                for monitor in list(self.screen_monitors):
+                    if self.screen_mode == "h264":
+                        captures.append(("update-video", self.capture_video_segments(monitor)))
+                    else:
+                        captures.append(("update-screen", self.capture_screen(monitor)))
+                
+                # The zoom region always goes out as a native resolution JPEG next to the overview
+                if self.screen_roi:
+                    captures.append(("update-screen", self.capture_roi()))
+                
+                # Input goes first: hold frame uploads while a batch of input is being executed
+                self.input_idle.wait(self.input_priority_wait)
+                
+                sent_bytes = 0
+                upload_time = 0
+                for endpoint, screen_data in captures:
+                    if not screen_data:
+                        continue
+                    
                     # Prepare data to send
                     data = {
                         "device_id": self.device_id,
-                        "screen_data": screen_data
+                        "screen_data": screen_data,
+                        "capabilities": self._screen_capabilities(),
+                        "monitors": list(self.monitor_layout.values())
                     }
                     
                     # Send to server
-                    try:
-                        response = requests.post(
-                            f"{self.server_url}/api/update-screen",
-                            json=data,
-                            timeout=5  # Timeout after 5 seconds
-                        )
-                        
-                        if response.status_code == 200:
-                            print("Screen update sent successfully", end="\r")
-                            
-                            # Check for mouse control commands
-                            try:
-                                # Poll for mouse control commands
-                                mouse_control_response = requests.get(
-                                    f"{self.server_url}/api/get-mouse-control/{self.device_id}",
-                                    timeout=1  # Short timeout
-                                )
-                                
-                                if mouse_control_response.status_code == 200:
-                                    control_data = mouse_control_response.json()
-                                    if control_data and "action" in control_data:
-                                        # Execute mouse control
-                                        result = self.control_mouse(
-                                            control_data["action"],
-                                            control_data.get("x"),
-                                            control_data.get("y"),
-                                            control_data.get("button")
-                                        )
-                                        # Send result back
-                                        requests.post(
-                                            f"{self.server_url}/api/mouse-control-result/{self.device_id}",
-                                            json=result,
-                                            timeout=1
-                                        )
-                            except Exception as e:
-                                # Ignore errors in mouse control to keep screen sharing working
-                                pass
-                                
-                            # Check for keyboard input commands
-                            try:
-                                # Poll for keyboard commands
-                                keyboard_response = requests.get(
-                                    f"{self.server_url}/api/get-keyboard/{self.device_id}",
-                                    timeout=1  # Short timeout
-                                )
-                                
-                                if keyboard_response.status_code == 200:
-                                    keyboard_data = keyboard_response.json()
-                                    
-                                    # Process all pending keyboard commands
-                                    if "commands" in keyboard_data and keyboard_data["commands"]:
-                                        for cmd in keyboard_data["commands"]:
-                                            if "type" in cmd and "input" in cmd:
-                                                # Execute keyboard input
-                                                result = self.handle_keyboard_input(
-                                                    cmd["type"],
-                                                    cmd["input"]
-                                                )
-                                                
-                                                # Send result back
-                                                requests.post(
-                                                    f"{self.server_url}/api/keyboard-result/{self.device_id}",
-                                                    json={
-                                                        "command_id": cmd["command_id"],
-                                                        "result": result
-                                                    },
-                                                    timeout=1
-                                                )
-                            except Exception as e:
-                                # Ignore errors in keyboard input to keep screen sharing working
-                                pass
-                        else:
-                            print(f"Error sending screen data: {response.status_code}")
-                    except Exception as e:
-                        print(f"Error sending screen data: {str(e)}")
+                    body = json.dumps(data)
+                    upload_start = time.time()
+                    self._upload_screen(endpoint, body)
+                    # Zoom frames are sized by the region, not by the quality, so they don't steer the overview
+                    if "roi" not in screen_data:
+                        sent_bytes += len(body)
+                        upload_time += time.time() - upload_start
+                
+                if sent_bytes:
+                    # Feed the upload measurements to the adaptive controller
+                    # (a failed or timed out upload counts as a very slow one)
+                    self.quality_controller.record(sent_bytes, upload_time)
+                    self._apply_operating_point()
             except Exception as e:
                 print(f"Error in screen sharing loop: {str(e)}")
-                
-            # Wait before next capture
-            time.sleep(self.screen_interval)
     
-    def stop_audio_streaming(self, audio_type='microphone'):
-        """Stop audio streaming (microphone or speaker)"""
-        try:
-            if not AUDIO_AVAILABLE:
-                return "Audio streaming not available (missing dependencies)"
+    def _locate_cursor(self, x, y):
+        """Return (monitor, x, y) with the position relative to the monitor containing it"""
+        for monitor in self.monitor_layout.values():
+            if monitor["left"] <= x < monitor["left"] + monitor["width"] and monitor["top"] <= y < monitor["top"] + monitor["height"]:
+                return monitor["index"], x - monitor["left"], y - monitor["top"]
+        return 1, x, y
+    
+    def _cursor_loop(self):
+        """Send the cursor position and shape to the server whenever they change"""
+        # Keep the connection open, cursor updates are tiny and frequent
+        session = requests.Session()
+        last_cursor = None
+        while not self.stop_event.is_set():
+            # Nobody is watching, nobody needs the cursor
+            if self.viewer_count == 0:
+                last_cursor = None
+                self.stop_event.wait(0.5)
+                continue
             
-            if audio_type == 'microphone':
-                return self.stop_microphone()
-            elif audio_type == 'speaker':
-                return self.stop_speakers()
-            else:
-                return f"Unknown audio type: {audio_type}"
-        except Exception as e:
-            return f"Error stopping audio streaming: {str(e)}"
+            try:
+                x, y = pyautogui.position()
+                monitor, x, y = self._locate_cursor(x, y)
+                cursor = (monitor, x, y, cursor_shape())
                 
+                if cursor != last_cursor:
+                    session.post(
+                        f"{self.server_url}/api/update-cursor",
+                        json={
+                            "device_id": self.device_id,
+                            "monitor": monitor,
+                            "x": x,
+                            "y": y,
+                            "shape": cursor[3],
+                            "timestamp": time.time()
+                        },
+                        timeout=2
+                    )
+                    last_cursor = cursor
+            except Exception as e:
+                print(f"Error sending cursor position: {str(e)}")
+                self.stop_event.wait(1)
+            
+            self.stop_event.wait(self.cursor_interval)
+    
     def start_microphone(self):
         """Start audio streaming from the microphone"""
+        mic_stream = None
         try:
             # Check if already running
-            if hasattr(self, 'mic_stream') and self.mic_stream is not None:
+            if self.mic_stream is not None:
                 return "Microphone streaming already active"
+            load_sounddevice()
             
-            # Define callback function
+            # Runs on PortAudio's real-time thread: only copy the block into the ring, no I/O or
+            # allocations, the sender thread does the encoding and the uploading
             def mic_callback(indata, frames, time, status):
-                if status:
-                    print(f"Microphone status: {status}")
-                
-                # Convert audio data to bytes and send it
-                try:
-                    audio_data = indata.tobytes()
-                    # Compress and encode audio data
-                    encoded_audio = base64.b64encode(audio_data).decode('utf-8')
-                    
-                    # Send to server
-                    self.upload_audio(encoded_audio, 'microphone')
-                except Exception as e:
-                    print(f"Error in microphone callback: {e}")
+                if status.input_overflow:
+                    self.mic_input_overflows += 1
+                self.mic_ring.write(indata)
             
-            # Start the audio stream
-            self.mic_stream = sd.InputStream(
+            self.mic_ring = SampleRing(self.mic_rate * self.mic_ring_seconds, self.mic_channels)
+            self.mic_converter = FormatConverter(self.mic_rate, self.mic_channels, VOICE_FORMAT)
+            
+            # Open the device first: if that fails (no microphone, unsupported rate) nothing is left running
+            mic_stream = sd.InputStream(
                 callback=mic_callback,
-                channels=1,
-                samplerate=44100,
-                blocksize=1024
+                channels=self.mic_channels,
+                samplerate=self.mic_rate,
+                blocksize=self.mic_blocksize,
+                dtype='int16'
             )
+            
+            detector = VoiceActivityDetector(VOICE_FORMAT.rate, VOICE_FORMAT.channels) if self.mic_vad else None
+            self.mic_uploader = AudioUploadBatcher(self.server_url, self.device_id, VOICE_FORMAT, vad=detector)
+            self.mic_uploader.start()
+            self.mic_running = True
+            self.mic_thread = threading.Thread(target=self._microphone_sender_loop, args=(self.mic_ring, self.mic_converter, self.mic_uploader))
+            self.mic_thread.daemon = True
+            self.mic_thread.start()
+            
+            # Start the audio stream
+            self.mic_stream = mic_stream
             self.mic_stream.start()
             
             return "Microphone streaming started"
         except Exception as e:
+            if mic_stream is not None:
+                mic_stream.close()
+                self.mic_stream = None
+            if self.mic_running:
+                self.mic_running = False
+                if self.mic_thread.is_alive():
+                    # The sender thread flushes and stops the uploader on its way out
+                    self.mic_thread.join(timeout=self.mic_uploader.timeout + 2)
+                else:
+                    self.mic_uploader.stop()
+                self.mic_thread = None
             return f"Error starting microphone: {str(e)}"
     
+    def _microphone_sender_loop(self, ring, converter, uploader):
+        """Drain the microphone ring into the upload batcher, off the audio thread"""
+        block = np.empty((self.mic_blocksize * 4, self.mic_channels), dtype=np.int16)
+        while True:
+            # Checked before reading: once stopped, the stream is closed and what is left in the ring is final
+            running = self.mic_running
+            frames = ring.read_into(block)
+            if frames:
+                try:
+                    uploader.add(converter.convert(block[:frames]))
+                except Exception as e:
+                    print(f"Error encoding microphone audio: {e}")
+            elif not running:
+                break
+            else:
+                # Polled rather than signalled, so the callback never touches a lock
+                time.sleep(self.mic_blocksize / self.mic_rate)
+        
+        # Only this thread adds to the uploader, so it also sends the last partial frame
+        uploader.flush()
+        uploader.stop()
+    
     def stop_microphone(self):
         """Stop audio streaming from the microphone"""
         try:
-            if hasattr(self, 'mic_stream') and self.mic_stream is not None:
+            if self.mic_stream is not None:
                 self.mic_stream.stop()
                 self.mic_stream.close()
                 self.mic_stream = None
+                self.mic_running = False
+                # The sender thread drains the ring, sends the last partial frame and stops the uploader
+                if self.mic_thread is not None:
+                    self.mic_thread.join(timeout=self.mic_uploader.timeout + 2)
+                    if self.mic_thread.is_alive():
+                        print("Microphone sender is still finishing, its last audio is sent when it ends")
+                    self.mic_thread = None
                 return "Microphone streaming stopped"
             else:
                 return "No active microphone stream to stop"
         except Exception as e:
             return f"Error stopping microphone: {str(e)}"
     
+    def audio_stats(self):
+        """Capture, upload and playback counters, to see when audio outruns the network"""
+        if self.audio_streamer:
+            return {"backend": "pyaudio", "upload": self.audio_streamer.upload_stats()}
+        stats = {
+            "backend": "sounddevice" if SOUNDDEVICE_AVAILABLE else None,
+            "microphone": None,
+            "speaker": self.jitter_buffer.stats() if self.jitter_buffer else None,
+        }
+        if self.mic_ring is not None:
+            stats["microphone"] = {
+                "active": self.mic_stream is not None,
+                "input_overflows": self.mic_input_overflows,  # Reported by PortAudio: we didn't read in time
+                "ring_overflows": self.mic_ring.overflows,  # Blocks dropped because the sender thread fell behind
+                "ring_dropped_frames": self.mic_ring.dropped_frames,
+                "ring_frames": self.mic_ring.available(),
+                "upload": self.mic_uploader.stats(),
+            }
+        return stats
+    
     def start_speakers(self):
-        """Start audio streaming to the speakers"""
+        """Start playing the viewer's microphone (the 'talk' channel) on the speakers"""
         try:
             # Check if already running
-            if hasattr(self, 'speaker_stream') and self.speaker_stream is not None:
+            if self.speaker_running:
                 return "Speaker streaming already active"
+            if not SOUNDDEVICE_AVAILABLE:
+                return "Speaker playback not available. Install required packages with: pip install sounddevice"
             
-            # Start thread to poll for audio data
+            # Start thread to receive the audio stream; never our own microphone's, that would echo
             self.speaker_running = True
-            self.speaker_thread = threading.Thread(target=self.speaker_polling_thread)
+            self.speaker_listener = AudioStreamListener(self.server_url, self.device_id, channel="talk")
+            self.speaker_thread = threading.Thread(target=self.speaker_stream_thread)
             self.speaker_thread.daemon = True
             self.speaker_thread.start()
             
@@ -910,165 +1236,123 @@ class Receiver:
     def stop_speakers(self):
         """Stop audio streaming to the speakers"""
         try:
-            if hasattr(self, 'speaker_stream') and self.speaker_stream is not None:
-                self.speaker_stream.stop()
-                self.speaker_stream.close()
-                self.speaker_stream = None
+            self.speaker_running = False
+            if self.speaker_listener is not None:
+                self.speaker_listener.close()  # Wakes the thread if it is waiting for audio
+                self.speaker_listener = None
             
-            if hasattr(self, 'speaker_running'):
-                self.speaker_running = False
-            
-            if hasattr(self, 'speaker_thread') and self.speaker_thread is not None:
+            if self.speaker_thread is not None:
                 self.speaker_thread.join(timeout=1.0)
                 self.speaker_thread = None
-                
+            
+            self._close_speaker_stream()
             return "Speaker streaming stopped"
         except Exception as e:
             return f"Error stopping speakers: {str(e)}"
     
-    def speaker_polling_thread(self):
-        """Thread function to poll for audio data and play it"""
-        try:
-            # Define callback function for output stream
-            def speaker_callback(outdata, frames, time, status):
-                if status:
-                    print(f"Speaker status: {status}")
-                
-                # Check if we have audio data in our buffer
-                if len(self.audio_buffer) > 0:
-                    # Get the oldest audio data from the buffer
-                    audio_data = self.audio_buffer.pop(0)
-                    
-                    # Convert to numpy array for sounddevice
-                    try:
-                        audio_array = np.frombuffer(audio_data, dtype=np.float32)
-                        if len(audio_array) >= frames * 1:  # 1 channel
-                            # Reshape to match expected dimensions
-                            audio_array = audio_array[:frames * 1].reshape(frames, 1)
-                            outdata[:] = audio_array
-                        else:
-                            # Not enough data, fill with zeros
-                            outdata[:] = np.zeros((frames, 1), dtype=np.float32)
-                    except Exception as e:
-                        print(f"Error processing audio data: {e}")
-                        outdata[:] = np.zeros((frames, 1), dtype=np.float32)
-                else:
-                    # No data available, fill with zeros
-                    outdata[:] = np.zeros((frames, 1), dtype=np.float32)
-            
-            # Initialize audio buffer if not exists
-            if not hasattr(self, 'audio_buffer'):
-                self.audio_buffer = []
-            
-            # Start output stream
-            self.speaker_stream = sd.OutputStream(
-                callback=speaker_callback,
-                channels=1,
-                samplerate=44100,
-                blocksize=1024
-            )
-            self.speaker_stream.start()
-            
-            # Poll for audio data from server
-            while self.speaker_running:
-                try:
-                    # Download audio data from server
-                    audio_data = self.download_audio()
-                    if audio_data:
-                        # Decode audio data and add to buffer
-                        decoded_audio = base64.b64decode(audio_data)
-                        self.audio_buffer.append(decoded_audio)
-                        
-                        # Limit buffer size to prevent memory issues
-                        while len(self.audio_buffer) > 10:  # Limit to 10 chunks
-                            self.audio_buffer.pop(0)
-                except Exception as e:
-                    print(f"Error in speaker polling thread: {e}")
+    def _open_speaker_stream(self, rate, channels):
+        """(Re)open the output stream and its jitter buffer for audio of this rate and channel count"""
+        load_sounddevice()
+        self._close_speaker_stream()
+        jitter_buffer = JitterBuffer(rate, channels, target_ms=self.speaker_target_ms)
+        
+        # Runs on PortAudio's real-time thread: the jitter buffer hands out exactly `frames` frames
+        def speaker_callback(outdata, frames, time, status):
+            jitter_buffer.fill(outdata)
+        
+        self.speaker_stream = sd.OutputStream(
+            callback=speaker_callback,
+            channels=channels,
+            samplerate=rate,
+            blocksize=self.speaker_blocksize,
+            dtype='float32'
+        )
+        self.jitter_buffer = jitter_buffer
+        self.speaker_stream.start()
+    
+    def _close_speaker_stream(self):
+        if self.speaker_stream is not None:
+            self.speaker_stream.stop()
+            self.speaker_stream.close()
+            self.speaker_stream = None
+    
+    def speaker_stream_thread(self):
+        """Thread function to receive audio chunks as the server pushes them and queue them for playback"""
+        stream_format = None
+        for chunk in self.speaker_listener.chunks():
+            if not self.speaker_running:
+                break
+            try:
+                chunk_format = AudioFormat.from_fields(chunk)
+                if chunk_format != stream_format:
+                    # A new codec (renegotiated with the viewer) only needs a new decoder; the output
+                    # stream and its jitter buffer are reopened only for a new rate or channel count
+                    if stream_format is None or (chunk_format.rate, chunk_format.channels) != (stream_format.rate, stream_format.channels):
+                        self._open_speaker_stream(chunk_format.rate, chunk_format.channels)
+                    stream_format = chunk_format
+                    decoder = AudioDecoder(stream_format.codec, stream_format.rate, stream_format.channels)
                 
-                # Sleep to avoid excessive polling
-                time.sleep(0.05)  # 50ms interval
+                if chunk.get("comfort_noise") is not None:
+                    # The sender went silent: play its background noise level instead of dead air
+                    self.jitter_buffer.set_comfort_noise(chunk["comfort_noise"])
+                    continue
                 
-        except Exception as e:
-            print(f"Error in speaker polling thread: {e}")
-            
-    def upload_audio(self, audio_data, audio_type='microphone'):
-        """Upload audio data to the server"""
-        try:
-            response = requests.post(
-                f"{self.server_url}/api/audio/upload/{self.device_id}",
-                json={
-                    "audio_data": audio_data,
-                    "audio_type": audio_type
-                }
-            )
-            return response.json()
-        except Exception as e:
-            print(f"Error uploading audio: {e}")
-            return None
-            
-    def download_audio(self, audio_type='speaker'):
-        """Download audio data from the server"""
-        try:
-            response = requests.get(
-                f"{self.server_url}/api/audio/download/{self.device_id}",
-                params={
-                    "audio_type": audio_type
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'audio_data' in data:
-                    return data['audio_data']
-            
-            return None
-        except Exception as e:
-            print(f"Error downloading audio: {e}")
-            return None
+                samples = decoder.decode(base64.b64decode(chunk["audio_data"]))
+                self.jitter_buffer.push(to_float32(samples).reshape(-1, stream_format.channels))
+            except Exception as e:
+                print(f"Error in speaker stream thread: {e}")
+    
+    def get_audio_streamer(self):
+        """The PyAudio streamer, created on first use so that startup doesn't wait for the audio stack"""
+        if self.audio_streamer is None and AUDIO_AVAILABLE:
+            try:
+                self.audio_streamer = AudioStreamer(self.server_url, self.device_id)
+                print("Audio streaming support initialized")
+            except Exception as e:
+                print(f"Error initializing audio: {str(e)}")
+        return self.audio_streamer
+    
+    def audio_devices(self, refresh=False):
+        """Input and output devices, listed once and cached; refresh lists them again (after a hot-plug)"""
+        if self.get_audio_streamer():
+            return self.audio_streamer.get_audio_devices(refresh)
+        if SOUNDDEVICE_AVAILABLE:
+            sounddevice = load_sounddevice()
+            if refresh and self.mic_stream is None and self.speaker_stream is None:
+                # PortAudio only notices devices plugged in or removed when it is initialized again
+                sounddevice._terminate()
+                sounddevice._initialize()
+            devices = {"input": [], "output": []}
+            for index, device in enumerate(sounddevice.query_devices()):
+                for kind in ("input", "output"):
+                    if device[f"max_{kind}_channels"] > 0:
+                        devices[kind].append({"index": index, "name": device["name"], "channels": device[f"max_{kind}_channels"]})
+            return devices
+        return None
     
     def start_audio_streaming(self):
-        """Start audio streaming (microphone and speakers)"""
-        if not AUDIO_AVAILABLE or not self.audio_streamer:
+        """Start streaming the microphone to the server"""
+        if not self.get_audio_streamer():
+            if SOUNDDEVICE_AVAILABLE:
+                # Microphone only: the speakers play the viewer's talk channel, see start_speakers
+                return self.start_microphone()
             return "Audio streaming is not available"
         
-        # Start microphone streaming
-        mic_started = self.audio_streamer.start_microphone_streaming()
-        
-        # Start speaker streaming
-        speaker_started = self.audio_streamer.start_speaker_streaming()
-        
-        status = []
-        if mic_started:
-            status.append("Microphone streaming started")
-        if speaker_started:
-            status.append("Speaker streaming started")
-        
-        if not status:
-            return "Failed to start audio streaming"
-        
-        return ", ".join(status)
+        # Microphone only: the speakers play the viewer's talk channel, see start_speakers
+        if self.audio_streamer.start_microphone_streaming():
+            return "Microphone streaming started"
+        return "Failed to start audio streaming"
     
     def stop_audio_streaming(self):
         """Stop audio streaming"""
-        if not AUDIO_AVAILABLE or not self.audio_streamer:
+        if not self.audio_streamer:
+            if SOUNDDEVICE_AVAILABLE:
+                return self.stop_microphone()
             return "Audio streaming is not available"
         
-        # Stop microphone streaming
-        mic_stopped = self.audio_streamer.stop_microphone_streaming()
-        
-        # Stop speaker streaming
-        speaker_stopped = self.audio_streamer.stop_speaker_streaming()
-        
-        status = []
-        if mic_stopped:
-            status.append("Microphone streaming stopped")
-        if speaker_stopped:
-            status.append("Speaker streaming stopped")
-        
-        if not status:
-            return "Failed to stop audio streaming"
-        
-        return ", ".join(status)
+        if self.audio_streamer.stop_microphone_streaming():
+            return "Microphone streaming stopped"
+        return "Failed to stop audio streaming"
     
     def run(self):
         """Main loop to poll and process commands"""
@@ -1077,17 +1361,20 @@ class Receiver:
         # Start screen sharing
         self.start_screen_sharing()
         
+        # Start mouse and keyboard input handling
+        self.start_input_handling()
+        
         # Start terminal command polling
         self.start_terminal_polling()
         
-        # Start audio streaming if available
-        if AUDIO_AVAILABLE and self.audio_streamer:
-            self.start_audio_streaming()
-        
         try:
             while True:
-                # Poll for commands
+                # Poll for commands (returns as soon as one is queued)
                 commands = self.poll_commands()
+                if commands is None:
+                    # Server unreachable, wait before trying again
+                    time.sleep(2)
+                    continue
                 
                 # Process each command
                 for command_id, cmd_data in commands.items():
@@ -1098,6 +1385,7 @@ class Receiver:
                         cmd = str(cmd_data)  # Fallback if it's not in expected format
                         
                     print(f"Received command: {cmd}")
+                    session_id = cmd_data.get('session_id') if isinstance(cmd_data, dict) else None
                     
                     # Special commands that start with !
                     if cmd.startswith("!"):
@@ -1107,9 +1395,10 @@ class Receiver:
                             if len(parts) >= 2:
                                 audio_type = parts[1]  # 'microphone' or 'speaker'
                                 if audio_type == 'microphone':
-                                    result = self.start_audio_streaming() if AUDIO_AVAILABLE else "Audio not available"
+                                    result = self.start_audio_streaming()
                                 elif audio_type == 'speaker':
-                                    result = self.start_audio_streaming() if AUDIO_AVAILABLE else "Audio not available"
+                                    # The viewer talks through our speakers
+                                    result = self.start_speakers()
                                 else:
                                     result = f"Unknown audio type: {audio_type}"
                                 
@@ -1124,9 +1413,9 @@ class Receiver:
                             if len(parts) >= 2:
                                 audio_type = parts[1]  # 'microphone' or 'speaker'
                                 if audio_type == 'microphone':
-                                    result = self.stop_audio_streaming() if AUDIO_AVAILABLE else "Audio not available"
+                                    result = self.stop_audio_streaming()
                                 elif audio_type == 'speaker':
-                                    result = self.stop_audio_streaming() if AUDIO_AVAILABLE else "Audio not available"
+                                    result = self.stop_speakers()
                                 else:
                                     result = f"Unknown audio type: {audio_type}"
                                 
@@ -1194,14 +1483,18 @@ class Receiver:
                             
                             elif action == "status":
                                 status = "Active" if self.screen_sharing_active else "Inactive"
-                                output = {"stdout": f"Screen sharing: {status}\nDevice ID: {self.device_id}\nQuality: {self.screen_quality}\nInterval: {self.screen_interval} seconds", "stderr": "", "return_code": 0}
+                                roi = self.screen_roi
+                                zoom = f"{roi['width']}x{roi['height']} at ({roi['x']}, {roi['y']}) on monitor {roi['monitor']}" if roi else "off"
+                                output = {"stdout": f"Screen sharing: {status}\nDevice ID: {self.device_id}\nTransport: {self.screen_mode} (available: {', '.join(self._screen_capabilities())})\nQuality: {self.screen_quality}\nInterval: {self.screen_interval} seconds\nScale: {self.screen_scale}\nMonitors: {', '.join(str(monitor) for monitor in self.screen_monitors)} (of {len(self.monitor_layout) or 'unknown'})\nZoom region: {zoom}\nViewers: {self.viewer_count if self.viewer_count is not None else 'unknown'}{' (heartbeat mode)' if self.viewer_count == 0 else ''}\n{self.screen_pacer.status()}\n{self.quality_controller.status()}", "stderr": "", "return_code": 0}
                             
                             elif action.startswith("quality="):
                                 try:
                                     quality = int(action.split("=")[1])
                                     if 10 <= quality <= 100:
+                                        # A manual setting takes over from the adaptive controller
+                                        self.quality_controller.enabled = False
                                         self.screen_quality = quality
-                                        output = {"stdout": f"Screen quality set to {quality}", "stderr": "", "return_code": 0}
+                                        output = {"stdout": f"Screen quality set to {quality} (adaptive mode off)", "stderr": "", "return_code": 0}
                                     else:
                                         output = {"stdout": "", "stderr": "Quality must be between 10 and 100", "return_code": 1}
                                 except:
@@ -1211,15 +1504,152 @@ class Receiver:
                                 try:
                                     interval = float(action.split("=")[1])
                                     if 0.1 <= interval <= 5.0:
+                                        self.quality_controller.enabled = False
                                         self.screen_interval = interval
-                                        output = {"stdout": f"Screen capture interval set to {interval} seconds", "stderr": "", "return_code": 0}
+                                        output = {"stdout": f"Screen capture interval set to {interval} seconds (adaptive mode off)", "stderr": "", "return_code": 0}
                                     else:
                                         output = {"stdout": "", "stderr": "Interval must be between 0.1 and 5.0 seconds", "return_code": 1}
                                 except:
                                     output = {"stdout": "", "stderr": "Invalid interval value", "return_code": 1}
                             
+                            elif action.startswith("auto="):
+                                enabled = action.split("=")[1] == "on"
+                                self.quality_controller.enabled = enabled
+                                if enabled:
+                                    self._apply_operating_point()
+                                else:
+                                    # Back to full size frames with the current quality and interval
+                                    self.screen_scale = 1.0
+                                    self.last_screen_hashes.clear()
+                                output = {"stdout": f"Adaptive screen quality {'on' if enabled else 'off'}", "stderr": "", "return_code": 0}
+                            
+                            elif action.startswith("bandwidth="):
+                                try:
+                                    bandwidth = float(action.split("=")[1])
+                                    if 10 <= bandwidth <= 100000:
+                                        self.quality_controller.target_bandwidth = bandwidth * 1000
+                                        output = {"stdout": f"Screen bandwidth target set to {bandwidth} KB/s", "stderr": "", "return_code": 0}
+                                    else:
+                                        output = {"stdout": "", "stderr": "Bandwidth must be between 10 and 100000 KB/s", "return_code": 1}
+                                except:
+                                    output = {"stdout": "", "stderr": "Invalid bandwidth value", "return_code": 1}
+                            
+                            elif action.startswith("latency="):
+                                try:
+                                    latency = float(action.split("=")[1])
+                                    if 20 <= latency <= 5000:
+                                        self.quality_controller.latency_budget = latency / 1000
+                                        output = {"stdout": f"Screen latency budget set to {latency} ms", "stderr": "", "return_code": 0}
+                                    else:
+                                        output = {"stdout": "", "stderr": "Latency must be between 20 and 5000 ms", "return_code": 1}
+                                except:
+                                    output = {"stdout": "", "stderr": "Invalid latency value", "return_code": 1}
+                            
+                            elif action.startswith("mode="):
+                                mode = action.split("=")[1]
+                                if mode in self._screen_capabilities():
+                                    self._apply_screen_mode(mode)
+                                    output = {"stdout": f"Screen transport set to {mode}", "stderr": "", "return_code": 0}
+                                else:
+                                    output = {"stdout": "", "stderr": f"Unsupported screen transport. Available: {', '.join(self._screen_capabilities())}", "return_code": 1}
+                            
+                            elif action == "monitors":
+                                monitor_list = "\nMonitors:\n" + "-" * 50 + "\n"
+                                for monitor in self._list_monitors():
+                                    streaming = " (streaming)" if monitor["index"] in self.screen_monitors else ""
+                                    monitor_list += f"{monitor['index']}\t{monitor['width']}x{monitor['height']} at ({monitor['left']}, {monitor['top']}){streaming}\n"
+                                output = {"stdout": monitor_list, "stderr": "", "return_code": 0}
+                            
+                            elif action.startswith("monitor=") or action.startswith("monitors="):
+                                value = action.split("=")[1]
+                                try:
+                                    available = [monitor["index"] for monitor in self._list_monitors()]
+                                    monitors = available if value == "all" else [int(monitor) for monitor in value.split(",")]
+                                    if self._apply_monitor_selection(monitors):
+                                        output = {"stdout": f"Streaming monitor(s): {', '.join(str(monitor) for monitor in self.screen_monitors)}", "stderr": "", "return_code": 0}
+                                    else:
+                                        output = {"stdout": "", "stderr": f"No such monitor. Available: {', '.join(str(monitor) for monitor in available)}", "return_code": 1}
+                                except:
+                                    output = {"stdout": "", "stderr": "Invalid monitor value", "return_code": 1}
+                            
+                            else:
+                                output = {"stdout": "", "stderr": "Unknown screen command. Available: start, stop, status, quality=N, interval=N, auto=on|off, bandwidth=KBPS, latency=MS, mode=jpeg|h264, monitors, monitor=N, monitors=N,M|all", "return_code": 1}
+                        
+                        elif cmd.startswith("!input"):
+                            # Handle input injection commands
+                            parts = cmd.split(" ", 1)
+                            action = parts[1] if len(parts) > 1 else "status"
+                            
+                            if action == "status":
+                                status = "Active" if self.input_active else "Inactive"
+                                output = {"stdout": f"Input handling: {status}\n{self.input_backend.status()}", "stderr": "", "return_code": 0}
+                            
+                            elif action.startswith("paste="):
+                                try:
+                                    threshold = int(action.split("=")[1])
+                                    if threshold >= 1:
+                                        self.input_backend.paste_threshold = threshold
+                                        output = {"stdout": f"Texts of {threshold}+ characters will be pasted", "stderr": "", "return_code": 0}
+                                    else:
+                                        output = {"stdout": "", "stderr": "Paste threshold must be at least 1", "return_code": 1}
+                                except:
+                                    output = {"stdout": "", "stderr": "Invalid paste threshold", "return_code": 1}
+                            
                             else:
-                                output = {"stdout": "", "stderr": "Unknown screen command. Available: start, stop, status, quality=N, interval=N", "return_code": 1}
+                                output = {"stdout": "", "stderr": "Unknown input command. Available: status, paste=N", "return_code": 1}
+                        
+                        elif cmd.startswith("!audio_stats"):
+                            output = {"stdout": json.dumps(self.audio_stats()), "stderr": "", "return_code": 0}
+                        
+                        elif cmd.startswith("!audio_devices"):
+                            # Format: !audio_devices [refresh]
+                            try:
+                                devices = self.audio_devices(refresh=cmd.split()[1:] == ["refresh"])
+                                if devices is not None:
+                                    output = {"stdout": json.dumps(devices), "stderr": "", "return_code": 0}
+                                else:
+                                    output = {"stdout": "", "stderr": "Audio streaming is not available", "return_code": 1}
+                            except Exception as e:
+                                output = {"stdout": "", "stderr": f"Error listing audio devices: {str(e)}", "return_code": 1}
+                        
+                        elif cmd.startswith("!timeout"):
+                            # Format: !timeout [seconds|off], how long a shell command may run before its shell is restarted
+                            parts = cmd.split()
+                            try:
+                                if len(parts) > 1:
+                                    timeout = None if parts[1] == "off" else float(parts[1])
+                                    if timeout is not None and timeout <= 0:
+                                        raise ValueError(parts[1])
+                                    self.shell_pool.set_timeout(timeout)
+                                timeout = self.shell_pool.timeout
+                                output = {"stdout": f"Command timeout: {f'{timeout:g} seconds' if timeout else 'off'}", "stderr": "", "return_code": 0}
+                            except ValueError:
+                                output = {"stdout": "", "stderr": "Invalid timeout. Usage: !timeout [seconds|off]", "return_code": 1}
+                        
+                        elif cmd.startswith("!sysinfo"):
+                            # Host info plus current CPU and memory usage as JSON
+                            if self.system_monitor.available():
+                                info = {"host": self.system_monitor.host_info(), "usage": self.system_monitor.usage()}
+                                output = {"stdout": json.dumps(info), "stderr": "", "return_code": 0}
+                            else:
+                                output = {"stdout": "", "stderr": "System info not available. Install required packages with: pip install psutil", "return_code": 1}
+                        
+                        elif cmd.startswith("!ps"):
+                            # Format: !ps [since=<token>], with a token only the changes since that snapshot are returned
+                            parts = cmd.split(" ", 1)
+                            since = parts[1].split("=", 1)[1] if len(parts) > 1 and parts[1].startswith("since=") else None
+                            if self.system_monitor.available():
+                                processes = self.system_monitor.process_diff(since)
+                                processes["usage"] = self.system_monitor.usage()
+                                output = {"stdout": json.dumps(processes), "stderr": "", "return_code": 0}
+                            else:
+                                output = {"stdout": "", "stderr": "Process list not available. Install required packages with: pip install psutil", "return_code": 1}
+                        
+                        elif cmd.split(" ", 1)[0] in ("!ls", "!stat", "!find"):
+                            output = self.handle_fs_command(cmd, session_id)
+                        
+                        elif cmd.split(" ", 1)[0] in ("!signature", "!patch"):
+                            output = self.handle_delta_command(cmd, session_id)
                         
                         else:
                             # Unknown special command
@@ -1228,14 +1658,11 @@ class Receiver:
                     else:
                         # Regular command execution
                         print(f"Executing command: {cmd}")
-                        output = self.execute_command(cmd)
+                        output = self.execute_command(cmd, session_id)
                     
                     # Send the command output back to the server
                     self.send_command_output(command_id, output)
                 
-                # Sleep to avoid excessive polling
-                time.sleep(2)
-                
         except KeyboardInterrupt:
             print("\nReceiver stopped.")
             if self.screen_sharing_active:
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import fnmatch
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+def _entry_type(entry):
+    """'dir', 'file', 'link' or 'other' for an os.DirEntry, without following links"""
+    try:
+        if entry.is_symlink():
+            return "link"
+        if entry.is_dir(follow_symlinks=False):
+            return "dir"
+        if entry.is_file(follow_symlinks=False):
+            return "file"
+    except OSError:
+        pass
+    return "other"
+
+class RemoteFS:
+    """Directory listings, stat and find for the sender, built on os.scandir.
+
+    A listing is cached as the sorted (name, type) pairs of the directory, keyed by the directory's mtime:
+    adding, removing or renaming entries changes it and invalidates the cache. Sizes and mtimes are read
+    only for the page being returned, so they are always current and a page costs the same in a folder
+    of a hundred files as in one of a few hundred thousand."""
+
+    def __init__(self, cache_size=32, find_scan_limit=500000):
+        self.cache_size = cache_size  # directories kept, least recently used dropped first
+        self.find_scan_limit = find_scan_limit  # entries a single find may look at
+        self._cache = OrderedDict()  # path -> (mtime_ns, [(name, type)])
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _names(self, path):
+        """Return the sorted (name, type) pairs of a directory and whether they came from the cache"""
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[0] == mtime:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return cached[1], True
+
+        with os.scandir(path) as entries:
+            names = [(entry.name, _entry_type(entry)) for entry in entries]
+        # Directories first, then case-insensitive by name
+        names.sort(key=lambda item: (item[1] != "dir", item[0].casefold()))
+
+        with self._lock:
+            self.misses += 1
+            self._cache[path] = (mtime, names)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return names, False
+
+    @staticmethod
+    def _describe(path, name, entry_type):
+        """Size and mtime of one entry (size is None for directories)"""
+        try:
+            info = os.lstat(os.path.join(path, name))
+            size = None if entry_type == "dir" else info.st_size
+            mtime = info.st_mtime
+        except OSError:
+            size, mtime = None, None  # Removed since the listing was cached
+        return {"name": name, "type": entry_type, "size": size, "mtime": mtime}
+
+    def list_dir(self, path, offset=0, limit=200):
+        """One page of a directory listing"""
+        path = os.path.abspath(os.path.expanduser(path))
+        names, cached = self._names(path)
+        page = names[offset:offset + limit]
+        return {
+            "path": path,
+            "parent": os.path.dirname(path) if os.path.dirname(path) != path else None,
+            "total": len(names),
+            "offset": offset,
+            "limit": limit,
+            "cached": cached,
+            "entries": [self._describe(path, name, entry_type) for name, entry_type in page],
+        }
+
+    def stat(self, path):
+        """Details of a single file or directory"""
+        path = os.path.abspath(os.path.expanduser(path))
+        info = os.lstat(path)
+        if stat.S_ISLNK(info.st_mode):
+            entry_type = "link"
+        elif stat.S_ISDIR(info.st_mode):
+            entry_type = "dir"
+        elif stat.S_ISREG(info.st_mode):
+            entry_type = "file"
+        else:
+            entry_type = "other"
+
+        result = {
+            "path": path,
+            "name": os.path.basename(path) or path,
+            "type": entry_type,
+            "size": info.st_size,
+            "mtime": info.st_mtime,
+            "ctime": info.st_ctime,
+            "atime": info.st_atime,
+            "mode": stat.filemode(info.st_mode),
+        }
+        if entry_type == "link":
+            result["target"] = os.readlink(path)
+        elif entry_type == "dir":
+            result["entries"] = len(self._names(path)[0])
+        return result
+
+    def find(self, root, pattern, offset=0, limit=200, max_depth=None):
+        """Walk root for names matching a glob pattern (case-insensitive), returning one page of matches.
+        The walk stops as soon as the page is full, so later pages cost a longer walk but never a full one
+        unless the matches run out."""
+        root = os.path.abspath(os.path.expanduser(root))
+        folded = pattern.casefold()
+        matches = []
+        scanned = 0
+        truncated = False
+        more = False
+        stack = [(root, 0)]
+
+        while stack:
+            directory, depth = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue  # No permission or removed during the walk
+            with entries:
+                for entry in entries:
+                    scanned += 1
+                    if scanned > self.find_scan_limit:
+                        truncated = True
+                        break
+                    entry_type = _entry_type(entry)
+                    if fnmatch.fnmatchcase(entry.name.casefold(), folded):
+                        if len(matches) == offset + limit:
+                            more = True
+                            break
+                        matches.append((directory, entry.name, entry_type))
+                    if entry_type == "dir" and (max_depth is None or depth < max_depth):
+                        stack.append((entry.path, depth + 1))
+            if truncated or more:
+                break
+
+        results = []
+        for directory, name, entry_type in matches[offset:]:
+            entry = self._describe(directory, name, entry_type)
+            entry["path"] = os.path.join(directory, name)
+            results.append(entry)
+        return {
+            "root": root,
+            "pattern": pattern,
+            "offset": offset,
+            "limit": limit,
+            "more": more,
+            "truncated": truncated,
+            "scanned": scanned,
+            "entries": results,
+        }
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import ctypes
+import platform
+import threading
+import time
+from collections import deque
+
+from PIL import Image
+
+class AdaptiveQualityController:
+    """Pick JPEG quality, capture interval and downscale factor from measured upload throughput"""
+
+    # Operating points from richest to cheapest: (JPEG quality, capture interval, downscale factor)
+    LADDER = [
+        (90, 1 / 30, 1.0),
+        (85, 1 / 30, 1.0),
+        (75, 1 / 30, 1.0),
+        (65, 1 / 24, 1.0),
+        (55, 1 / 20, 1.0),
+        (50, 1 / 15, 0.85),
+        (45, 1 / 12, 0.75),
+        (40, 1 / 10, 0.75),
+        (35, 1 / 8, 0.6),
+        (30, 1 / 5, 0.5),
+        (25, 1 / 2, 0.5),
+    ]
+
+    def __init__(self, target_bandwidth=400000, latency_budget=0.25, window=20):
+        self.enabled = True
+        self.target_bandwidth = target_bandwidth  # bytes per second we allow ourselves to upload
+        self.latency_budget = latency_budget  # seconds an upload may take before we back off
+        self.level = 1  # Start at the old fixed defaults (quality 85, ~30 FPS)
+        self.hold_time = 1.0  # seconds to wait after a change before judging again
+        self.upgrade_time = 3.0  # seconds of headroom needed before stepping up
+
+        self._samples = deque(maxlen=window)  # (frame bytes, upload seconds)
+        self._last_change = time.time()
+        self._headroom_since = None
+
+    @property
+    def quality(self):
+        return self.LADDER[self.level][0]
+
+    @property
+    def interval(self):
+        return self.LADDER[self.level][1]
+
+    @property
+    def scale(self):
+        return self.LADDER[self.level][2]
+
+    def record(self, frame_bytes, upload_time):
+        """Record one frame upload and move along the ladder if needed"""
+        self._samples.append((frame_bytes, max(upload_time, 0.001)))
+        if self.enabled:
+            self._adjust()
+
+    def stats(self):
+        """Return averaged measurements over the current window"""
+        if not self._samples:
+            return {"frame_bytes": 0, "rtt": 0.0, "throughput": 0.0, "send_rate": 0.0}
+
+        total_bytes = sum(sample[0] for sample in self._samples)
+        total_time = sum(sample[1] for sample in self._samples)
+        frame_bytes = total_bytes / len(self._samples)
+        rtt = total_time / len(self._samples)
+
+        return {
+            "frame_bytes": frame_bytes,
+            "rtt": rtt,
+            "throughput": total_bytes / total_time,  # What the link actually delivered
+            # What we ask of the link: the loop can't send faster than one upload per RTT
+            "send_rate": frame_bytes / max(self.interval, rtt)
+        }
+
+    def _adjust(self):
+        """Step down when over budget, step up after sustained headroom"""
+        now = time.time()
+        if now - self._last_change < self.hold_time or len(self._samples) < 5:
+            return
+
+        stats = self.stats()
+        budget = min(self.target_bandwidth, stats["throughput"])
+        congested = stats["rtt"] > self.latency_budget or stats["send_rate"] > budget
+        headroom = stats["rtt"] < self.latency_budget / 2 and stats["send_rate"] < budget * 0.6
+
+        if congested:
+            self._headroom_since = None
+            if self.level < len(self.LADDER) - 1:
+                self._set_level(self.level + 1)
+        elif headroom:
+            if self._headroom_since is None:
+                self._headroom_since = now
+            elif now - self._headroom_since >= self.upgrade_time and self.level > 0:
+                self._headroom_since = None
+                self._set_level(self.level - 1)
+        else:
+            self._headroom_since = None
+
+    def _set_level(self, level):
+        """Move to a new operating point and start measuring it from scratch"""
+        self.level = level
+        self._samples.clear()
+        self._last_change = time.time()
+
+    def status(self):
+        """Describe the chosen operating point for `!screen status`"""
+        stats = self.stats()
+        return (
+            f"Adaptive: {'on' if self.enabled else 'off'} "
+            f"(target {self.target_bandwidth / 1000:.0f} KB/s, latency budget {self.latency_budget * 1000:.0f} ms)\n"
+            f"Operating point: level {self.level}/{len(self.LADDER) - 1}, quality {self.quality}, "
+            f"{1 / self.interval:.0f} FPS, scale {self.scale:.2f}\n"
+            f"Measured: {stats['frame_bytes'] / 1000:.1f} KB/frame, RTT {stats['rtt'] * 1000:.0f} ms, "
+            f"throughput {stats['throughput'] / 1000:.0f} KB/s, sending {stats['send_rate'] / 1000:.0f} KB/s"
+        )
+
+class FramePacer:
+    """Schedule frames on absolute deadlines, skipping the ones we are already too late for"""
+
+    def __init__(self, interval, window=120):
+        self.interval = interval
+        self.frames = 0
+        self.skipped = 0
+        self._next_deadline = None
+        self._jitter = deque(maxlen=window)  # seconds between each deadline and the actual frame start
+        self._frame_times = deque(maxlen=window)
+
+    def reset(self):
+        """Forget the schedule, e.g. after an idle period, so it isn't counted as missed frames"""
+        self._next_deadline = None
+        self._frame_times.clear()
+
+    def wait(self, stop_event=None):
+        """Sleep until the next frame deadline. Returns False if stop_event was set while waiting"""
+        now = time.monotonic()
+        if self._next_deadline is None:
+            self._next_deadline = now
+
+        delay = self._next_deadline - now
+        if delay > 0:
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+            now = time.monotonic()
+        else:
+            # Behind schedule: drop the deadlines we already missed instead of bursting to catch up
+            missed = int(-delay // self.interval)
+            if missed:
+                self.skipped += missed
+                self._next_deadline += missed * self.interval
+
+        self._jitter.append(now - self._next_deadline)
+        self._frame_times.append(now)
+        self.frames += 1
+        # The next deadline is absolute, so time spent capturing and uploading doesn't add up
+        self._next_deadline += self.interval
+        return True
+
+    def actual_fps(self):
+        """Frame rate actually achieved over the recent window"""
+        if len(self._frame_times) < 2:
+            return 0.0
+        elapsed = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def jitter(self):
+        """Return (average, 95th percentile, maximum) frame start jitter in seconds"""
+        if not self._jitter:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self._jitter)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return sum(ordered) / len(ordered), p95, ordered[-1]
+
+    def status(self):
+        """Describe the pacing for `!screen status`"""
+        average, p95, maximum = self.jitter()
+        return (
+            f"Pacing: target {1 / self.interval:.1f} FPS, actual {self.actual_fps():.1f} FPS, "
+            f"jitter avg {average * 1000:.1f} ms / p95 {p95 * 1000:.1f} ms / max {maximum * 1000:.1f} ms, "
+            f"skipped {self.skipped} of {self.frames + self.skipped} frames"
+        )
+
+class ScreenCapture:
+    """Grab monitors with mss, keeping one handle per thread instead of reopening it every frame"""
+
+    def __init__(self):
+        self._local = threading.local()  # mss handles belong to the thread that created them
+
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            import mss  # If available, mss is much faster than PIL.ImageGrab
+            sct = self._local.sct = mss.mss()
+        return sct
+
+    def grab(self, monitor_index=1):
+        """Return the raw mss screenshot of a monitor (BGRA pixels, nothing copied yet)"""
+        sct = self._sct()
+        return sct.grab(sct.monitors[monitor_index])
+
+    def grab_region(self, left, top, width, height):
+        """Return the raw mss screenshot of a rectangle of the virtual desktop"""
+        return self._sct().grab({"left": left, "top": top, "width": width, "height": height})
+
+    def monitors(self):
+        """List the physical monitors with their mss index and position on the virtual desktop"""
+        # mss.monitors[0] is the bounding box of all monitors together, the real ones start at 1
+        return [
+            {"index": index, "left": m["left"], "top": m["top"], "width": m["width"], "height": m["height"]}
+            for index, m in enumerate(self._sct().monitors) if index > 0
+        ]
+
+def fit_size(width, height, max_width=1920, max_height=1080, scale=1.0):
+    """Scale (width, height) to fit inside the maximum size without changing the aspect ratio"""
+    factor = min(1.0, max_width / width, max_height / height) * scale
+    return max(1, int(width * factor)), max(1, int(height * factor))
+
+def bgra_to_image(raw, size):
+    """Unpack a BGRA screen buffer straight into an RGB image, the only copy of the frame we make"""
+    return Image.frombuffer('RGB', size, raw, 'raw', 'BGRX', 0, 1)
+
+# Standard Windows cursors (IDC_* resource ids) and the CSS cursor the viewer draws for them
+WINDOWS_CURSORS = {
+    32512: "default",      # IDC_ARROW
+    32513: "text",         # IDC_IBEAM
+    32514: "wait",         # IDC_WAIT
+    32515: "crosshair",    # IDC_CROSS
+    32642: "nwse-resize",  # IDC_SIZENWSE
+    32643: "nesw-resize",  # IDC_SIZENESW
+    32644: "ew-resize",    # IDC_SIZEWE
+    32645: "ns-resize",    # IDC_SIZENS
+    32646: "move",         # IDC_SIZEALL
+    32648: "not-allowed",  # IDC_NO
+    32649: "pointer",      # IDC_HAND
+    32650: "progress",     # IDC_APPSTARTING
+}
+
+class CursorInfo(ctypes.Structure):
+    _fields_ = [
+        ("cbSize", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("hCursor", ctypes.c_void_p),
+        ("x", ctypes.c_long),
+        ("y", ctypes.c_long),
+    ]
+
+_cursor_handles = None
+
+def cursor_shape():
+    """Return the CSS name of the current cursor shape ('default' where it can't be read)"""
+    global _cursor_handles
+    if platform.system() != "Windows":
+        return "default"
+
+    try:
+        user32 = ctypes.windll.user32
+        user32.LoadCursorW.restype = ctypes.c_void_p
+        if _cursor_handles is None:
+            # Shared system cursors keep the same handle, so map them once
+            _cursor_handles = {user32.LoadCursorW(None, ctypes.c_void_p(cursor_id)): name for cursor_id, name in WINDOWS_CURSORS.items()}
+
+        info = CursorInfo()
+        info.cbSize = ctypes.sizeof(CursorInfo)
+        if not user32.GetCursorInfo(ctypes.byref(info)):
+            return "default"
+        if not info.flags & 1:  # CURSOR_SHOWING
+            return "none"
+        return _cursor_handles.get(info.hCursor, "default")
+    except Exception:
+        return "default"
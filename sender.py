@@ -9,11 +9,16 @@ import sys
 import json
 import cmd
 import random
+import shlex
 import shutil
 import threading
+import tempfile
+import uuid
 from datetime import datetime
 from pathlib import Path
 from colorama import init, Fore, Back, Style
+from tar_stream import stream_directory
+import delta_sync
 
 # Initialize colorama
 init(autoreset=True)
@@ -30,6 +35,8 @@ class Sender(cmd.Cmd):
         self.server_url = server_url
         self.active_commands = {}
         self.current_dir = os.getcwd()
+        # The receiver keeps one persistent shell per session, so cd and variables carry over
+        self.session_id = uuid.uuid4().hex
     
     def create_banner(self):
         """
@@ -120,32 +127,77 @@ class Sender(cmd.Cmd):
             self.send_command("cd")
             return
             
-        # Send the cd command to the remote system
-        cmd = f"cd {path}"
+        # The remote shell is persistent, so one command both changes the directory and lists it
+        # ('ls' first, and if it fails, 'dir' for Windows)
         print(f"Changing remote directory to: {path}")
-        self.send_command(cmd)
-        
-        # Optionally, we can list the directory contents after changing
-        # Add the command to history
-        self.cmdqueue.append(cmd)
-        self.default(cmd)
-        # Wait a bit and check current directory
-        time.sleep(0.5)  # Give some time for the cd command to complete
-        self.send_command("ls -la || dir")  # This will try 'ls' first, and if it fails, will run 'dir' (Windows)
+        self.send_command(f"cd {path} && (ls -la || dir)")
     
     def do_rfiles(self, arg):
         """List remote files in the current directory.
-        Usage: rfiles [directory_path]
+        Usage: rfiles [directory_path] [offset=N] [limit=N]
         If no directory is provided, lists the current remote directory."""
         
-        if arg.strip():
-            cmd = f"ls -la {arg.strip()} || dir {arg.strip()}"
-            print(f"Listing remote directory: {arg.strip()}")
-        else:
-            cmd = "ls -la || dir"
-            print("Listing current remote directory")
-            
-        self.send_command(cmd)
+        listing = self._remote_json(f"!ls {arg.strip()}".strip())
+        if not listing:
+            return
+        
+        print(f"\nRemote directory: {listing['path']}")
+        print("=" * 70)
+        print(f"{'Type':<10} {'Size':<12} {'Modified':<20} {'Name'}")
+        print("-" * 70)
+        for entry in listing['entries']:
+            size = self._format_size(entry['size']) if entry['size'] is not None else "N/A"
+            modified = datetime.fromtimestamp(entry['mtime']).strftime('%Y-%m-%d %H:%M') if entry['mtime'] else ""
+            print(f"{entry['type'].upper():<10} {size:<12} {modified:<20} {entry['name']}")
+        print("=" * 70)
+        
+        shown = listing['offset'] + len(listing['entries'])
+        print(f"Showing {listing['offset'] + 1 if listing['entries'] else 0}-{shown} of {listing['total']} entries")
+        if shown < listing['total']:
+            print(f"Next page: rfiles \"{listing['path']}\" offset={shown} limit={listing['limit']}")
+    
+    def do_rstat(self, arg):
+        """Show details of a remote file or directory.
+        Usage: rstat <path>"""
+        if not arg.strip():
+            print("Usage: rstat <path>")
+            return
+        
+        info = self._remote_json(f"!stat {arg.strip()}")
+        if not info:
+            return
+        
+        print(f"{Fore.CYAN}Path:{Style.RESET_ALL}     {info['path']}")
+        print(f"{Fore.CYAN}Type:{Style.RESET_ALL}     {info['type']}  {info['mode']}")
+        print(f"{Fore.CYAN}Size:{Style.RESET_ALL}     {self._format_size(info['size'])}")
+        for label, key in (("Modified", "mtime"), ("Changed", "ctime"), ("Accessed", "atime")):
+            print(f"{Fore.CYAN}{label + ':':<10}{Style.RESET_ALL}{datetime.fromtimestamp(info[key]).strftime('%Y-%m-%d %H:%M:%S')}")
+        if 'target' in info:
+            print(f"{Fore.CYAN}Target:{Style.RESET_ALL}   {info['target']}")
+        if 'entries' in info:
+            print(f"{Fore.CYAN}Entries:{Style.RESET_ALL}  {info['entries']}")
+    
+    def do_rfind(self, arg):
+        """Find remote files by name (glob pattern, case-insensitive).
+        Usage: rfind [root] <pattern> [offset=N] [limit=N] [depth=N]"""
+        if not arg.strip():
+            print("Usage: rfind [root] <pattern> [offset=N] [limit=N] [depth=N]")
+            return
+        
+        found = self._remote_json(f"!find {arg.strip()}")
+        if not found:
+            return
+        
+        for entry in found['entries']:
+            size = self._format_size(entry['size']) if entry['size'] is not None else "N/A"
+            print(f"{entry['type'].upper():<6} {size:>12}  {entry['path']}")
+        
+        shown = found['offset'] + len(found['entries'])
+        print(f"{len(found['entries'])} match(es) under {found['root']} ({found['scanned']} entries scanned)")
+        if found['truncated']:
+            print(f"{Fore.YELLOW}Search stopped early, narrow it down with a deeper root or depth=N{Style.RESET_ALL}")
+        elif found['more']:
+            print(f"Next page: rfind \"{found['root']}\" \"{found['pattern']}\" offset={shown} limit={found['limit']}")
     
     def do_lfiles(self, arg):
         """List local files in a specified directory.
@@ -373,10 +425,15 @@ class Sender(cmd.Cmd):
         self.do_upload(arg)
     
     def do_upload(self, arg):
-        """Upload a file to the remote system.
-        Usage: upload <file_path>
-        You can use relative or absolute paths."""
+        """Upload a file or directory to the remote system.
+        Usage: upload <file_path> [--store]
+        You can use relative or absolute paths. Directories are sent as one tar.gz stream,
+        --store sends it uncompressed (faster for data that is already compressed)."""
         file_path = arg.strip()
+        compress = True
+        if file_path.endswith(" --store"):
+            file_path = file_path[:-len(" --store")].strip()
+            compress = False
         if not file_path:
             print(f"Error: No file path provided. Use 'upload <file_path>'")
             print(f"Tip: Use 'lfiles' to see local files available for upload")
@@ -405,19 +462,11 @@ class Sender(cmd.Cmd):
             if proceed != 'y':
                 print("Upload cancelled.")
                 return
-                
-            # Upload each file in the directory
-            success_count = 0
-            for root, _, files in os.walk(file_path):
-                for file in files:
-                    file_full_path = os.path.join(root, file)
-                    try:
-                        self._upload_single_file(file_full_path)
-                        success_count += 1
-                    except Exception as e:
-                        print(f"Error uploading {file}: {str(e)}")
             
-            print(f"Uploaded {success_count} of {files_count} files from {file_path}")
+            try:
+                self._upload_directory(file_path, compress)
+            except Exception as e:
+                print(f"{Fore.RED}❌ Error uploading directory: {str(e)}{Style.RESET_ALL}")
             return
             
         # Upload a single file
@@ -467,6 +516,105 @@ class Sender(cmd.Cmd):
             print(f"{Fore.RED}❌ Error uploading file: {response.status_code} - {response.text}{Style.RESET_ALL}")
             raise Exception(f"Server error: {response.status_code}")
     
+    def _upload_directory(self, dir_path, compress=True):
+        """Upload a whole directory as one tar stream, packed while it is being sent"""
+        archive = "tar.gz" if compress else "tar"
+        name = f"{os.path.basename(os.path.normpath(dir_path))}.{archive}"
+        print(f"{Fore.CYAN}📤 Streaming: {name}{Style.RESET_ALL}")
+        
+        sent = [0]
+        start_time = time.time()
+        def progress(chunks):
+            for chunk in chunks:
+                sent[0] += len(chunk)
+                sys.stdout.write(f"\r{Fore.CYAN}Sent {self._format_size(sent[0])}{Style.RESET_ALL}   ")
+                sys.stdout.flush()
+                yield chunk
+        
+        # A generator body makes requests use chunked encoding, so the archive never exists on disk here
+        chunks = stream_directory(dir_path, compress)
+        try:
+            response = requests.post(
+                f"{self.server_url}/api/upload-stream",
+                params={"filename": name, "archive": archive},
+                data=progress(chunks),
+                headers={"Content-Type": "application/octet-stream"}
+            )
+        finally:
+            # Stops the packer if the upload failed halfway
+            chunks.close()
+        print()
+        
+        if response.status_code == 200:
+            file_id = response.json().get('file_id')
+            elapsed = max(time.time() - start_time, 0.001)
+            print(f"{Fore.GREEN}✅ Directory uploaded successfully!{Style.RESET_ALL}")
+            print(f"Archive: {name} ({self._format_size(sent[0])} in {elapsed:.1f} s)")
+            print(f"File ID: {file_id}")
+            print(f"{Fore.YELLOW}To unpack on remote system: !download {file_id} <destination_path>{Style.RESET_ALL}")
+            return file_id
+        raise Exception(f"Server error: {response.status_code} - {response.text}")
+    
+    def do_sync(self, arg):
+        """Push a local file to the remote system, sending only the blocks that changed.
+        Usage: sync <local_file> <remote_path>
+        The remote copy is rebuilt from its old version; if there is none the whole file is sent."""
+        # Quote paths with spaces; posix=False keeps Windows backslashes, so quotes are stripped by hand
+        try:
+            parts = [part.strip('"\'') for part in shlex.split(arg, posix=False)]
+        except ValueError:
+            parts = []
+        if len(parts) != 2:
+            print("Usage: sync <local_file> <remote_path>")
+            return
+        local_path, remote_path = os.path.abspath(parts[0]), parts[1]
+        if not os.path.isfile(local_path):
+            print(f"{Fore.RED}❌ Error: File not found: {local_path}{Style.RESET_ALL}")
+            return
+        
+        size = os.path.getsize(local_path)
+        start_time = time.time()
+        # The receiver reads the whole file for both steps, so give it time in proportion to its size
+        timeout = 60 + size / (10 * 1024 * 1024)
+        
+        # 1. The receiver describes the copy it already has, block by block
+        block_size = delta_sync.block_size_for(size)
+        sig_info = self._remote_json(f'!signature "{remote_path}" block={block_size}', timeout)
+        if not sig_info:
+            return
+        response = requests.get(f"{self.server_url}/api/download-file/{sig_info['file_id']}")
+        if response.status_code != 200:
+            print(f"{Fore.RED}❌ Error fetching signature: {response.status_code}{Style.RESET_ALL}")
+            return
+        
+        # 2. Matching blocks become copy instructions, only the rest is uploaded
+        try:
+            with tempfile.TemporaryFile() as delta:
+                stats = delta_sync.make_delta(local_path, response.content, delta)
+                delta_size = delta.tell()
+                delta.seek(0)
+                response = requests.post(
+                    f"{self.server_url}/api/upload-file",
+                    params={"transient": 1},
+                    files={'file': ("delta.bin", delta)}
+                )
+        except (OSError, ValueError) as e:
+            print(f"{Fore.RED}❌ Error computing delta: {str(e)}{Style.RESET_ALL}")
+            return
+        if response.status_code != 200:
+            print(f"{Fore.RED}❌ Error uploading delta: {response.status_code} - {response.text}{Style.RESET_ALL}")
+            return
+        
+        # 3. The receiver rebuilds the file and swaps it in once the hash matches
+        result = self._remote_json(f'!patch {response.json()["file_id"]} "{remote_path}"', timeout)
+        if not result:
+            return
+        
+        sent = delta_size + sig_info['signature_size']
+        print(f"{Fore.GREEN}✅ Synced {result['path']}{Style.RESET_ALL}")
+        print(f"File size: {self._format_size(size)}, reused {self._format_size(stats['copied_bytes'])} from the remote copy")
+        print(f"Transferred: {self._format_size(sent)} ({sent * 100 / max(size, 1):.1f}% of the file) in {time.time() - start_time:.1f} s")
+    
     def _show_spinner(self, action_text):
         """Show a spinner animation while performing a long operation"""
         self._stop_spinner = False
@@ -584,9 +732,101 @@ class Sender(cmd.Cmd):
             print(f"{Fore.YELLOW}4{Fore.WHITE} or {Fore.YELLOW}disk{Fore.WHITE} - Disk space information")
             return
         
+        # System info and the process list come from the receiver as structured data
+        if arg.strip() in ("1", "sysinfo"):
+            self.do_sysinfo("")
+            return
+        if arg.strip() in ("2", "proc"):
+            self.do_top("once")
+            return
+        
         command = cmd_map[arg.strip()]
         print(f"{Fore.CYAN}Executing: {Fore.WHITE}{command}{Style.RESET_ALL}")
         self.send_command(command)
+    
+    def _remote_json(self, command, timeout=60):
+        """Run a special command that answers with JSON and return the parsed result (None on failure)"""
+        output = self.send_command(command, quiet=True, timeout=timeout)
+        if not output:
+            return None
+        if output.get('return_code', 1) != 0:
+            print(f"{Fore.RED}{output.get('stderr', 'Command failed')}{Style.RESET_ALL}")
+            return None
+        try:
+            return json.loads(output.get('stdout', ''))
+        except ValueError:
+            print(f"{Fore.RED}Unexpected response: {output.get('stdout', '')[:200]}{Style.RESET_ALL}")
+            return None
+    
+    def do_sysinfo(self, arg):
+        """Show remote host information, CPU and memory usage.
+        Usage: sysinfo"""
+        info = self._remote_json("!sysinfo")
+        if not info:
+            return
+        
+        host = info.get('host', {})
+        usage = info.get('usage', {})
+        boot_time = host.get('boot_time')
+        print(f"{Fore.CYAN}Host:{Style.RESET_ALL}      {host.get('hostname')}")
+        print(f"{Fore.CYAN}System:{Style.RESET_ALL}    {host.get('system')} {host.get('release')} ({host.get('machine')})")
+        print(f"{Fore.CYAN}Version:{Style.RESET_ALL}   {host.get('version')}")
+        print(f"{Fore.CYAN}CPUs:{Style.RESET_ALL}      {host.get('cpu_count')} {host.get('processor') or ''}")
+        if boot_time:
+            print(f"{Fore.CYAN}Booted:{Style.RESET_ALL}    {datetime.fromtimestamp(boot_time).strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"{Fore.CYAN}CPU:{Style.RESET_ALL}       {usage.get('cpu_percent', 0):.1f}%")
+        print(f"{Fore.CYAN}Memory:{Style.RESET_ALL}    {self._format_size(usage.get('memory_total', 0) - usage.get('memory_available', 0))} "
+              f"of {self._format_size(usage.get('memory_total', 0))} ({usage.get('memory_percent', 0):.1f}%)")
+        if usage.get('swap_total'):
+            print(f"{Fore.CYAN}Swap:{Style.RESET_ALL}      {self._format_size(usage.get('swap_used', 0))} of {self._format_size(usage['swap_total'])}")
+        if usage.get('load'):
+            print(f"{Fore.CYAN}Load:{Style.RESET_ALL}      {' '.join(f'{load:.2f}' for load in usage['load'])}")
+    
+    def do_top(self, arg):
+        """Live view of the remote processes, refreshed with incremental updates.
+        Usage: top [count] [once]  (Ctrl+C to stop)"""
+        args = arg.split()
+        once = "once" in args
+        count = next((int(value) for value in args if value.isdigit()), 20)
+        
+        processes = {}
+        token = None
+        try:
+            while True:
+                # After the first full list only added, removed and changed processes come back
+                snapshot = self._remote_json(f"!ps since={token}" if token else "!ps")
+                if not snapshot:
+                    return
+                token = snapshot['token']
+                if snapshot.get('full'):
+                    processes = {row['pid']: row for row in snapshot['processes']}
+                else:
+                    for pid in snapshot['removed']:
+                        processes.pop(pid, None)
+                    for row in snapshot['added']:
+                        processes[row['pid']] = row
+                    for delta in snapshot['changed']:
+                        if delta['pid'] in processes:
+                            processes[delta['pid']].update(delta)
+                
+                usage = snapshot.get('usage', {})
+                if not once:
+                    clear_screen()
+                print(f"{Fore.CYAN}CPU {usage.get('cpu_percent', 0):.1f}%  Memory {usage.get('memory_percent', 0):.1f}%  "
+                      f"Processes {len(processes)}{Style.RESET_ALL}"
+                      + ("" if once else f"  {Fore.YELLOW}(Ctrl+C to stop){Style.RESET_ALL}"))
+                print(f"{'PID':>7} {'USER':<12} {'CPU%':>6} {'MEM MB':>8} {'THR':>4} {'S':<2} NAME")
+                top = sorted(processes.values(), key=lambda row: (row['cpu'], row['memory']), reverse=True)[:count]
+                for row in top:
+                    print(f"{row['pid']:>7} {row['user'][:12]:<12} {row['cpu']:>6.1f} {row['memory']:>8.1f} "
+                          f"{row['threads']:>4} {row['status'][:2]:<2} {row['name']}")
+                
+                if once:
+                    return
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print()
+    
     def do_help(self, arg):
         """Show help for commands"""
         if arg:
@@ -598,12 +838,16 @@ class Sender(cmd.Cmd):
         print(f"\n=== SirAbody Remote Command System - Help ===")
         
         print(f"\n1. Navigation and File Management:")
-        print(f"  cd <path>          - Change local directory (supports cd .. and cd ../..)") 
+        print(f"  cd <path>          - Change remote directory (supports cd .. and cd ../..)") 
         print(f"  browse [dir]       - List files in local directory")
-        print(f"  upload <file_path>  - Upload a file to the server")
+        print(f"  upload <file_path>  - Upload a file or directory to the server (--store: no compression)")
         print(f"  quickup <pattern>   - Search for and upload files by pattern")
         
         print(f"\n2. Remote File Operations:")
+        print(f"  rfiles [dir]       - List a remote directory (offset=N limit=N for more pages)")
+        print(f"  rstat <path>       - Show details of a remote file or directory")
+        print(f"  rfind [root] <pattern> - Find remote files by name, e.g. rfind C:/Users *.pdf")
+        print(f"  sync <file> <remote_path> - Update a remote file, sending only the changed blocks")
         print(f"  listfiles          - List files available on the remote server")
         print(f"  download <id> <path> - Download a file to specified path")
         print(f"  downloadto <id> [dir] - Download to current/specified directory")
@@ -616,6 +860,8 @@ class Sender(cmd.Cmd):
         print(f"                      2/proc: Process list")
         print(f"                      3/net: Network info")
         print(f"                      4/disk: Disk space info")
+        print(f"  sysinfo            - Show remote host info, CPU and memory usage")
+        print(f"  top [count]        - Live view of the remote processes (Ctrl+C to stop)")
         
         print(f"\n4. System:")
         print(f"  help               - Display this help message")
@@ -627,11 +873,13 @@ class Sender(cmd.Cmd):
         print(f"  upload test.txt     - Upload test.txt from current directory")
         print(f"  downloadto abc123   - Download file with ID abc123 to current dir")
     
-    def send_command(self, command):
-        """Send a command to the remote system"""
+    def send_command(self, command, quiet=False, timeout=60):
+        """Send a command to the remote system and return its output (None if it failed or timed out).
+        With quiet=True nothing is printed, for commands whose output we parse ourselves"""
         try:
             data = {
-                "command": command
+                "command": command,
+                "session_id": self.session_id
             }
             response = requests.post(
                 f"{self.server_url}/api/send-command", 
@@ -642,41 +890,58 @@ class Sender(cmd.Cmd):
                 result = response.json()
                 command_id = result.get("command_id")
                 self.active_commands[command_id] = command
-                print(f"{Fore.GREEN}Command sent successfully!{Style.RESET_ALL}")
-                print(f"Command ID: {command_id}")
+                if not quiet:
+                    print(f"{Fore.GREEN}Command sent successfully!{Style.RESET_ALL}")
+                    print(f"Command ID: {command_id}")
                 
                 # Start polling for the command output
-                self.poll_command_output(command_id)
+                return self.poll_command_output(command_id, quiet, timeout)
             else:
                 print(f"{Fore.RED}Error sending command: {response.status_code} - {response.text}{Style.RESET_ALL}")
         except Exception as e:
             print(f"{Fore.RED}Error connecting to server: {str(e)}{Style.RESET_ALL}")
+        return None
     
-    def poll_command_output(self, command_id):
-        """Poll for command output with a timeout"""
+    def poll_command_output(self, command_id, quiet=False, timeout=60):
+        """Poll for command output, giving up after `timeout` seconds of waiting, and return it"""
         start_time = time.time()
-        timeout = 60  # Timeout after 60 seconds of waiting
+        wait = 20  # The server answers as soon as the command completes, or after this many seconds
         
-        print(f"{Fore.CYAN}Waiting for command to complete...{Style.RESET_ALL}")
+        if quiet:
+            spinner_thread = None
+        else:
+            print(f"{Fore.CYAN}Waiting for command to complete...{Style.RESET_ALL}")
+            
+            # Show spinner while waiting
+            spinner_thread = threading.Thread(target=self._show_spinner, args=("Waiting for response",))
+            spinner_thread.daemon = True
+            spinner_thread.start()
         
-        # Show spinner while waiting
-        spinner_thread = threading.Thread(target=self._show_spinner, args=("Waiting for response",))
-        spinner_thread.daemon = True
-        spinner_thread.start()
+        def stop_spinner():
+            if spinner_thread:
+                self._stop_spinner = True
+                spinner_thread.join()
         
         try:
             while time.time() - start_time < timeout:
-                response = requests.get(f"{self.server_url}/api/command-status/{command_id}")
+                remaining = max(0, min(wait, timeout - (time.time() - start_time)))
+                response = requests.get(
+                    f"{self.server_url}/api/command-status/{command_id}",
+                    params={"wait": remaining},
+                    timeout=remaining + 10
+                )
                 
                 if response.status_code == 200:
                     status = response.json()
                     
                     if status.get('status') == "completed" and status.get('output'):
                         # Stop spinner
-                        self._stop_spinner = True
-                        spinner_thread.join()
+                        stop_spinner()
                         
                         output = status.get('output', {})
+                        if quiet:
+                            return output
+                        
                         stdout = output.get('stdout', '')
                         stderr = output.get('stderr', '')
                         return_code = output.get('return_code', -1)
@@ -691,21 +956,21 @@ class Sender(cmd.Cmd):
                             print(f"{Fore.RED}\nSTDERR:{Style.RESET_ALL}")
                             print(stderr)
                         
-                        return
-                
-                # Wait before polling again
-                time.sleep(2)
+                        return output
+                else:
+                    # Unknown command or server error, don't hammer the server
+                    time.sleep(2)
         
         except Exception as e:
-            self._stop_spinner = True
-            spinner_thread.join()
+            stop_spinner()
             print(f"{Fore.RED}Error checking command status: {str(e)}{Style.RESET_ALL}")
+            return None
         
         # If we got here, command timed out or had an error
-        self._stop_spinner = True
-        spinner_thread.join()
+        stop_spinner()
         print(f"{Fore.RED}\nCommand timed out or error occurred. You can check the status later using:{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}status {command_id}{Style.RESET_ALL}")
+        return None
 
 def clear_screen():
     # Clear the screen based on the operating system
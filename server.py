@@ -10,6 +10,7 @@ import tempfile
 import base64
 import time
 import io
+import threading
 from PIL import Image
 import datetime
 from werkzeug.utils import secure_filename
@@ -19,22 +20,144 @@ CORS(app)
 
 # Store for commands and their outputs
 command_store = {}
+# Woken up when a command is queued or completed, for the long polls of the receiver and the sender
+command_condition = threading.Condition()
 # Store for file transfers
 file_transfer_store = {}
 # Store for screen sharing data
 screen_store = {}
-# Store for mouse control commands
-mouse_control_store = {}
+# Latest zoom region frame of each device, kept apart so it never stands in for a monitor frame
+roi_store = {}
+# Pending mouse and keyboard events for each device, in the order they were sent
+input_store = {}
+# Woken up when input arrives so the receiver's long poll returns immediately
+input_condition = threading.Condition()
 # Store for mouse control results
 mouse_control_results = {}
-# Store for keyboard input commands
+# Store for keyboard input commands (status tracking, the events themselves go through input_store)
 keyboard_store = {}
 # Store for keyboard input results
 keyboard_results = {}
-# Store for audio data
+# Store for audio data: per device the last AUDIO_BUFFER_SIZE chunks, each numbered with a seq
 audio_store = {}
+# Woken up whenever an audio chunk arrives, for the listeners of /api/audio/stream
+audio_condition = threading.Condition()
+# Store for H.264 video segments (fragmented MP4), one stream per monitor
+video_store = {}
+# Number of video segments kept per device (one segment per frame)
+VIDEO_SEGMENT_BUFFER = 150
+# Viewers currently watching each device, keyed by viewer id
+viewer_store = {}
+# Woken up whenever a viewer fetches a frame, so idle receivers can ramp up immediately
+viewer_condition = threading.Condition()
+# Seconds without a fetch before a viewer is considered gone (the slowest viewer refresh is 5 seconds)
+VIEWER_TIMEOUT = 10
+# Latest cursor position and shape of each device, sent apart from the screen frames
+cursor_store = {}
+# Woken up on every cursor change so long-polling viewers get it right away
+cursor_condition = threading.Condition()
 # Buffer size for audio data
 AUDIO_BUFFER_SIZE = 50  # Store up to 50 audio chunks per device
+# Seconds between keepalives on an idle audio stream (also how soon a gone listener frees its thread)
+AUDIO_STREAM_KEEPALIVE = 15
+# Audio channels next to the device's own microphone, picked with ?channel=:
+# 'talk' carries the viewer's microphone to the device's speakers
+AUDIO_CHANNELS = ["talk"]
+
+# Audio codecs from the most to the least compressed (see audio_codec.py)
+AUDIO_FORMATS = ["opus", "adpcm", "mulaw", "pcm"]
+# What a viewer decodes before it has told us, every player in static/js handles these
+DEFAULT_VIEWER_AUDIO_FORMATS = ["adpcm", "mulaw", "pcm"]
+
+def queue_command(command, **fields):
+    """Store a command for the receiver, wake up its long poll and return the command id"""
+    command_id = str(time.time())
+    entry = {
+        "command": command,
+        "status": "pending",
+        "output": None,
+        "timestamp": time.time()
+    }
+    entry.update(fields)
+    with command_condition:
+        command_store[command_id] = entry
+        command_condition.notify_all()
+    return command_id
+
+def queue_input(device_id, event):
+    """Queue a mouse or keyboard event for the receiver and wake up its long poll"""
+    with input_condition:
+        input_store.setdefault(device_id, []).append(event)
+        input_condition.notify_all()
+
+def get_viewer_id():
+    """Identify the viewer making this request"""
+    return request.args.get('viewer_id') or request.remote_addr
+
+def register_viewer(device_id):
+    """Record that someone is watching this device"""
+    with viewer_condition:
+        viewer_store.setdefault(device_id, {}).setdefault(get_viewer_id(), {})["last_seen"] = time.time()
+        viewer_condition.notify_all()
+
+def count_viewers(device_id):
+    """Count the viewers seen recently, forgetting the ones that went away"""
+    current_time = time.time()
+    with viewer_condition:
+        viewers = viewer_store.get(device_id, {})
+        for viewer_id in list(viewers.keys()):
+            if current_time - viewers[viewer_id]["last_seen"] > VIEWER_TIMEOUT:
+                del viewers[viewer_id]
+        return len(viewers)
+
+def selected_monitors(device_id):
+    """Monitors the current viewers want to see, or None if nobody picked one"""
+    count_viewers(device_id)
+    with viewer_condition:
+        viewers = viewer_store.get(device_id, {}).values()
+        if not any("monitor" in viewer for viewer in viewers):
+            return None
+        # Viewers that never picked a monitor are watching the primary one
+        return sorted(set(viewer.get("monitor", 1) for viewer in viewers))
+
+def selected_mode(device_id):
+    """Screen transport for the current viewers: H.264 only when all of those fetching frames play it.
+    Video uploads replace the JPEG images, so a single JPEG viewer keeps everyone on JPEG."""
+    count_viewers(device_id)
+    with viewer_condition:
+        modes = set(viewer.get("mode") for viewer in viewer_store.get(device_id, {}).values())
+        return "h264" if "h264" in modes and "jpeg" not in modes else "jpeg"
+
+def selected_roi(device_id):
+    """The zoom region most recently requested by a current viewer, or None"""
+    count_viewers(device_id)
+    with viewer_condition:
+        viewers = [viewer for viewer in viewer_store.get(device_id, {}).values() if viewer.get("roi")]
+        if not viewers:
+            return None
+        return max(viewers, key=lambda viewer: viewer["roi_time"])["roi"]
+
+def get_screen_channel(device_id):
+    """Return (monitor, screen data) for the monitor this viewer is watching"""
+    channels = screen_store[device_id]["channels"]
+    if not channels:
+        return None, None
+    viewer = viewer_store.get(device_id, {}).get(get_viewer_id(), {})
+    monitor = request.args.get('monitor', type=int) or viewer.get("monitor")
+    
+    # The receiver may not stream a newly selected monitor yet, show the primary one meanwhile
+    if monitor not in channels:
+        monitor = 1 if 1 in channels else min(channels)
+    return monitor, channels[monitor]
+
+def store_screen_channel(device_id, data, screen_data):
+    """Keep the latest frame of one monitor channel"""
+    monitor = screen_data.get('monitor', 1)
+    entry = screen_store.setdefault(device_id, {"channels": {}})
+    entry["channels"][monitor] = screen_data
+    entry["monitors"] = data.get('monitors') or entry.get("monitors") or [{"index": monitor}]
+    entry["capabilities"] = data.get('capabilities', ["jpeg"])
+    entry["timestamp"] = time.time()
 
 @app.route('/')
 def home():
@@ -54,28 +177,38 @@ def send_command():
     if not data or 'command' not in data:
         return jsonify({"error": "Invalid command data"}), 400
     
-    command_id = str(time.time())
-    command_store[command_id] = {
-        "command": data['command'],
-        "status": "pending",
-        "output": None,
-        "timestamp": time.time()
-    }
+    # The sender session, the receiver keeps a shell per session
+    command_id = queue_command(data['command'], session_id=data.get('session_id'))
     
     return jsonify({
         "command_id": command_id,
         "status": "pending"
     })
 
+def pending_commands(command_type):
+    """Pending commands of one type ('command' from the sender, 'terminal' from the viewer)"""
+    return {
+        cmd_id: cmd_data for cmd_id, cmd_data in list(command_store.items())
+        if cmd_data["status"] == "pending" and cmd_data.get("type", "command") == command_type
+    }
+
 @app.route('/api/get-commands', methods=['GET'])
 def get_commands():
-    # Endpoint for receiver to poll for pending commands
-    pending_commands = {}
-    for cmd_id, cmd_data in list(command_store.items()):
-        if cmd_data["status"] == "pending":
-            pending_commands[cmd_id] = cmd_data
-    
-    return jsonify(pending_commands)
+    # Long poll for the receiver: returns pending commands as soon as there are any, or after the timeout.
+    # They are marked running, so the next poll (or the receiver's other polling thread) doesn't run them again
+    timeout = min(request.args.get('timeout', 0, type=float), 25)
+    command_type = request.args.get('command_type', 'command')
+    deadline = time.time() + timeout
+    
+    with command_condition:
+        commands = pending_commands(command_type)
+        while not commands and time.time() < deadline:
+            command_condition.wait(deadline - time.time())
+            commands = pending_commands(command_type)
+        for cmd_data in commands.values():
+            cmd_data["status"] = "running"
+    
+    return jsonify(commands)
 
 @app.route('/api/update-command', methods=['POST'])
 def update_command():
@@ -87,8 +220,10 @@ def update_command():
     if cmd_id not in command_store:
         return jsonify({"error": "Command ID not found"}), 404
     
-    command_store[cmd_id]["status"] = "completed"
-    command_store[cmd_id]["output"] = data['output']
+    with command_condition:
+        command_store[cmd_id]["status"] = "completed"
+        command_store[cmd_id]["output"] = data['output']
+        command_condition.notify_all()
     
     return jsonify({"status": "success"})
 
@@ -97,6 +232,16 @@ def command_status(command_id):
     if command_id not in command_store:
         return jsonify({"error": "Command ID not found"}), 404
     
+    # With ?wait=N this waits up to N seconds for the command to complete instead of answering right away
+    wait = min(request.args.get('wait', 0, type=float), 25)
+    deadline = time.time() + wait
+    with command_condition:
+        while (command_id in command_store and command_store[command_id]["status"] != "completed"
+               and time.time() < deadline):
+            command_condition.wait(deadline - time.time())
+    
+    if command_id not in command_store:
+        return jsonify({"error": "Command ID not found"}), 404
     return jsonify(command_store[command_id])
 
 @app.route('/api/clean-old-data', methods=['POST'])
@@ -139,6 +284,42 @@ def upload_file():
     file_transfer_store[file_id] = {
         "filename": filename,
         "path": file_path,
+        # Transient files (delta sync signatures and deltas) can be downloaded but aren't listed
+        "status": "transient" if request.args.get('transient') else "available",
+        "timestamp": time.time()
+    }
+    
+    return jsonify({
+        "file_id": file_id,
+        "filename": filename,
+        "status": "uploaded"
+    })
+
+@app.route('/api/upload-stream', methods=['POST'])
+def upload_stream():
+    # A directory packed on the fly by the sender as one tar (or tar.gz) stream, sent with chunked encoding.
+    # It is written to disk as it arrives and stored as a single transfer object
+    filename = secure_filename(request.args.get('filename', ''))
+    archive = request.args.get('archive', 'tar.gz')
+    if not filename or archive not in ('tar', 'tar.gz'):
+        return jsonify({"error": "Invalid stream parameters"}), 400
+    
+    file_id = str(time.time())
+    file_path = os.path.join(tempfile.gettempdir(), f"{file_id}_{filename}")
+    size = 0
+    with open(file_path, 'wb') as f:
+        while True:
+            chunk = request.stream.read(1024 * 1024)
+            if not chunk:
+                break
+            f.write(chunk)
+            size += len(chunk)
+    
+    file_transfer_store[file_id] = {
+        "filename": filename,
+        "path": file_path,
+        "archive": archive,
+        "size": size,
         "status": "available",
         "timestamp": time.time()
     }
@@ -146,6 +327,7 @@ def upload_file():
     return jsonify({
         "file_id": file_id,
         "filename": filename,
+        "size": size,
         "status": "uploaded"
     })
 
@@ -156,11 +338,15 @@ def download_file(file_id):
     
     file_info = file_transfer_store[file_id]
     
-    return send_file(
+    response = send_file(
         file_info["path"],
         as_attachment=True,
         download_name=file_info["filename"]
     )
+    if file_info.get("archive"):
+        # Tells the receiver to unpack the stream instead of saving it
+        response.headers["X-Archive"] = file_info["archive"]
+    return response
 
 @app.route('/api/list-files', methods=['GET'])
 def list_files():
@@ -170,6 +356,7 @@ def list_files():
         if file_info["status"] == "available":
             available_files[file_id] = {
                 "filename": file_info["filename"],
+                "archive": file_info.get("archive"),
                 "timestamp": file_info["timestamp"]
             }
     
@@ -184,20 +371,118 @@ def update_screen():
     device_id = data['device_id']
     screen_data = data['screen_data']
     
-    # Store the latest screen data for this device
-    screen_store[device_id] = {
-        "screen_data": screen_data,
-        "timestamp": time.time()
-    }
+    if 'roi' in screen_data:
+        # Zoom region frames are kept apart from the monitor channels
+        roi_store[device_id] = screen_data
+    else:
+        # Store the latest screen data for this monitor of the device
+        store_screen_channel(device_id, data, screen_data)
+    
+    # Tell the receiver which transport and monitors the viewers negotiated and whether anyone is watching
+    return jsonify({
+        "status": "success",
+        "mode": selected_mode(device_id),
+        "monitors": selected_monitors(device_id),
+        "roi": selected_roi(device_id),
+        "viewers": count_viewers(device_id)
+    })
+
+@app.route('/api/update-video', methods=['POST'])
+def update_video():
+    data = request.get_json()
+    if not data or 'device_id' not in data or 'screen_data' not in data:
+        return jsonify({"error": "Invalid video data"}), 400
+    
+    device_id = data['device_id']
+    video_data = data['screen_data']
+    monitor = video_data.get('monitor', 1)
+    
+    # A new stream id means the encoder was restarted, so old segments are useless
+    streams = video_store.setdefault(device_id, {})
+    stream = streams.get(monitor)
+    if not stream or stream["stream_id"] != video_data.get('stream_id'):
+        stream = {
+            "stream_id": video_data.get('stream_id'),
+            "init": video_data.get('init'),
+            "mime": video_data.get('mime'),
+            "segments": []
+        }
+        streams[monitor] = stream
+    
+    stream["segments"].extend(video_data.get('segments', []))
+    
+    # Limit buffer size
+    if len(stream["segments"]) > VIDEO_SEGMENT_BUFFER:
+        stream["segments"] = stream["segments"][-VIDEO_SEGMENT_BUFFER:]
+    
+    # Keep the screen metadata fresh so the viewer page and mouse control keep working
+    store_screen_channel(device_id, data, {
+        "width": video_data.get('width'),
+        "height": video_data.get('height'),
+        "screen_width": video_data.get('screen_width'),
+        "screen_height": video_data.get('screen_height'),
+        "monitor": monitor,
+        "timestamp": video_data.get('timestamp'),
+        "capture_time": video_data.get('capture_time')
+    })
+    
+    return jsonify({
+        "status": "success",
+        "mode": selected_mode(device_id),
+        "monitors": selected_monitors(device_id),
+        "roi": selected_roi(device_id),
+        "viewers": count_viewers(device_id)
+    })
+
+@app.route('/api/update-cursor', methods=['POST'])
+def update_cursor():
+    data = request.get_json()
+    if not data or 'device_id' not in data or 'x' not in data or 'y' not in data:
+        return jsonify({"error": "Invalid cursor data"}), 400
+    
+    device_id = data['device_id']
+    with cursor_condition:
+        previous = cursor_store.get(device_id)
+        cursor_store[device_id] = {
+            "x": data['x'],
+            "y": data['y'],
+            "monitor": data.get('monitor', 1),
+            "shape": data.get('shape', "default"),
+            "seq": previous["seq"] + 1 if previous else 1,
+            "timestamp": data.get('timestamp', time.time())
+        }
+        cursor_condition.notify_all()
     
     return jsonify({"status": "success"})
 
+@app.route('/api/get-cursor/<device_id>')
+def get_cursor(device_id):
+    # Long poll: returns as soon as the cursor differs from the `after` seq the viewer has, or after the timeout
+    after = request.args.get('after', 0, type=int)
+    timeout = min(request.args.get('timeout', 0, type=float), 25)
+    deadline = time.time() + timeout
+    
+    with cursor_condition:
+        cursor = cursor_store.get(device_id)
+        # A different seq (even a lower one after a server restart) is a change
+        while (not cursor or cursor["seq"] == after) and time.time() < deadline:
+            cursor_condition.wait(deadline - time.time())
+            cursor = cursor_store.get(device_id)
+    
+    if not cursor or cursor["seq"] == after:
+        return jsonify({"status": "no_change"}), 200
+    
+    return jsonify({"status": "success", "cursor": cursor})
+
 @app.route('/screen/<device_id>')
 def view_screen(device_id):
     # Check if we have screen data for this device
     if device_id not in screen_store:
         return render_template('no_device.html', device_id=device_id)
     
+    # Opening the page already counts as watching, so the receiver starts ramping up
+    register_viewer(device_id)
+    
     # Get timestamp of last update
     last_update = datetime.datetime.fromtimestamp(screen_store[device_id]['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
     
@@ -210,15 +495,154 @@ def get_screen(device_id):
     if device_id not in screen_store:
         return jsonify({"error": "Device not found or not sharing screen"}), 404
     
-    # Get the latest screen data
-    screen_data = screen_store[device_id]['screen_data']
+    register_viewer(device_id)
+    with viewer_condition:
+        # Fetching images makes this a JPEG viewer, until it asks for H.264
+        viewer_store[device_id][get_viewer_id()]["mode"] = "jpeg"
+    
+    # Get the latest screen data of the monitor this viewer is watching
+    monitor, screen_data = get_screen_channel(device_id)
     
     return jsonify({
         "status": "success",
         "screen_data": screen_data,
+        "monitor": monitor,
+        "monitors": screen_store[device_id].get('monitors', []),
+        "capabilities": screen_store[device_id].get('capabilities', ["jpeg"]),
         "timestamp": screen_store[device_id]['timestamp']
     })
 
+@app.route('/api/get-video/<device_id>')
+def get_video(device_id):
+    register_viewer(device_id)
+    
+    if device_id not in video_store or device_id not in screen_store:
+        return jsonify({"status": "no_data"}), 200
+    
+    monitor, screen_data = get_screen_channel(device_id)
+    if monitor not in video_store[device_id]:
+        return jsonify({"status": "no_data"}), 200
+    
+    stream = video_store[device_id][monitor]
+    segments = stream["segments"]
+    after = request.args.get('after', type=int)
+    
+    # New viewers, a restarted encoder or a viewer that fell behind the buffer
+    # must start again from the latest keyframe
+    reset = (
+        after is None
+        or request.args.get('stream_id') != stream["stream_id"]
+        or not segments
+        or after < segments[0]["seq"] - 1
+    )
+    
+    if reset:
+        start = 0
+        for index, segment in enumerate(segments):
+            if segment.get("keyframe"):
+                start = index
+        new_segments = segments[start:] if segments and segments[start].get("keyframe") else []
+    else:
+        new_segments = [segment for segment in segments if segment["seq"] > after]
+    
+    response = {
+        "status": "success",
+        "stream_id": stream["stream_id"],
+        "mime": stream["mime"],
+        "reset": reset,
+        "segments": new_segments,
+        "screen_data": screen_data,
+        "monitor": monitor,
+        "monitors": screen_store[device_id].get('monitors', [])
+    }
+    if reset:
+        response["init"] = stream["init"]
+    
+    return jsonify(response)
+
+@app.route('/api/wait-viewer/<device_id>')
+def wait_viewer(device_id):
+    # Long poll for idle receivers: returns as soon as someone is watching, or after the timeout
+    timeout = min(request.args.get('timeout', 0, type=float), 30)
+    deadline = time.time() + timeout
+    
+    with viewer_condition:
+        viewers = count_viewers(device_id)
+        while viewers == 0 and time.time() < deadline:
+            viewer_condition.wait(deadline - time.time())
+            viewers = count_viewers(device_id)
+    
+    return jsonify({"status": "success", "viewers": viewers})
+
+@app.route('/api/screen-mode/<device_id>', methods=['POST'])
+def set_screen_mode(device_id):
+    # Endpoint for the viewer to negotiate the screen transport
+    data = request.get_json()
+    if not data or data.get('mode') not in ['jpeg', 'h264']:
+        return jsonify({"error": "Invalid screen mode"}), 400
+    
+    # Kept per viewer and forgotten with it, so the receiver goes back to JPEG once no H.264 viewer is left
+    with viewer_condition:
+        viewer_store.setdefault(device_id, {}).setdefault(get_viewer_id(), {}).update({
+            "mode": data['mode'],
+            "last_seen": time.time()
+        })
+        viewer_condition.notify_all()
+    
+    return jsonify({"status": "success", "mode": data['mode']})
+
+@app.route('/api/screen-monitor/<device_id>', methods=['POST'])
+def set_screen_monitor(device_id):
+    # Endpoint for the viewer to pick which monitor it watches
+    data = request.get_json()
+    if not data or not isinstance(data.get('monitor'), int):
+        return jsonify({"error": "Invalid monitor"}), 400
+    
+    with viewer_condition:
+        viewer_store.setdefault(device_id, {}).setdefault(get_viewer_id(), {}).update({
+            "monitor": data['monitor'],
+            "last_seen": time.time()
+        })
+        viewer_condition.notify_all()
+    
+    return jsonify({"status": "success", "monitor": data['monitor']})
+
+@app.route('/api/screen-roi/<device_id>', methods=['POST'])
+def set_screen_roi(device_id):
+    # Endpoint for the viewer to request a native resolution zoom region (null to stop it)
+    data = request.get_json()
+    if data is None or 'roi' not in data:
+        return jsonify({"error": "Invalid zoom region"}), 400
+    
+    roi = data['roi']
+    if roi is not None:
+        try:
+            roi = {key: int(roi[key]) for key in ["monitor", "x", "y", "width", "height"]}
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Invalid zoom region"}), 400
+        if roi["width"] <= 0 or roi["height"] <= 0:
+            return jsonify({"error": "Invalid zoom region"}), 400
+    
+    with viewer_condition:
+        viewer_store.setdefault(device_id, {}).setdefault(get_viewer_id(), {}).update({
+            "roi": roi,
+            "roi_time": time.time(),
+            "last_seen": time.time()
+        })
+        viewer_condition.notify_all()
+    
+    return jsonify({"status": "success", "roi": roi})
+
+@app.route('/api/get-roi/<device_id>')
+def get_roi(device_id):
+    register_viewer(device_id)
+    
+    roi_data = roi_store.get(device_id)
+    if not roi_data:
+        return jsonify({"status": "no_data"}), 200
+    
+    return jsonify({"status": "success", "screen_data": roi_data})
+
 @app.route('/view')
 def view_page():
     # Page for entering device ID to view screen
@@ -243,38 +667,57 @@ def send_mouse_control(device_id):
     if not data or 'action' not in data:
         return jsonify({"error": "Invalid mouse control data"}), 400
     
-    # Store the command for the device to pick up
-    mouse_control_store[device_id] = {
+    # Queue the command for the device to pick up (a move followed by a click must both arrive)
+    queue_input(device_id, {
+        "kind": "mouse",
         "action": data['action'],
         "x": data.get('x'),
         "y": data.get('y'),
         "button": data.get('button'),
+        "monitor": data.get('monitor'),
         "timestamp": time.time()
-    }
+    })
     
     return jsonify({"status": "success"})
 
-@app.route('/api/get-mouse-control/<device_id>', methods=['GET'])
-def get_mouse_control(device_id):
-    # Endpoint for the receiver to poll for mouse control commands
-    if device_id not in mouse_control_store:
-        return jsonify({}), 200  # No commands, empty response
-    
-    # Get the command and remove it from the store (one-time use)
-    command = mouse_control_store.pop(device_id)
-    
-    return jsonify(command)
+@app.route('/api/get-input/<device_id>', methods=['GET'])
+def get_input(device_id):
+    # Long poll for the receiver: returns all pending input as soon as there is any, or after the timeout
+    timeout = min(request.args.get('timeout', 0, type=float), 25)
+    deadline = time.time() + timeout
+    
+    with input_condition:
+        while not input_store.get(device_id) and time.time() < deadline:
+            input_condition.wait(deadline - time.time())
+        events = input_store.pop(device_id, [])
+    
+    for event in events:
+        if event["kind"] == "keyboard" and event["command_id"] in keyboard_store:
+            keyboard_store[event["command_id"]]["status"] = "processing"
+    
+    return jsonify({"status": "success", "events": events})
 
-@app.route('/api/mouse-control-result/<device_id>', methods=['POST'])
-def mouse_control_result(device_id):
-    # Endpoint for the receiver to report mouse control results
+@app.route('/api/input-results/<device_id>', methods=['POST'])
+def input_results(device_id):
+    # Endpoint for the receiver to report the results of a batch of input events
     data = request.get_json()
+    if not data or not isinstance(data.get('results'), list):
+        return jsonify({"error": "Invalid result data"}), 400
     
-    # Store the result
-    mouse_control_results[device_id] = {
-        "result": data,
-        "timestamp": time.time()
-    }
+    for result in data['results']:
+        if result.get('kind') == "mouse":
+            # Only the latest mouse result is kept
+            mouse_control_results[device_id] = {
+                "result": result.get('result'),
+                "timestamp": time.time()
+            }
+        elif result.get('command_id') in keyboard_store:
+            command_id = result['command_id']
+            keyboard_store[command_id]["status"] = "completed"
+            keyboard_results[command_id] = {
+                "result": result.get('result'),
+                "timestamp": time.time()
+            }
     
     return jsonify({"status": "success"})
 
@@ -299,13 +742,7 @@ def set_quality(device_id):
     quality = data['quality']
     
     # Store as a command for the receiver to pick up
-    command_id = str(time.time())
-    command_store[command_id] = {
-        "command": f"!screen quality={quality}",
-        "status": "pending",
-        "output": None,
-        "timestamp": time.time()
-    }
+    command_id = queue_command(f"!screen quality={quality}")
     
     return jsonify({
         "status": "success", 
@@ -332,6 +769,13 @@ def keyboard_input(device_id):
         "status": "pending",
         "timestamp": time.time()
     }
+    queue_input(device_id, {
+        "kind": "keyboard",
+        "command_id": command_id,
+        "type": data['type'],
+        "input": data['input'],
+        "timestamp": time.time()
+    })
     
     return jsonify({
         "status": "success", 
@@ -339,44 +783,6 @@ def keyboard_input(device_id):
         "command_id": command_id
     })
 
-@app.route('/api/get-keyboard/<device_id>', methods=['GET'])
-def get_keyboard_input(device_id):
-    """API endpoint for receiver to get pending keyboard commands"""
-    # Get pending commands for this device
-    pending_commands = []
-    for command_id, command in list(keyboard_store.items()):
-        if command["device_id"] == device_id and command["status"] == "pending":
-            command_copy = command.copy()
-            command_copy["command_id"] = command_id
-            pending_commands.append(command_copy)
-            # Mark as processing
-            keyboard_store[command_id]["status"] = "processing"
-    
-    return jsonify({
-        "status": "success",
-        "commands": pending_commands
-    })
-
-@app.route('/api/keyboard-result/<device_id>', methods=['POST'])
-def keyboard_input_result(device_id):
-    """API endpoint for receiver to report keyboard command results"""
-    data = request.get_json()
-    if not data or 'command_id' not in data or 'result' not in data:
-        return jsonify({"error": "Invalid result data"}), 400
-    
-    command_id = data['command_id']
-    if command_id not in keyboard_store:
-        return jsonify({"error": "Command not found"}), 404
-    
-    # Update command status
-    keyboard_store[command_id]["status"] = "completed"
-    keyboard_results[command_id] = {
-        "result": data['result'],
-        "timestamp": time.time()
-    }
-    
-    return jsonify({"status": "success"})
-
 @app.route('/api/get-keyboard-result/<command_id>', methods=['GET'])
 def get_keyboard_input_result(command_id):
     """API endpoint to get the result of a keyboard command"""
@@ -395,76 +801,178 @@ def get_keyboard_input_result(command_id):
     })
 
 # Audio streaming API endpoints
+def negotiate_audio_format(device_id):
+    """Best codec both the receiver can encode and the viewer can decode, stored as the device's format"""
+    entry = audio_store[device_id]
+    capabilities = entry.get("capabilities", ["pcm"])  # Receivers that don't say only send pcm
+    accepted = entry.get("viewer_formats", DEFAULT_VIEWER_AUDIO_FORMATS)
+    entry["format"] = next(
+        (fmt for fmt in AUDIO_FORMATS if fmt in capabilities and fmt in accepted), "pcm"
+    )
+    return entry["format"]
+
+def audio_channel(device_id):
+    """audio_store key of the channel this request is about, the device's microphone by default"""
+    channel = request.args.get('channel')
+    return f"{device_id}:{channel}" if channel in AUDIO_CHANNELS else device_id
+
+def new_audio_entry():
+    return {"microphone": [], "seq": 0, "timestamp": time.time()}
+
+def audio_chunk_message(device_id, chunk):
+    """What listeners get for one audio chunk"""
+    return {
+        "status": "success",
+        "seq": chunk["seq"],
+        "audio_data": chunk["audio_data"],
+        "format": chunk.get("format", "pcm"),
+        "sample_format": chunk.get("sample_format", "s16"),
+        "channels": chunk.get("channels", 1),
+        "rate": chunk.get("rate", 16000),
+        "timestamp": chunk.get("timestamp", time.time()),
+        "capture_time": chunk.get("capture_time"),  # Receiver's media clock, the same as the screen frames'
+        "duration": chunk.get("duration"),
+        "comfort_noise": chunk.get("comfort_noise"),
+        "capabilities": audio_store[device_id].get("capabilities", ["pcm"])
+    }
+
+def audio_chunks_after(device_id, after):
+    """Buffered chunks newer than seq `after`. A listener that fell behind the buffer, or that has
+    a seq from before a server restart, starts again from the newest chunk."""
+    chunks = audio_store.get(device_id, {}).get("microphone", [])
+    if not chunks:
+        return []
+    if after < chunks[0]["seq"] - 1 or after > chunks[-1]["seq"]:
+        return chunks[-1:]
+    return [chunk for chunk in chunks if chunk["seq"] > after]
+
 @app.route('/api/audio/upload/<device_id>', methods=['POST'])
 def upload_audio(device_id):
     """API endpoint to receive audio data from client"""
     if request.method == 'POST':
         data = request.json
+        device_id = audio_channel(device_id)
         
         if not data or 'audio_data' not in data:
             return jsonify({"error": "Invalid audio data"}), 400
         
-        # Initialize device audio buffer if not exists
-        if device_id not in audio_store:
-            audio_store[device_id] = {
-                "microphone": [],
-                "timestamp": time.time()
-            }
-        
-        # Add to audio buffer (FIFO queue)
-        audio_store[device_id]["microphone"].append({
-            "audio_data": data['audio_data'],
-            "format": data.get('format', 'pcm'),
-            "channels": data.get('channels', 1),
-            "rate": data.get('rate', 16000),
-            "timestamp": data.get('timestamp', time.time())
-        })
-        
-        # Limit buffer size
-        if len(audio_store[device_id]["microphone"]) > AUDIO_BUFFER_SIZE:
-            audio_store[device_id]["microphone"] = audio_store[device_id]["microphone"][-AUDIO_BUFFER_SIZE:]
-        
-        # Update timestamp
-        audio_store[device_id]["timestamp"] = time.time()
+        with audio_condition:
+            # Initialize device audio buffer if not exists
+            entry = audio_store.setdefault(device_id, new_audio_entry())
+            entry["seq"] += 1
+            
+            # Add to audio buffer; chunks stay until pushed out, every listener reads them by seq
+            entry["microphone"].append({
+                "seq": entry["seq"],
+                "audio_data": data['audio_data'],
+                "format": data.get('format', 'pcm'),
+                "sample_format": data.get('sample_format', 's16'),
+                "channels": data.get('channels', 1),
+                "rate": data.get('rate', 16000),
+                "timestamp": data.get('timestamp', time.time()),
+                "capture_time": data.get('capture_time'),
+                "duration": data.get('duration'),
+                "comfort_noise": data.get('comfort_noise')  # Set on silence markers, which carry no audio
+            })
+            
+            # Limit buffer size
+            if len(entry["microphone"]) > AUDIO_BUFFER_SIZE:
+                entry["microphone"] = entry["microphone"][-AUDIO_BUFFER_SIZE:]
+            
+            # Update timestamp
+            entry["timestamp"] = time.time()
+            if 'capabilities' in data:
+                entry["capabilities"] = data['capabilities']
+            audio_condition.notify_all()
         
-        return jsonify({"status": "success"})
+        # The receiver switches its encoder to whatever format we answer with
+        return jsonify({"status": "success", "format": negotiate_audio_format(device_id)})
     
     return jsonify({"error": "Method not allowed"}), 405
 
-@app.route('/api/audio/download/<device_id>', methods=['GET'])
-def download_audio(device_id):
-    """API endpoint to send audio data to client"""
-    if device_id not in audio_store or not audio_store[device_id]["microphone"]:
-        return jsonify({"status": "no_data"}), 200
+@app.route('/api/audio/format/<device_id>', methods=['POST'])
+def set_audio_format(device_id):
+    # Endpoint for the viewer to say which audio codecs it can decode
+    data = request.get_json()
+    formats = data.get('formats') if data else None
+    if not isinstance(formats, list) or not any(fmt in AUDIO_FORMATS for fmt in formats):
+        return jsonify({"error": "Invalid audio formats"}), 400
     
-    # Get the oldest audio chunk and remove it from the buffer
-    audio_chunk = audio_store[device_id]["microphone"].pop(0)
+    audio_store.setdefault(device_id, new_audio_entry())
+    audio_store[device_id]["viewer_formats"] = formats
     
     return jsonify({
         "status": "success",
-        "audio_data": audio_chunk["audio_data"],
-        "format": audio_chunk.get("format", "pcm"),
-        "channels": audio_chunk.get("channels", 1),
-        "rate": audio_chunk.get("rate", 16000),
-        "timestamp": audio_chunk.get("timestamp", time.time())
+        "format": negotiate_audio_format(device_id),
+        "capabilities": audio_store[device_id].get("capabilities", ["pcm"])
+    })
+
+@app.route('/api/audio/download/<device_id>', methods=['GET'])
+def download_audio(device_id):
+    """API endpoint to send audio data to client (one chunk per request, prefer /api/audio/stream)"""
+    device_id = audio_channel(device_id)
+    with audio_condition:
+        entry = audio_store.get(device_id)
+        if not entry or not entry.get("microphone"):
+            return jsonify({"status": "no_data"}), 200
+        
+        # With ?after=<seq> the next chunk after it; without, the next one no cursor-less poller got yet
+        after = request.args.get('after', type=int)
+        chunks = audio_chunks_after(device_id, entry.get("download_seq", 0) if after is None else after)
+        if not chunks:
+            return jsonify({"status": "no_data"}), 200
+        if after is None:
+            entry["download_seq"] = chunks[0]["seq"]
+        
+        return jsonify(audio_chunk_message(device_id, chunks[0]))
+
+@app.route('/api/audio/stream/<device_id>', methods=['GET'])
+def stream_audio(device_id):
+    # Server-sent events, one per audio chunk as soon as it is uploaded, with its seq as the event id.
+    # Listeners resume after a reconnect with ?after=<seq> (or Last-Event-ID, which EventSource sends itself);
+    # without either they start with the next chunk. Each listener holds one server thread.
+    device_id = audio_channel(device_id)
+    after = request.args.get('after', type=int)
+    if after is None:
+        after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        with audio_condition:
+            after = audio_store.get(device_id, {}).get("seq", 0)
+    
+    def generate():
+        last = after
+        yield "retry: 1000\n\n"
+        while True:
+            with audio_condition:
+                chunks = audio_chunks_after(device_id, last)
+                if not chunks:
+                    audio_condition.wait(AUDIO_STREAM_KEEPALIVE)
+                    chunks = audio_chunks_after(device_id, last)
+                messages = [audio_chunk_message(device_id, chunk) for chunk in chunks]
+            
+            if not messages:
+                yield ": keepalive\n\n"
+                continue
+            for message in messages:
+                last = message["seq"]
+                yield f"id: {last}\ndata: {json.dumps(message)}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Don't let a proxy hold events back
     })
 
 @app.route('/api/audio/devices/<device_id>', methods=['GET'])
 def get_audio_devices(device_id):
     """API endpoint to get available audio devices"""
-    # This endpoint simply proxies the request to the client
-    # The client will need to check this endpoint and respond with device info
+    # The receiver answers with its cached device list (?refresh=1 lists them again, after a hot-plug);
+    # the result comes back through /api/command-status/<command_id>
     
     if device_id not in screen_store:
         return jsonify({"error": "Device not found"}), 404
     
-    command_id = str(time.time())
-    audio_store[command_id] = {
-        "device_id": device_id,
-        "command": "get_devices",
-        "status": "pending",
-        "timestamp": time.time()
-    }
+    command = "!audio_devices refresh" if request.args.get('refresh') in ('1', 'true') else "!audio_devices"
+    command_id = queue_command(command, device_id=device_id)
     
     return jsonify({
         "status": "success",
@@ -487,14 +995,7 @@ def start_audio(device_id):
     if audio_type not in ['microphone', 'speaker']:
         return jsonify({"error": "Invalid audio type"}), 400
     
-    command_id = str(time.time())
-    command_store[command_id] = {
-        "command": f"!audio_start {audio_type}",
-        "device_id": device_id,
-        "status": "pending",
-        "output": None,
-        "timestamp": time.time()
-    }
+    command_id = queue_command(f"!audio_start {audio_type}", device_id=device_id)
     
     return jsonify({
         "status": "success", 
@@ -517,14 +1018,7 @@ def stop_audio(device_id):
     if audio_type not in ['microphone', 'speaker']:
         return jsonify({"error": "Invalid audio type"}), 400
     
-    command_id = str(time.time())
-    command_store[command_id] = {
-        "command": f"!audio_stop {audio_type}",
-        "device_id": device_id,
-        "status": "pending",
-        "output": None,
-        "timestamp": time.time()
-    }
+    command_id = queue_command(f"!audio_stop {audio_type}", device_id=device_id)
     
     return jsonify({
         "status": "success", 
@@ -545,14 +1039,8 @@ def terminal_command(device_id):
     if not data or 'command' not in data:
         return jsonify({"error": "Invalid command data"}), 400
     
-    command_id = str(time.time())
-    command_store[command_id] = {
-        "command": data['command'],
-        "device_id": device_id,
-        "status": "pending",
-        "output": None,
-        "timestamp": time.time()
-    }
+    # Terminal commands from the viewer are picked up by the receiver's terminal thread
+    command_id = queue_command(data['command'], device_id=device_id, type="terminal")
     
     return jsonify({
         "status": "success", 
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import os
+import platform
+import queue
+import signal
+import subprocess
+import threading
+import time
+import uuid
+
+class ShellSession:
+    """A long-lived shell process that runs commands one after another.
+    The working directory and environment carry over between commands."""
+
+    def __init__(self, timeout=3600):
+        self.timeout = timeout  # seconds a command may run before the shell is killed and restarted, None for no limit
+        self.windows = platform.system() == "Windows"
+        self.last_used = time.time()
+        self.lock = threading.Lock()  # One command at a time per shell
+        self.process = None
+        self._stdout = None
+        self._stderr = None
+        self._start()
+
+    def _start(self):
+        """Start the shell process and the threads reading its output"""
+        if self.windows:
+            # /Q turns echo off so the prompt and our framing commands aren't echoed back
+            args = ["cmd.exe", "/Q", "/K"]
+            kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            args = ["/bin/bash", "--noprofile", "--norc"]
+            kwargs = {"start_new_session": True}  # So the whole process group can be killed on timeout
+
+        self.process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            **kwargs
+        )
+        self._stdout = queue.Queue()
+        self._stderr = queue.Queue()
+        for stream, lines in ((self.process.stdout, self._stdout), (self.process.stderr, self._stderr)):
+            reader = threading.Thread(target=self._read_lines, args=(stream, lines))
+            reader.daemon = True
+            reader.start()
+
+    @staticmethod
+    def _read_lines(stream, lines):
+        """Move lines from a pipe to a queue, None marks the end of the stream"""
+        for line in iter(stream.readline, ''):
+            lines.put(line)
+        lines.put(None)
+
+    def _framed(self, command, sentinel):
+        """Wrap a command so each stream ends with a sentinel line (stdout's carries the exit code).
+        The command reads from the null device so it can't swallow the framing lines."""
+        if self.windows:
+            return (
+                f"({command}) < NUL\n"
+                f"echo.&echo {sentinel} %errorlevel%\n"
+                f"(echo.&echo {sentinel}) 1>&2\n"
+            )
+        # Passed to eval as one quoted word, so nothing in the command (a trailing backslash, an
+        # unterminated here-document) can swallow the framing lines and keep the shell waiting
+        quoted = "'" + command.replace("'", "'\\''") + "'"
+        return (
+            f"eval {quoted} < /dev/null\n"
+            f"printf '\\n{sentinel} %s\\n' \"$?\"\n"
+            f"printf '\\n{sentinel}\\n' >&2\n"
+        )
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _syntax_error(self, command):
+        """The shell's error message if the command doesn't parse, checked in a throwaway bash so that
+        a parse error (bash 5.2 crashes on some inside eval) can't take the session's shell down"""
+        if self.windows:
+            return None
+        check = subprocess.run(["/bin/bash", "-n", "-c", command], stdin=subprocess.DEVNULL,
+                               capture_output=True, universal_newlines=True, encoding='utf-8', errors='replace', timeout=10)
+        return (check.stderr or "Syntax error") if check.returncode != 0 else None
+
+    def execute(self, command):
+        """Run a command in the shell and return {"stdout", "stderr", "return_code"}"""
+        error = self._syntax_error(command)
+        if error:
+            return {"stdout": "", "stderr": error, "return_code": 2}
+        with self.lock:
+            self.last_used = time.time()
+            if not self.is_alive():
+                self._start()
+
+            sentinel = f"__SIRABODY_{uuid.uuid4().hex}__"
+            try:
+                self.process.stdin.write(self._framed(command, sentinel))
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError):
+                # The shell died since the last command, start a fresh one
+                self._start()
+                self.process.stdin.write(self._framed(command, sentinel))
+                self.process.stdin.flush()
+
+            deadline = time.time() + self.timeout if self.timeout else None
+            stdout, return_code, ended = self._collect(self._stdout, sentinel, deadline)
+            stderr, _, _ = self._collect(self._stderr, sentinel, deadline)
+
+            if ended:
+                # The command ended the shell itself (e.g. `exit`)
+                try:
+                    return_code = self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.close()
+                    return_code = 1
+                self._start()
+            elif return_code is None:
+                # Timed out: kill the shell together with whatever it is running
+                self.close()
+                stderr += ("\n" if stderr else "") + f"Command timed out after {self.timeout} seconds, the shell was restarted"
+                return_code = 124
+                self._start()
+
+            return {"stdout": stdout, "stderr": stderr, "return_code": return_code}
+
+    @staticmethod
+    def _collect(lines, sentinel, deadline):
+        """Read lines until the sentinel, returning (output, exit code or None on timeout, whether the shell exited)"""
+        output = []
+        while True:
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return ''.join(output), None, False
+            try:
+                line = lines.get(timeout=remaining)
+            except queue.Empty:
+                return ''.join(output), None, False
+            if line is None:
+                return ''.join(output), None, True
+
+            if line.startswith(sentinel):
+                text = ''.join(output)
+                # Drop the newline the framing added in front of the sentinel
+                if text.endswith('\n'):
+                    text = text[:-1]
+                code = line[len(sentinel):].strip()
+                return text, int(code) if code.lstrip('-').isdigit() else 0, False
+            output.append(line)
+
+    def close(self):
+        """Kill the shell and everything it started"""
+        if not self.is_alive():
+            return
+        try:
+            if self.windows:
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(self.process.pid)], capture_output=True)
+            else:
+                os.killpg(self.process.pid, signal.SIGKILL)
+        except Exception:
+            self.process.kill()
+        try:
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+
+class ShellPool:
+    """One persistent shell per sender session, with a few warm shells ready for new sessions"""
+
+    def __init__(self, warm=2, max_sessions=8, idle_timeout=1800, timeout=3600):
+        self.warm = warm
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout  # seconds before an unused session's shell is closed
+        self.timeout = timeout
+        self._sessions = {}
+        self._spares = []
+        self._lock = threading.Lock()
+        self._refill()
+
+    def _refill(self):
+        """Start shells in the background until the warm pool is full again"""
+        def fill():
+            while True:
+                with self._lock:
+                    if len(self._spares) >= self.warm:
+                        return
+                try:
+                    shell = ShellSession(self.timeout)
+                except Exception as e:
+                    print(f"Error starting shell: {str(e)}")
+                    return
+                with self._lock:
+                    self._spares.append(shell)
+
+        filler = threading.Thread(target=fill)
+        filler.daemon = True
+        filler.start()
+
+    def get(self, session_id):
+        """Return the shell of a session, taking a warm one for new sessions"""
+        with self._lock:
+            self._expire()
+            shell = self._sessions.get(session_id)
+            if shell is None:
+                # Make room by closing the least recently used session
+                if len(self._sessions) >= self.max_sessions:
+                    oldest = min(self._sessions, key=lambda key: self._sessions[key].last_used)
+                    self._sessions.pop(oldest).close()
+                shell = None
+                while self._spares and shell is None:
+                    spare = self._spares.pop()
+                    if spare.is_alive():
+                        shell = spare
+                if shell is None:
+                    shell = ShellSession(self.timeout)
+                self._sessions[session_id] = shell
+                self._refill()
+            return shell
+
+    def set_timeout(self, timeout):
+        """Limit how long a command may run (None for no limit), in every shell from the next command on"""
+        with self._lock:
+            self.timeout = timeout
+            for shell in list(self._sessions.values()) + self._spares:
+                shell.timeout = timeout
+
+    def execute(self, session_id, command):
+        """Run a command in the session's shell"""
+        return self.get(session_id).execute(command)
+
+    def _expire(self):
+        """Close the shells of sessions that have been idle too long (called with the lock held)"""
+        now = time.time()
+        for session_id in list(self._sessions.keys()):
+            shell = self._sessions[session_id]
+            if now - shell.last_used > self.idle_timeout and not shell.lock.locked():
+                self._sessions.pop(session_id).close()
+
+    def close(self):
+        """Close every shell"""
+        with self._lock:
+            for shell in list(self._sessions.values()) + self._spares:
+                shell.close()
+            self._sessions.clear()
+            self._spares.clear()
@@ -0,0 +1,185 @@
+/**
+ * Audio capture for RenderRemote
+ * The viewer's microphone, played on the remote device's speakers: an AudioWorklet (audio_worklet.js)
+ * hands the input to the page, which cuts it into 200 ms frames of 16 kHz PCM and uploads them on the
+ * device's 'talk' audio channel. The receiver listens to that channel while its speakers are on.
+ */
+
+class AudioCapture {
+    constructor(deviceId, options = {}) {
+        this.deviceId = deviceId;
+        this.rate = options.rate || 16000; // VOICE_FORMAT on the receiver
+        this.frameMs = options.frameMs || 200;
+        this.maxPending = options.maxPending || 10; // Frames queued before the oldest is dropped (2 s)
+        this.audioContext = null;
+        this.stream = null;
+        this.node = null;
+        this.resampler = null;
+        this.frame = new Int16Array(Math.round(this.rate * this.frameMs / 1000));
+        this.filled = 0;
+        this.frameTime = null; // When the first sample of the frame being filled was captured
+        this.pending = []; // Frames waiting for upload, oldest first
+        this.sending = false;
+        this.isCapturing = false;
+        this.framesSent = 0;
+        this.framesDropped = 0;
+    }
+
+    // Start capturing. Call from a click handler: the browser asks for the microphone and only lets
+    // the audio context start from a user gesture.
+    start() {
+        if (this.isCapturing) return Promise.resolve(true);
+        this.isCapturing = true;
+
+        try {
+            window.AudioContext = window.AudioContext || window.webkitAudioContext;
+            try {
+                // Captured at the upload rate when the browser resamples for us
+                this.audioContext = new AudioContext({ sampleRate: this.rate });
+            } catch (e) {
+                this.audioContext = new AudioContext();
+            }
+        } catch (e) {
+            console.error('Audio capture: AudioWorklet not supported:', e);
+            this.isCapturing = false;
+            return Promise.resolve(false);
+        }
+        const context = this.audioContext;
+
+        return Promise.all([
+            navigator.mediaDevices.getUserMedia({
+                audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true, autoGainControl: true }
+            }),
+            context.audioWorklet.addModule('/static/js/audio_worklet.js')
+        ]).then(([stream]) => {
+            if (!this.isCapturing || this.audioContext !== context) {
+                stream.getTracks().forEach(track => track.stop()); // Stopped while starting
+                return false;
+            }
+            this.stream = stream;
+            this.resampler = context.sampleRate !== this.rate ? new LinearResampler(context.sampleRate, this.rate) : null;
+
+            this.node = new AudioWorkletNode(context, 'audio-capture-processor', {
+                numberOfInputs: 1,
+                numberOfOutputs: 1 // Left silent, but connected so the browser keeps processing it
+            });
+            this.node.port.onmessage = (event) => this.handleSamples(event.data);
+            context.createMediaStreamSource(stream).connect(this.node);
+            this.node.connect(context.destination);
+            if (context.state === 'suspended') {
+                context.resume();
+            }
+            console.log('Audio capture: Microphone capture started');
+            return true;
+        }).catch(e => {
+            console.error('Audio capture: Error starting microphone capture:', e);
+            this.stop();
+            return false;
+        });
+    }
+
+    // Stop capturing; the last partial frame is still uploaded
+    stop() {
+        if (!this.isCapturing) return;
+        this.isCapturing = false;
+
+        if (this.filled) {
+            this.queueFrame();
+        }
+        if (this.node) {
+            this.node.port.onmessage = null;
+            this.node.disconnect();
+            this.node = null;
+        }
+        if (this.stream) {
+            this.stream.getTracks().forEach(track => track.stop());
+            this.stream = null;
+        }
+        if (this.audioContext) {
+            this.audioContext.close();
+            this.audioContext = null;
+        }
+        console.log('Audio capture: Microphone capture stopped');
+    }
+
+    // Float samples from the worklet, at the context rate
+    handleSamples(samples) {
+        if (this.resampler) {
+            samples = this.resampler.process(samples);
+        }
+        let position = 0;
+        while (position < samples.length) {
+            if (this.filled === 0) {
+                // Back-date by the samples still to come in this block
+                this.frameTime = Date.now() / 1000 - (samples.length - position) / this.rate;
+            }
+            const count = Math.min(this.frame.length - this.filled, samples.length - position);
+            for (let i = 0; i < count; i++) {
+                const sample = Math.max(-1, Math.min(1, samples[position + i]));
+                this.frame[this.filled + i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+            }
+            this.filled += count;
+            position += count;
+            if (this.filled === this.frame.length) {
+                this.queueFrame();
+            }
+        }
+    }
+
+    // Encode the frame (16-bit little endian PCM, base64) and queue it, dropping the oldest if the link is behind
+    queueFrame() {
+        const bytes = new Uint8Array(this.filled * 2);
+        const view = new DataView(bytes.buffer);
+        for (let i = 0; i < this.filled; i++) {
+            view.setInt16(i * 2, this.frame[i], true);
+        }
+        let binary = '';
+        for (let i = 0; i < bytes.length; i += 0x8000) {
+            binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+        }
+
+        if (this.pending.length >= this.maxPending) {
+            this.pending.shift();
+            this.framesDropped++;
+        }
+        this.pending.push({
+            audio_data: btoa(binary),
+            format: 'pcm',
+            sample_format: 's16',
+            rate: this.rate,
+            channels: 1,
+            timestamp: this.frameTime,
+            duration: this.filled / this.rate,
+            capabilities: ['pcm']
+        });
+        this.filled = 0;
+        this.send();
+    }
+
+    // One upload at a time, in order
+    send() {
+        if (this.sending || !this.pending.length) return;
+        this.sending = true;
+        const chunk = this.pending.shift();
+        fetch(`/api/audio/upload/${this.deviceId}?channel=talk`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(chunk)
+        })
+        .then(response => {
+            if (response.ok) this.framesSent++;
+        })
+        .catch(error => {
+            console.error('Audio capture: Error uploading audio:', error);
+        })
+        .finally(() => {
+            this.sending = false;
+            this.send();
+        });
+    }
+}
+
+// Make the capture available globally
+window.AudioCapture = AudioCapture;
@@ -0,0 +1,225 @@
+/**
+ * Audio codecs for RenderRemote
+ * Decodes the compressed microphone audio sent by the receiver (see audio_codec.py).
+ * Loaded both in the page and, by audio_engine.js, in its AudioWorklet.
+ */
+
+const ADPCM_INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8];
+const ADPCM_STEP_TABLE = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+    337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066,
+    2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899,
+    15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767
+];
+
+// mu-law byte -> sample (G.711)
+const MULAW_TABLE = new Float32Array(256);
+for (let i = 0; i < 256; i++) {
+    const code = ~i & 0xFF;
+    const magnitude = ((((code & 0x0F) << 3) + 0x84) << ((code >> 4) & 0x07)) - 0x84;
+    MULAW_TABLE[i] = ((code & 0x80) ? -magnitude : magnitude) / 32768;
+}
+
+class AudioStreamDecoder {
+    constructor(format, rate, channels) {
+        this.format = format;
+        this.rate = rate;
+        this.channels = channels;
+        this.opus = null;
+        this.opusOutput = [];
+        this.timestamp = 0;
+    }
+
+    // Formats this browser can decode, best first (Opus needs WebCodecs, which only the page has)
+    static supportedFormats() {
+        const formats = ['adpcm', 'mulaw', 'pcm'];
+        if (typeof globalThis.AudioDecoder === 'function') {
+            formats.unshift('opus');
+        }
+        return formats;
+    }
+
+    // Decode one chunk from /api/audio/stream to mono Float32 samples (resolves to a Float32Array)
+    decode(bytes) {
+        if (this.format === 'opus') {
+            return this.decodeOpus(bytes);
+        }
+        try {
+            return Promise.resolve(this.decodeSync(bytes));
+        } catch (e) {
+            return Promise.reject(e);
+        }
+    }
+
+    // Same for the formats decoded in plain JavaScript, returning the samples directly
+    decodeSync(bytes) {
+        switch (this.format) {
+            case 'pcm':
+                return this.toMono(this.decodePcm(bytes));
+            case 'mulaw':
+                return this.toMono(this.decodeMulaw(bytes));
+            case 'adpcm':
+                return this.toMono(this.decodeAdpcm(bytes));
+            default:
+                throw new Error(`Unsupported audio format: ${this.format}`);
+        }
+    }
+
+    decodePcm(bytes) {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        const samples = new Float32Array(bytes.byteLength >> 1);
+        for (let i = 0; i < samples.length; i++) {
+            samples[i] = view.getInt16(i * 2, true) / 32768;
+        }
+        return samples;
+    }
+
+    decodeMulaw(bytes) {
+        const samples = new Float32Array(bytes.length);
+        for (let i = 0; i < bytes.length; i++) {
+            samples[i] = MULAW_TABLE[bytes[i]];
+        }
+        return samples;
+    }
+
+    // Packet: sample count per channel (uint32), then per channel its starting predictor (int16),
+    // step index (uint8), a pad byte and the 4-bit codes, first sample in the high nibble
+    decodeAdpcm(bytes) {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        const count = view.getUint32(0, true);
+        const samples = new Float32Array(count * this.channels);
+        let offset = 4;
+        for (let channel = 0; channel < this.channels; channel++) {
+            let predictor = view.getInt16(offset, true);
+            let index = Math.min(view.getUint8(offset + 2), 88);
+            offset += 4;
+            for (let i = 0; i < count; i++) {
+                const byte = bytes[offset + (i >> 1)];
+                const code = (i & 1) ? byte & 0x0F : byte >> 4;
+                const step = ADPCM_STEP_TABLE[index];
+                let delta = step >> 3;
+                if (code & 4) delta += step;
+                if (code & 2) delta += step >> 1;
+                if (code & 1) delta += step >> 2;
+                predictor = Math.max(-32768, Math.min(32767, (code & 8) ? predictor - delta : predictor + delta));
+                index = Math.max(0, Math.min(88, index + ADPCM_INDEX_TABLE[code]));
+                samples[i * this.channels + channel] = predictor / 32768;
+            }
+            offset += (count + 1) >> 1;
+        }
+        return samples;
+    }
+
+    // Opus frames, each prefixed with its length (uint16), decoded by the browser through WebCodecs
+    decodeOpus(bytes) {
+        if (!this.opus) {
+            this.opus = new AudioDecoder({
+                output: (data) => {
+                    // Planar output, so plane 0 is the first channel; good enough for a mono player
+                    const samples = new Float32Array(data.numberOfFrames);
+                    data.copyTo(samples, { planeIndex: 0, format: 'f32-planar' });
+                    this.opusOutput.push(samples);
+                    data.close();
+                },
+                error: (e) => console.error('Audio codec: Opus decoder error:', e)
+            });
+            this.opus.configure({ codec: 'opus', sampleRate: this.rate, numberOfChannels: this.channels });
+        }
+
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        let offset = 0;
+        while (offset + 2 <= bytes.length) {
+            const length = view.getUint16(offset, true);
+            this.opus.decode(new EncodedAudioChunk({
+                type: 'key',
+                timestamp: this.timestamp,
+                data: bytes.subarray(offset + 2, offset + 2 + length)
+            }));
+            this.timestamp += 20000; // microseconds per frame
+            offset += 2 + length;
+        }
+
+        return this.opus.flush().then(() => {
+            const parts = this.opusOutput;
+            this.opusOutput = [];
+            const samples = new Float32Array(parts.reduce((total, part) => total + part.length, 0));
+            let position = 0;
+            for (const part of parts) {
+                samples.set(part, position);
+                position += part.length;
+            }
+            return samples;
+        });
+    }
+
+    toMono(samples) {
+        if (this.channels === 1) return samples;
+        const mono = new Float32Array(Math.floor(samples.length / this.channels));
+        for (let i = 0; i < mono.length; i++) {
+            let sum = 0;
+            for (let channel = 0; channel < this.channels; channel++) {
+                sum += samples[i * this.channels + channel];
+            }
+            mono[i] = sum / this.channels;
+        }
+        return mono;
+    }
+
+    close() {
+        if (this.opus && this.opus.state !== 'closed') {
+            this.opus.close();
+        }
+        this.opus = null;
+    }
+}
+
+// Linear resampler for mono Float32 chunks, keeping its position across chunks so joins don't click
+class LinearResampler {
+    constructor(fromRate, toRate) {
+        this.fromRate = fromRate;
+        this.toRate = toRate;
+        this.step = fromRate / toRate;
+        this.previous = 0; // Last sample of the previous chunk
+        this.position = 1; // Where the next output sample falls, counting the previous sample as 0
+    }
+
+    process(samples) {
+        if (this.fromRate === this.toRate) return samples;
+        const count = Math.max(0, Math.ceil((samples.length - this.position) / this.step));
+        const output = new Float32Array(count);
+        for (let i = 0; i < count; i++) {
+            const position = this.position + i * this.step;
+            const index = Math.floor(position);
+            const fraction = position - index;
+            const a = index === 0 ? this.previous : samples[index - 1];
+            const b = samples[index];
+            output[i] = a + (b - a) * fraction;
+        }
+        this.position += count * this.step - samples.length;
+        if (samples.length) this.previous = samples[samples.length - 1];
+        return output;
+    }
+}
+
+// Tell the server which formats this viewer decodes, so the receiver compresses with the best of them
+function announceAudioFormats(deviceId) {
+    return fetch(`/api/audio/format/${deviceId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            formats: AudioStreamDecoder.supportedFormats()
+        })
+    })
+    .then(response => response.json())
+    .catch(error => {
+        console.error('Audio codec: Error announcing audio formats:', error);
+    });
+}
+
+// Make the decoders available globally (the page's window, or the AudioWorklet's global scope)
+globalThis.AudioStreamDecoder = AudioStreamDecoder;
+globalThis.LinearResampler = LinearResampler;
+globalThis.announceAudioFormats = announceAudioFormats;
@@ -0,0 +1,170 @@
+/**
+ * Audio engine for RenderRemote
+ * Plays the remote microphone in the browser: one server-sent event stream from /api/audio/stream
+ * feeds an AudioWorklet (audio_worklet.js) that decodes the chunks and plays them from a jitter buffer.
+ * With a MediaSync (media_sync.js) every chunk is played at the same delay after capture as the screen.
+ */
+
+class AudioEngine {
+    constructor(deviceId, options = {}) {
+        this.deviceId = deviceId;
+        this.targetMs = options.targetMs || 300; // Above the 200 ms upload frames, so one late frame doesn't underrun
+        this.maxMs = options.maxMs || 2000;
+        this.sync = options.sync || null;
+        this.audioContext = null;
+        this.modules = null; // Resolves once the worklet code is loaded into the context
+        this.node = null;
+        this.stream = null;
+        this.opusDecoder = null;
+        this.pending = Promise.resolve(); // Chunks reach the worklet in order, even those the page decodes
+        this.isPlaying = false;
+        this.stats = null; // Latest playback stats from the worklet
+    }
+
+    // Start playing. Call from a click handler: browsers only let audio start from a user gesture.
+    start() {
+        if (this.isPlaying) return Promise.resolve(true);
+        this.isPlaying = true;
+
+        try {
+            if (!this.audioContext) {
+                window.AudioContext = window.AudioContext || window.webkitAudioContext;
+                this.audioContext = new AudioContext({ latencyHint: 'interactive' });
+                this.modules = this.audioContext.audioWorklet.addModule('/static/js/audio_codec.js')
+                    .then(() => this.audioContext.audioWorklet.addModule('/static/js/audio_worklet.js'));
+            }
+            if (this.audioContext.state === 'suspended') {
+                this.audioContext.resume();
+            }
+        } catch (e) {
+            console.error('Audio engine: AudioWorklet not supported:', e);
+            this.isPlaying = false;
+            return Promise.resolve(false);
+        }
+
+        return this.modules.then(() => {
+            if (!this.isPlaying) return false; // Stopped while loading
+
+            this.node = new AudioWorkletNode(this.audioContext, 'audio-stream-processor', {
+                numberOfInputs: 0,
+                numberOfOutputs: 1,
+                outputChannelCount: [1],
+                processorOptions: {
+                    targetMs: this.targetMs,
+                    maxMs: this.maxMs,
+                    windowMs: this.sync ? this.sync.window * 1000 : undefined
+                }
+            });
+            this.node.port.onmessage = (event) => {
+                this.stats = event.data;
+            };
+            this.node.connect(this.audioContext.destination);
+
+            announceAudioFormats(this.deviceId);
+            this.openStream();
+            console.log('Audio engine: Playback started');
+            return true;
+        }).catch(e => {
+            console.error('Audio engine: Error starting playback:', e);
+            this.isPlaying = false;
+            return false;
+        });
+    }
+
+    // Stop playing and close the stream
+    stop() {
+        if (!this.isPlaying) return;
+        this.isPlaying = false;
+
+        if (this.stream) {
+            this.stream.close();
+            this.stream = null;
+        }
+        if (this.node) {
+            this.node.port.postMessage({ type: 'reset' });
+            this.node.disconnect();
+            this.node = null;
+        }
+        if (this.opusDecoder) {
+            this.opusDecoder.close();
+            this.opusDecoder = null;
+        }
+        this.pending = Promise.resolve();
+        if (this.audioContext) {
+            this.audioContext.suspend();
+        }
+        console.log('Audio engine: Playback stopped');
+    }
+
+    // Server-sent events, one per chunk; EventSource reconnects by itself and resumes after the last one
+    openStream() {
+        this.stream = new EventSource(`/api/audio/stream/${this.deviceId}`);
+        this.stream.onmessage = (event) => this.handleChunk(JSON.parse(event.data));
+        this.stream.onerror = () => {
+            if (this.stream && this.stream.readyState === EventSource.CONNECTING) {
+                console.warn('Audio engine: Audio stream interrupted, reconnecting');
+            }
+        };
+    }
+
+    // Context time at which audio is heard at local time `time` (performance clock, seconds)
+    contextTimeAt(time) {
+        const stamp = this.audioContext.getOutputTimestamp();
+        if (!stamp.performanceTime) return null; // Not running yet
+        return stamp.contextTime + time - stamp.performanceTime / 1000;
+    }
+
+    // Hand a chunk to the worklet. Only Opus is decoded here, WebCodecs doesn't exist in a worklet.
+    handleChunk(data) {
+        const node = this.node;
+        if (!node) return;
+
+        // When the chunk should be heard: at the common playout delay after its capture
+        let playAt = null;
+        if (this.sync && typeof data.capture_time === 'number') {
+            // Arrival of its last sample, comparable with the arrival of a screen frame
+            this.sync.observe(data.capture_time + (data.duration || 0));
+            const due = this.sync.playoutTime(data.capture_time);
+            if (due !== null) {
+                playAt = this.contextTimeAt(due);
+            }
+        }
+
+        if (data.comfort_noise !== null && data.comfort_noise !== undefined) {
+            this.pending = this.pending.then(() => node.port.postMessage({ type: 'comfort', level: data.comfort_noise }));
+            return;
+        }
+        if (!data.audio_data) return;
+
+        const binary = atob(data.audio_data);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        const format = data.format || 'pcm';
+        const rate = data.rate || 16000;
+        const channels = data.channels || 1;
+
+        if (format === 'opus') {
+            const decoder = this.opusDecoder;
+            if (!decoder || decoder.rate !== rate || decoder.channels !== channels) {
+                if (decoder) decoder.close();
+                this.opusDecoder = new AudioStreamDecoder(format, rate, channels);
+            }
+            const opusDecoder = this.opusDecoder;
+            this.pending = this.pending
+                .then(() => opusDecoder.decode(bytes))
+                .then(samples => node.port.postMessage({ type: 'samples', samples, rate, playAt }, [samples.buffer]))
+                .catch(e => console.error('Audio engine: Error decoding audio data:', e));
+            return;
+        }
+
+        this.pending = this.pending.then(() => node.port.postMessage(
+            { type: 'chunk', format, rate, channels, playAt, bytes: bytes.buffer },
+            [bytes.buffer]
+        ));
+    }
+}
+
+// Make the engine available globally
+window.AudioEngine = AudioEngine;
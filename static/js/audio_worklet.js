@@ -0,0 +1,288 @@
+/**
+ * Audio worklet for RenderRemote
+ * Decodes the audio chunks audio_engine.js posts and plays them from a ring buffer, on the audio
+ * rendering thread, so playback doesn't depend on how busy the page is. Loaded after audio_codec.js.
+ *
+ * Chunks may come with the context time they should be heard at (playAt, see media_sync.js): playback
+ * then starts at that time, and drops or repeats single samples (skips or pads beyond maxSyncMs) to
+ * stay within windowMs of it. Without, it buffers targetMs and follows the buffer level.
+ *
+ * AudioCaptureProcessor is the other direction, the viewer's microphone for audio_capture.js.
+ */
+
+class AudioStreamProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const settings = options.processorOptions || {};
+        // sampleRate is the AudioContext's, which is what everything is resampled to
+        this.target = Math.round(sampleRate * (settings.targetMs || 300) / 1000); // Buffered before playing
+        this.ring = new Float32Array(Math.round(sampleRate * (settings.maxMs || 2000) / 1000));
+        this.written = 0; // Samples ever written and read; the ring position is the count modulo its size
+        this.read = 0;
+        this.buffering = true;
+        this.level = 0; // Average buffered samples, to tell a sender clock that runs fast
+        this.chunkSize = 0; // Largest recent chunk: the buffer saws between target and target + chunk
+        this.noise = 0; // Comfort noise amplitude while the sender is silent
+        this.fadeIn = false;
+
+        this.window = (settings.windowMs || 60) / 1000;
+        this.maxSync = (settings.maxSyncMs || 250) / 1000;
+        this.synced = false; // Whether the last chunk came with a playAt
+        this.startAt = null; // Context time to start playing at after buffering
+        this.syncError = 0; // Seconds the audio is heard after (positive) or before its time, averaged
+        this.pad = 0; // Samples of silence to play before the buffer, to wait for the audio's time
+        this.correcting = false; // Out of the window: drop or repeat samples until well within it again
+
+        this.decoder = null;
+        this.resampler = null;
+
+        this.underruns = 0;
+        this.overflows = 0;
+        this.statsCountdown = 0;
+
+        this.port.onmessage = (event) => this.receive(event.data);
+    }
+
+    receive(message) {
+        try {
+            switch (message.type) {
+                case 'chunk': {
+                    // Encoded audio, decoded here
+                    const decoder = this.decoder;
+                    if (!decoder || decoder.format !== message.format || decoder.rate !== message.rate || decoder.channels !== message.channels) {
+                        this.decoder = new AudioStreamDecoder(message.format, message.rate, message.channels);
+                        this.resampler = new LinearResampler(message.rate, sampleRate);
+                    }
+                    this.write(this.resampler.process(this.decoder.decodeSync(new Uint8Array(message.bytes))), message.playAt);
+                    break;
+                }
+                case 'samples':
+                    // Already decoded by the page (Opus, through WebCodecs)
+                    if (!this.resampler || this.resampler.fromRate !== message.rate || this.decoder) {
+                        this.decoder = null;
+                        this.resampler = new LinearResampler(message.rate, sampleRate);
+                    }
+                    this.write(this.resampler.process(message.samples), message.playAt);
+                    break;
+                case 'comfort':
+                    // The sender went silent: play noise at its background level rather than dead air.
+                    // Uniform noise of amplitude a has an RMS of a / sqrt(3).
+                    this.noise = Math.pow(10, message.level / 20) * Math.sqrt(3);
+                    break;
+                case 'reset':
+                    this.read = this.written;
+                    this.buffering = true;
+                    this.noise = 0;
+                    this.startAt = null;
+                    this.syncError = 0;
+                    this.pad = 0;
+                    this.correcting = false;
+                    break;
+            }
+        } catch (e) {
+            console.error('Audio worklet: Error processing audio data:', e);
+        }
+    }
+
+    write(samples, playAt) {
+        // When this chunk would be heard if simply appended, against when it should be
+        const available = this.written - this.read;
+        this.synced = typeof playAt === 'number';
+        if (this.synced) {
+            if (this.buffering) {
+                if (available === 0) this.startAt = playAt;
+            } else {
+                const error = currentTime + (this.pad + available) / sampleRate - playAt;
+                this.syncError += 0.3 * (error - this.syncError);
+            }
+        }
+
+        const size = this.ring.length;
+        if (samples.length > size) {
+            samples = samples.subarray(samples.length - size);
+        }
+        // No room: drop the oldest audio, down to the target, rather than grow the delay
+        if (this.written + samples.length - this.read > size) {
+            this.read = Math.max(this.read, this.written + samples.length - this.target);
+            this.overflows++;
+        }
+
+        const start = this.written % size;
+        const first = Math.min(samples.length, size - start);
+        this.ring.set(samples.subarray(0, first), start);
+        this.ring.set(samples.subarray(first), 0);
+        this.written += samples.length;
+
+        this.chunkSize = Math.max(samples.length, this.chunkSize * 0.99);
+        this.noise = 0;
+    }
+
+    // Copy `count` buffered samples into out, starting at `offset`
+    readInto(out, offset, count) {
+        const size = this.ring.length;
+        const start = this.read % size;
+        const first = Math.min(count, size - start);
+        out.set(this.ring.subarray(start, start + first), offset);
+        out.set(this.ring.subarray(0, count - first), offset + first);
+        this.read += count;
+    }
+
+    fillSilence(out, offset) {
+        for (let i = offset; i < out.length; i++) {
+            out[i] = this.noise ? (Math.random() * 2 - 1) * this.noise : 0;
+        }
+    }
+
+    process(inputs, outputs) {
+        const out = outputs[0][0];
+        const frames = out.length;
+        let available = this.written - this.read;
+
+        if (this.buffering) {
+            // Start at the first chunk's time, or once the target is buffered when there is none
+            const ready = this.startAt !== null
+                ? available > 0 && currentTime + frames / sampleRate >= this.startAt
+                : available >= this.target;
+            if (!ready) {
+                this.fillSilence(out, 0);
+                this.reportStats(available);
+                return true;
+            }
+            if (this.startAt !== null) {
+                // Arrived late: drop what should already have been heard
+                const late = Math.round((currentTime - this.startAt) * sampleRate);
+                if (late > this.window * sampleRate) {
+                    const skip = Math.min(late, available);
+                    this.read += skip;
+                    available -= skip;
+                }
+            }
+            this.buffering = false;
+            this.fadeIn = true;
+            this.level = available;
+            this.startAt = null;
+            this.syncError = 0;
+        }
+
+        let offset = 0;
+        let repeat = false;
+        if (this.synced) {
+            if (this.syncError > this.maxSync && available > frames) {
+                // Far behind: skip ahead at once
+                const skip = Math.min(Math.round(this.syncError * sampleRate), available - frames);
+                this.read += skip;
+                available -= skip;
+                this.syncError -= skip / sampleRate;
+                this.fadeIn = true;
+            } else if (this.syncError < -this.maxSync) {
+                // Far ahead: wait with silence
+                this.pad += Math.round(-this.syncError * sampleRate);
+                this.syncError = 0;
+            } else {
+                if (Math.abs(this.syncError) > this.window) {
+                    this.correcting = true;
+                } else if (Math.abs(this.syncError) < this.window / 4) {
+                    this.correcting = false;
+                }
+                if (this.correcting && this.syncError > 0 && available > frames + 1) {
+                    // Behind: one sample fewer this block (0.8 % faster at 128 frames, not audible)
+                    this.read++;
+                    available--;
+                    this.syncError -= 1 / sampleRate;
+                } else if (this.correcting && this.syncError < 0) {
+                    // Ahead: one sample twice
+                    repeat = true;
+                    this.syncError += 1 / sampleRate;
+                }
+            }
+        } else {
+            // A sender whose clock runs a little fast slowly fills the buffer: when it stays above its
+            // normal range, play one sample fewer per block
+            this.level += 0.002 * (available - this.level);
+            if (this.level > this.target + this.chunkSize && available > frames + 1) {
+                this.read++;
+                available--;
+            }
+        }
+
+        if (this.pad > 0) {
+            offset = Math.min(this.pad, frames);
+            out.fill(0, 0, offset);
+            this.pad -= offset;
+            this.fadeIn = true; // Once the audio comes back
+        }
+
+        const wanted = frames - offset - (repeat ? 1 : 0);
+        if (available >= wanted) {
+            this.readInto(out, offset, wanted);
+            if (repeat) out[frames - 1] = out[frames - 2];
+        } else {
+            // Underrun: play what is left, fade from its last sample to silence, and buffer up again
+            this.readInto(out, offset, available);
+            const end = offset + available;
+            const last = end ? out[end - 1] : 0;
+            const remaining = frames - end;
+            for (let i = 0; i < remaining; i++) {
+                out[end + i] = last * (1 - (i + 1) / remaining);
+            }
+            this.buffering = true;
+            if (!this.noise) this.underruns++; // Running out after a silence marker is expected
+        }
+
+        if (this.fadeIn && offset < frames) {
+            for (let i = offset; i < frames; i++) {
+                out[i] *= (i - offset) / (frames - offset);
+            }
+            this.fadeIn = false;
+        }
+
+        for (let channel = 1; channel < outputs[0].length; channel++) {
+            outputs[0][channel].set(out);
+        }
+        this.reportStats(this.written - this.read);
+        return true;
+    }
+
+    // About once a second, tell the page how playback is going
+    reportStats(available) {
+        if (--this.statsCountdown > 0) return;
+        this.statsCountdown = Math.round(sampleRate / 128);
+        this.port.postMessage({
+            bufferedMs: Math.round(available * 1000 / sampleRate),
+            underruns: this.underruns,
+            overflows: this.overflows,
+            buffering: this.buffering,
+            syncErrorMs: this.synced ? Math.round(this.syncError * 1000) : null
+        });
+    }
+}
+
+// The other direction: hands the microphone input (first channel) to the page, about every 20 ms
+class AudioCaptureProcessor extends AudioWorkletProcessor {
+    constructor() {
+        super();
+        this.block = new Float32Array(Math.round(sampleRate / 50));
+        this.filled = 0;
+    }
+
+    process(inputs) {
+        const input = inputs[0] && inputs[0][0];
+        if (!input) return true; // Not connected yet
+        let position = 0;
+        while (position < input.length) {
+            const count = Math.min(this.block.length - this.filled, input.length - position);
+            this.block.set(input.subarray(position, position + count), this.filled);
+            this.filled += count;
+            position += count;
+            if (this.filled === this.block.length) {
+                this.port.postMessage(this.block, [this.block.buffer]);
+                this.block = new Float32Array(this.block.length);
+                this.filled = 0;
+            }
+        }
+        return true;
+    }
+}
+
+registerProcessor('audio-stream-processor', AudioStreamProcessor);
+registerProcessor('audio-capture-processor', AudioCaptureProcessor);
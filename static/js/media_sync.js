@@ -0,0 +1,120 @@
+/**
+ * Media sync for RenderRemote
+ * Screen frames and audio chunks carry capture_time, on the receiver's media clock (see media_clock.py).
+ * MediaSync maps that clock onto this page's and gives every frame and every chunk the same playout
+ * delay after its capture, so sound and picture stay together and their latency stays bounded.
+ */
+
+class MediaSync {
+    constructor(options = {}) {
+        this.playoutDelay = (options.playoutDelayMs || 500) / 1000; // After capture; covers the 200 ms audio frames and the network
+        this.window = (options.windowMs || 60) / 1000; // Off by less than this counts as in sync
+        this.history = (options.historyMs || 10000) / 1000; // How long a fast arrival keeps counting
+        this.arrivals = []; // [local time, offset] of recent arrivals, offsets increasing
+        this.offset = null; // Local time minus media time, for the fastest recent arrival
+    }
+
+    // Local time in seconds, on the same clock as requestAnimationFrame and AudioContext.getOutputTimestamp
+    now() {
+        return performance.now() / 1000;
+    }
+
+    // Something captured at captureTime (media clock) just arrived. The smallest difference between
+    // arrival and capture is the clock offset plus the fastest transit: everything slower is jitter.
+    observe(captureTime) {
+        if (typeof captureTime !== 'number') return;
+        const now = this.now();
+        const offset = now - captureTime;
+
+        // Keep a monotonic queue, so the minimum over the history is always at its head
+        while (this.arrivals.length && this.arrivals[this.arrivals.length - 1][1] >= offset) {
+            this.arrivals.pop();
+        }
+        this.arrivals.push([now, offset]);
+        while (this.arrivals[0][0] < now - this.history) {
+            this.arrivals.shift();
+        }
+        this.offset = this.arrivals[0][1];
+    }
+
+    // Local time at which something captured at captureTime should be presented (null until synced)
+    playoutTime(captureTime) {
+        if (this.offset === null || typeof captureTime !== 'number') return null;
+        return captureTime + this.offset + this.playoutDelay;
+    }
+}
+
+// Shows JPEG frames at their playout time while sync is active, otherwise as soon as they arrive.
+// Repeated frames are dropped; early ones wait in order for their time.
+class FrameScheduler {
+    constructor(sync, present) {
+        this.sync = sync;
+        this.present = present;
+        this.active = false;
+        this.last = null; // {monitor, seq} of the newest frame shown or waiting
+        this.queue = []; // [due time, frame] of the frames waiting, oldest first
+        this.timer = null;
+    }
+
+    push(frame) {
+        // The same frame again (the poll found nothing newer). Any other seq is new, even a lower one:
+        // a restarted receiver counts from 1 again, like the cursor seq after a server restart.
+        const last = this.last;
+        if (last && frame.seq !== undefined && last.monitor === frame.monitor && frame.seq === last.seq) {
+            return false;
+        }
+        this.last = { monitor: frame.monitor, seq: frame.seq };
+        this.sync.observe(frame.capture_time);
+
+        const due = this.active ? this.sync.playoutTime(frame.capture_time) : null;
+        if (due === null || (this.queue.length === 0 && due <= this.sync.now())) {
+            // Show it now; anything still waiting is older and dropped
+            this.flush(false);
+            this.present(frame);
+            return true;
+        }
+        this.queue.push([due, frame]);
+        this.schedule();
+        return true;
+    }
+
+    // Show the frames whose time has come, the last of them only if several are due at once
+    schedule() {
+        clearTimeout(this.timer);
+        this.timer = null;
+        const now = this.sync.now();
+        let due = null;
+        while (this.queue.length && this.queue[0][0] <= now) {
+            due = this.queue.shift()[1];
+        }
+        if (due) {
+            this.present(due);
+        }
+        if (this.queue.length) {
+            this.timer = setTimeout(() => this.schedule(), (this.queue[0][0] - now) * 1000);
+        }
+    }
+
+    // Stop waiting: show the newest waiting frame, or drop them all
+    flush(show = true) {
+        clearTimeout(this.timer);
+        this.timer = null;
+        const queued = this.queue;
+        this.queue = [];
+        if (show && queued.length) {
+            this.present(queued[queued.length - 1][1]);
+        }
+    }
+
+    // Sync on or off; turning it off shows the newest waiting frame right away
+    setActive(active) {
+        this.active = active;
+        if (!active) {
+            this.flush();
+        }
+    }
+}
+
+// Make the sync classes available globally
+window.MediaSync = MediaSync;
+window.FrameScheduler = FrameScheduler;
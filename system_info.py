@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import os
+import platform
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    print("Warning: psutil not available, system info falls back to /proc. Install required packages with: pip install psutil")
+    PSUTIL_AVAILABLE = False
+
+PROC_AVAILABLE = os.path.isdir('/proc/self')
+
+try:
+    import pwd
+except ImportError:
+    pwd = None
+
+class SystemMonitor:
+    """Host info, CPU/memory usage and the process list as plain dicts, without spawning shell tools"""
+
+    def __init__(self, history=8):
+        self.history = history  # snapshots kept so `since` tokens from a few viewers stay valid
+        self._snapshots = OrderedDict()  # token -> {pid: process row}
+        self._next_token = 1
+        # Tokens start with an id of this instance: a token from before a restart is unknown, not another snapshot
+        self._instance = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._proc_times = {}  # pid -> (cpu seconds, wall time) for the /proc CPU percentages
+        self._system_times = None
+        self._users = {}
+
+    def available(self):
+        return PSUTIL_AVAILABLE or PROC_AVAILABLE
+
+    def host_info(self):
+        """Static facts about the machine"""
+        info = {
+            "hostname": socket.gethostname(),
+            "system": platform.system(),
+            "release": platform.release(),
+            "version": platform.version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "boot_time": None,
+        }
+        if PSUTIL_AVAILABLE:
+            info["boot_time"] = psutil.boot_time()
+        elif PROC_AVAILABLE:
+            with open('/proc/stat') as f:
+                for line in f:
+                    if line.startswith('btime'):
+                        info["boot_time"] = float(line.split()[1])
+        return info
+
+    def usage(self):
+        """CPU and memory usage right now"""
+        if PSUTIL_AVAILABLE:
+            memory = psutil.virtual_memory()
+            swap = psutil.swap_memory()
+            return {
+                "cpu_percent": psutil.cpu_percent(),  # Since the previous call, so no blocking interval
+                "memory_total": memory.total,
+                "memory_available": memory.available,
+                "memory_percent": memory.percent,
+                "swap_total": swap.total,
+                "swap_used": swap.used,
+                "load": list(os.getloadavg()) if hasattr(os, 'getloadavg') else None,
+            }
+
+        meminfo = {}
+        with open('/proc/meminfo') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0]) * 1024
+        total = meminfo.get("MemTotal", 0)
+        available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+        return {
+            "cpu_percent": self._system_cpu_percent(),
+            "memory_total": total,
+            "memory_available": available,
+            "memory_percent": round((total - available) * 100 / total, 1) if total else 0.0,
+            "swap_total": meminfo.get("SwapTotal", 0),
+            "swap_used": meminfo.get("SwapTotal", 0) - meminfo.get("SwapFree", 0),
+            "load": list(os.getloadavg()),
+        }
+
+    def _system_cpu_percent(self):
+        """Overall CPU usage from /proc/stat since the previous call"""
+        with open('/proc/stat') as f:
+            fields = [int(value) for value in f.readline().split()[1:]]
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        total = sum(fields)
+        previous, self._system_times = self._system_times, (idle, total)
+        if previous is None or total == previous[1]:
+            return 0.0
+        return round(100 * (1 - (idle - previous[0]) / (total - previous[1])), 1)
+
+    def processes(self):
+        """Return {pid: row} for every process we can read"""
+        if PSUTIL_AVAILABLE:
+            return self._psutil_processes()
+        return self._proc_processes()
+
+    def _psutil_processes(self):
+        rows = {}
+        # process_iter keeps its Process objects between calls, so cpu_percent is measured since the last snapshot
+        for proc in psutil.process_iter(['pid', 'name', 'username', 'status', 'cpu_percent', 'memory_info', 'num_threads']):
+            info = proc.info
+            memory = info.get('memory_info')
+            rows[info['pid']] = self._row(
+                info['pid'], info.get('name') or '', info.get('username') or '', info.get('status') or '',
+                info.get('cpu_percent') or 0.0, memory.rss if memory else 0, info.get('num_threads') or 0
+            )
+        return rows
+
+    def _proc_processes(self):
+        rows = {}
+        now = time.monotonic()
+        ticks = os.sysconf('SC_CLK_TCK')
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        times = {}
+        for entry in os.scandir('/proc'):
+            if not entry.name.isdigit():
+                continue
+            pid = int(entry.name)
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    stat = f.read()
+                uid = entry.stat().st_uid
+            except OSError:
+                continue  # The process exited while we were listing
+
+            # The name is in parentheses and may itself contain spaces or parentheses
+            name = stat[stat.index('(') + 1:stat.rindex(')')]
+            fields = stat[stat.rindex(')') + 2:].split()
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks  # utime + stime
+            times[pid] = (cpu_seconds, now)
+
+            cpu = 0.0
+            previous = self._proc_times.get(pid)
+            if previous and now > previous[1]:
+                cpu = (cpu_seconds - previous[0]) * 100 / (now - previous[1])
+            rows[pid] = self._row(pid, name, self._user(uid), fields[0], cpu, int(fields[21]) * page_size, int(fields[17]))
+
+        self._proc_times = times
+        return rows
+
+    def _user(self, uid):
+        if uid not in self._users:
+            try:
+                self._users[uid] = pwd.getpwuid(uid).pw_name if pwd else str(uid)
+            except KeyError:
+                self._users[uid] = str(uid)
+        return self._users[uid]
+
+    @staticmethod
+    def _row(pid, name, user, status, cpu, rss, threads):
+        # Rounded so tiny fluctuations don't show up as changes in the diffs
+        return {
+            "pid": pid,
+            "name": name,
+            "user": user,
+            "status": status,
+            "cpu": round(cpu, 1),
+            "memory": round(rss / (1024 * 1024), 1),  # MB
+            "threads": threads,
+        }
+
+    def process_diff(self, since=None):
+        """Take a snapshot and return it as a diff against the `since` snapshot, or in full if that is unknown.
+        The returned token is what the caller passes as `since` next time."""
+        with self._lock:
+            current = self.processes()
+            token = f"{self._instance}-{self._next_token}"
+            self._next_token += 1
+
+            previous = self._snapshots.get(since) if since else None
+            self._snapshots[token] = current
+            while len(self._snapshots) > self.history:
+                self._snapshots.popitem(last=False)
+
+        if previous is None:
+            return {"token": token, "full": True, "processes": list(current.values())}
+
+        added = [row for pid, row in current.items() if pid not in previous]
+        removed = [pid for pid in previous if pid not in current]
+        changed = []
+        for pid, row in current.items():
+            old = previous.get(pid)
+            if old is not None and old != row:
+                # Only the fields that changed, plus the pid to apply them to
+                delta = {key: value for key, value in row.items() if old.get(key) != value}
+                delta["pid"] = pid
+                changed.append(delta)
+        return {"token": token, "full": False, "added": added, "removed": removed, "changed": changed}
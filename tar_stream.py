@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import gzip
+import os
+import queue
+import tarfile
+import threading
+
+class _Cancelled(Exception):
+    """The consumer stopped reading the stream"""
+
+class _QueueWriter:
+    """File-like object that hands what tarfile writes to a bounded queue in fixed-size chunks"""
+
+    def __init__(self, chunks, chunk_size, cancelled):
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def put(self, chunk):
+        """Queue a chunk, waiting while the consumer is behind, until it stops reading"""
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        raise _Cancelled()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            # Blocks while the consumer is behind, so memory stays at a few chunks
+            self.put(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+def stream_directory(path, compress=True, chunk_size=1024 * 1024, compresslevel=6):
+    """Yield a tar (or tar.gz) of a directory chunk by chunk while it is being packed.
+    Nothing is written to disk and only a few chunks are held in memory at once.
+    If the consumer stops early (closes the generator), packing stops too."""
+    path = os.path.abspath(path)
+    chunks = queue.Queue(maxsize=8)
+    cancelled = threading.Event()
+    errors = []
+
+    def pack():
+        writer = _QueueWriter(chunks, chunk_size, cancelled)
+        try:
+            # tarfile's own stream compression is fixed at level 9, which is slow; a GzipFile
+            # underneath gives the same .tar.gz format at a sane level
+            target = gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=compresslevel) if compress else writer
+            with tarfile.open(fileobj=target, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+                tar.add(path, arcname=os.path.basename(path))
+            if compress:
+                target.close()
+            writer.close()
+        except _Cancelled:
+            return
+        except Exception as e:
+            errors.append(e)
+        try:
+            writer.put(None)
+        except _Cancelled:
+            pass
+
+    packer = threading.Thread(target=pack)
+    packer.daemon = True
+    packer.start()
+
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # Also reached when the consumer gives up (upload error or cancel): let the packer thread end
+        cancelled.set()
+    if errors:
+        raise errors[0]
+
+def _safe_target(destination, name):
+    """Where an archive member goes, or None if its name would land outside the destination"""
+    if os.path.isabs(name) or name.startswith(('/', '\\')) or (len(name) > 1 and name[1] == ':'):
+        return None
+    target = os.path.realpath(os.path.join(destination, name))
+    if target != destination and not target.startswith(destination + os.sep):
+        return None
+    return target
+
+def extract_stream(fileobj, destination, compressed=True):
+    """Unpack a tar (or tar.gz) stream into destination as it arrives, without buffering the archive.
+    Links, devices and members that would escape the destination are skipped.
+    Returns (files, bytes written, skipped member names)."""
+    destination = os.path.realpath(destination)
+    files = 0
+    written = 0
+    skipped = []
+
+    with tarfile.open(fileobj=fileobj, mode='r|gz' if compressed else 'r|') as tar:
+        for member in tar:
+            target = _safe_target(destination, member.name)
+            if target is None or not (member.isdir() or member.isfile()):
+                skipped.append(member.name)
+                continue
+
+            if member.isdir():
+                os.makedirs(target, exist_ok=True)
+                continue
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            source = tar.extractfile(member)
+            with open(target, 'wb') as f:
+                while True:
+                    data = source.read(1024 * 1024)
+                    if not data:
+                        break
+                    f.write(data)
+            written += member.size
+            files += 1
+            try:
+                os.chmod(target, member.mode & 0o777)  # No setuid/setgid bits from an archive
+                os.utime(target, (member.mtime, member.mtime))
+            except OSError:
+                pass
+
+    return files, written, skipped
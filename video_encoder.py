@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import io
+import uuid
+from collections import deque
+from fractions import Fraction
+
+import av
+
+class VideoEncoder:
+    """Encode captured screen frames into fragmented MP4 (H.264) chunks"""
+
+    def __init__(self, width, height, fps=30, bitrate=1500000, gop_seconds=2):
+        # 4:2:0 chroma subsampling needs even dimensions
+        self.width = width - (width % 2)
+        self.height = height - (height % 2)
+        self.fps = fps
+        self.bitrate = bitrate
+        self.stream_id = uuid.uuid4().hex[:12]  # Changes every time the encoder is recreated
+        self.sequence = 0
+        self.init_segment = None  # ftyp + moov, needed by every new viewer
+        self.mime = None
+
+        # frag_every_frame emits one moof+mdat per frame, flush_packets pushes
+        # every fragment out to our buffer as soon as it is written
+        self._buffer = io.BytesIO()
+        self._container = av.open(
+            self._buffer,
+            mode='w',
+            format='mp4',
+            options={
+                'movflags': 'empty_moov+default_base_moof+frag_every_frame',
+                'flush_packets': '1'
+            }
+        )
+        self._stream = self._container.add_stream('libx264', rate=fps, options={
+            'preset': 'ultrafast',
+            'tune': 'zerolatency',  # No B-frames and no lookahead, every frame comes out immediately
+            'profile': 'baseline'
+        })
+        self._stream.width = self.width
+        self._stream.height = self.height
+        self._stream.pix_fmt = 'yuv420p'
+        self._stream.bit_rate = bitrate
+        self._stream.codec_context.time_base = Fraction(1, 1000)
+        self._stream.codec_context.gop_size = int(fps * gop_seconds) * 2  # Every frame is encoded twice, see encode
+
+        self._start_time = None
+        self._last_pts = -1
+        self._pending = bytearray()  # Muxer output not yet split into boxes
+        self._init_parts = []
+        self._fragment = None
+        self._packets = deque()  # (keyframe, capture time) of muxed packets waiting for their fragment
+
+    def encode(self, img, timestamp, capture_time=None):
+        """Encode a PIL image and return the list of finished segments, each stamped with capture_time"""
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        frame = av.VideoFrame.from_image(img)
+
+        # Timestamps follow the real capture time so skipped (unchanged) frames just stretch the previous one
+        if self._start_time is None:
+            self._start_time = timestamp
+        pts = int((timestamp - self._start_time) * 1000)
+        if pts <= self._last_pts:
+            pts = self._last_pts + 1
+        frame.pts = pts
+
+        # The muxer only writes a fragment once the next packet arrives (it needs the duration), so a
+        # frame would reach the viewer one capture late, and never on a screen that then stays still.
+        # A copy of the frame 1 ms later pushes it out right away; the copy is an all-skip P-frame of a
+        # few bytes, shown until the next frame and pushed out by it.
+        segments = self._encode(frame, capture_time)
+        frame.pts = pts + 1
+        segments.extend(self._encode(frame, capture_time))
+        self._last_pts = pts + 1
+        return segments
+
+    def _encode(self, frame, capture_time):
+        segments = []
+        for packet in self._stream.encode(frame):
+            segments.extend(self._mux(packet, capture_time))
+        return segments
+
+    def _mux(self, packet, capture_time):
+        """Mux a packet and collect the fragments the muxer has finished"""
+        self._packets.append((packet.is_keyframe, capture_time))
+        self._container.mux(packet)
+        self._pending.extend(self._drain())
+        return self._split_boxes()
+
+    def _drain(self):
+        """Take the bytes written to the output buffer since the last call"""
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def _split_boxes(self):
+        """Split complete top-level MP4 boxes into the init segment and per-frame fragments"""
+        segments = []
+        while len(self._pending) >= 8:
+            size = int.from_bytes(self._pending[0:4], 'big')
+            box_type = bytes(self._pending[4:8])
+            if size < 8 or len(self._pending) < size:
+                break
+
+            box = bytes(self._pending[:size])
+            del self._pending[:size]
+
+            if box_type in (b'ftyp', b'moov'):
+                self._init_parts.append(box)
+                if box_type == b'moov':
+                    self.init_segment = b''.join(self._init_parts)
+                    self.mime = self._codec_mime()
+            elif box_type == b'moof':
+                self._fragment = bytearray(box)
+            elif self._fragment is not None:
+                self._fragment.extend(box)
+                if box_type == b'mdat':
+                    # One frame per fragment, in the order the packets were muxed
+                    keyframe, capture_time = self._packets.popleft() if self._packets else (False, None)
+                    segments.append({
+                        "seq": self.sequence,
+                        "data": bytes(self._fragment),
+                        "keyframe": keyframe,
+                        "capture_time": capture_time
+                    })
+                    self.sequence += 1
+                    self._fragment = None
+        return segments
+
+    def _codec_mime(self):
+        """Build the MSE mime type from the encoder's SPS"""
+        extradata = self._stream.codec_context.extradata or b''
+        profile = None
+
+        if len(extradata) >= 4 and extradata[0] == 1:
+            # avcC box: version, profile, constraint flags, level
+            profile = extradata[1:4]
+        else:
+            # Annex B: look for the SPS NAL unit after a start code
+            index = extradata.find(b'\x00\x00\x01')
+            while index != -1 and index + 6 < len(extradata):
+                if extradata[index + 3] & 0x1f == 7:
+                    profile = extradata[index + 4:index + 7]
+                    break
+                index = extradata.find(b'\x00\x00\x01', index + 3)
+
+        if not profile:
+            return 'video/mp4; codecs="avc1.42E01F"'
+        return f'video/mp4; codecs="avc1.{profile.hex().upper()}"'
+
+    def close(self):
+        """Release the encoder"""
+        try:
+            self._container.close()
+        except Exception as e:
+            print(f"Error closing video encoder: {str(e)}")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025 SirAbody. All rights reserved.
+
+import numpy as np
+
+class VoiceActivityDetector:
+    """Energy and zero-crossing voice activity detection on int16 audio, in 20 ms frames.
+
+    A frame is speech when it is clearly louder than the background noise, or when it is somewhat
+    louder and crosses zero often (the hiss of s, f, sh that carries little energy). The noise floor
+    follows the quietest recent frames: it drops at once and creeps back up slowly, so it adapts to
+    a fan turning on without ever treating speech as noise. After speech the detector stays active
+    for `hangover_ms`, so word endings and short pauses aren't clipped."""
+
+    def __init__(self, rate, channels=1, frame_ms=20, threshold_db=9.0, hangover_ms=400, min_speech_db=-55.0):
+        self.rate = rate
+        self.channels = channels
+        self.frame = rate * frame_ms // 1000
+        self.threshold_db = threshold_db  # Above the noise floor to be speech
+        self.min_speech_db = min_speech_db  # Nothing quieter than this is speech, however quiet the room
+        self.hangover = max(hangover_ms // frame_ms, 1)
+        self.floor_rise = 3.0 * frame_ms / 1000  # dB per frame the floor creeps up (3 dB/s)
+        self.zcr_threshold = 0.25  # Zero crossings per sample typical of fricatives
+
+        self.noise_floor = None  # dBFS, set by the first frame
+        self._hangover_left = 0
+        self.frames = 0
+        self.speech_frames = 0
+
+    def _features(self, samples):
+        """Energy (dBFS) and zero-crossing rate of every frame, computed for the whole block at once"""
+        mono = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32) / 32768
+        count = max(len(mono) // self.frame, 1)
+        frames = mono[:count * self.frame].reshape(count, -1) if len(mono) >= self.frame else mono.reshape(1, -1)
+        energy = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        crossings = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / max(frames.shape[1] - 1, 1)
+        return energy, crossings
+
+    def is_speech(self, samples):
+        """Whether a block of int16 samples contains speech (or is within the hangover of it)"""
+        if not len(samples):
+            return self._hangover_left > 0
+        energy, crossings = self._features(samples)
+        active = False
+        # The floor and the hangover carry from frame to frame, only this part is a loop (10 frames a block)
+        for frame_energy, frame_crossings in zip(energy.tolist(), crossings.tolist()):
+            if self.noise_floor is None or frame_energy < self.noise_floor:
+                self.noise_floor = frame_energy
+            else:
+                self.noise_floor += self.floor_rise
+
+            above = frame_energy - self.noise_floor
+            speech = frame_energy > self.min_speech_db and (
+                above > self.threshold_db
+                or (above > self.threshold_db / 2 and frame_crossings > self.zcr_threshold)
+            )
+            if speech:
+                self._hangover_left = self.hangover
+                self.speech_frames += 1
+            elif self._hangover_left:
+                self._hangover_left -= 1
+            active = active or self._hangover_left > 0
+            self.frames += 1
+        return active
+
+    def noise_level(self):
+        """Background noise in dBFS, for the comfort noise the listener plays during silence"""
+        return round(self.noise_floor, 1) if self.noise_floor is not None else -90.0